@@ -2,6 +2,7 @@ import os
 from dataclasses import dataclass, asdict
 from typing import Optional
 from dotenv import load_dotenv
+from scraper.utils.http_client import http_clients
 from scraper.utils.logger import setup_logger
 
 # 設置日誌
@@ -23,12 +24,54 @@ class Settings:
     sql_echo: bool = os.getenv("SQL_ECHO", "false").lower() == "true"
     
 
+    # 爬蟲抓取引擎
+    crawl_concurrency: int = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+    crawl_download_delay: float = float(os.getenv("CRAWL_DOWNLOAD_DELAY", "0.2"))
+    crawl_parse_workers: int = int(os.getenv("CRAWL_PARSE_WORKERS") or os.cpu_count() or 1)
+    crawl_incremental: bool = os.getenv("CRAWL_INCREMENTAL", "true").lower() == "true"
+    crawl_dedup_index_size: int = int(os.getenv("CRAWL_DEDUP_INDEX_SIZE", "50000"))
+    crawl_dedup_index_path: str = os.getenv("CRAWL_DEDUP_INDEX_PATH", "")
+
+    # HTTP回應快取
+    http_cache_mode: str = os.getenv("HTTP_CACHE_MODE", "off")           # off / normal / replay
+    http_cache_path: str = os.getenv("HTTP_CACHE_PATH", "cache/http_cache.sqlite")
+    http_cache_ttl_hours: float = float(os.getenv("HTTP_CACHE_TTL_HOURS", "168"))
+    http_cache_max_mb: int = int(os.getenv("HTTP_CACHE_MAX_MB", "500"))
+    http_cache_fresh_seconds: float = float(os.getenv("HTTP_CACHE_FRESH_SECONDS", "0"))
+
+    # ETL 載入
+    etl_batch_size: int = int(os.getenv("ETL_BATCH_SIZE", "100"))
+    etl_load_mode: str = os.getenv("ETL_LOAD_MODE", "bulk")           # bulk / orm
+    etl_on_conflict: str = os.getenv("ETL_ON_CONFLICT", "nothing")    # nothing / update
+
+    # 對外 HTTP 連線池（每個網域保留的連線數、預設逾時秒數、是否使用 HTTP/2）
+    http_pool_maxsize: int = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+    http_timeout: float = float(os.getenv("HTTP_TIMEOUT", "10"))
+    http2_enabled: bool = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
     # 天氣 API 配置
     owm_api_key: Optional[str] = os.getenv("OWM_API_KEY")
 
     # LINE 配置
     line_channel_token: Optional[str] = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
     line_channel_secret: Optional[str] = os.getenv("LINE_CHANNEL_SECRET")
+
+    # 通知發送（工作執行緒數、每秒請求數上限）
+    notify_weather_workers: int = int(os.getenv("NOTIFY_WEATHER_WORKERS", "8"))
+    notify_line_workers: int = int(os.getenv("NOTIFY_LINE_WORKERS", "8"))
+    owm_rate_limit: float = float(os.getenv("OWM_RATE_LIMIT", "10"))
+    line_rate_limit: float = float(os.getenv("LINE_RATE_LIMIT", "100"))
+
+    # 新聞通知：每位使用者合併所有訂閱分類為一次推播
+    news_digest: bool = os.getenv("NEWS_DIGEST", "true").lower() == "true"
+
+    # 天氣查詢網格（經緯度小數位數，2 位約 1 公里）與每格快取秒數
+    weather_grid_precision: int = int(os.getenv("WEATHER_GRID_PRECISION", "2"))
+    weather_cache_ttl: float = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+
+    # 通知發件匣（認領後的租約秒數、每筆最多發送次數）
+    outbox_lease_seconds: float = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
     def validate(self) -> None:
         """驗證配置"""
         if not self.database_url:
@@ -36,9 +79,21 @@ class Settings:
     
     # 應用服務
     app_port: int = int(os.getenv("PORT", os.getenv("APP_PORT", "5001")))
+    # Webhook 事件佇列（待處理事件數上限、處理事件的工作執行緒數）
+    webhook_queue_size: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+    webhook_workers: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    webhook_drain_seconds: float = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "20"))
+    # Webhook 使用者快取（最多快取人數、每位使用者的快取秒數）
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", "600"))
+    # 新聞類別表重新讀取資料庫與配置檔的間隔秒數
+    category_refresh_seconds: float = float(os.getenv("CATEGORY_REFRESH_SECONDS", "600"))
     
     # 排程器
     scheduler_debug: bool = os.getenv("SCHEDULER_DEBUG", "false").lower() == "true"
+    # 多個 worker 以資料庫鎖選出唯一執行排程任務的主節點（鎖名稱、非主節點重試間隔秒數）
+    scheduler_lock_name: str = os.getenv("SCHEDULER_LOCK_NAME", "news_scheduler")
+    scheduler_leader_retry_seconds: float = float(os.getenv("SCHEDULER_LEADER_RETRY_SECONDS", "15"))
 
 # 創建配置實例並轉換為字典
 settings = Settings()
@@ -48,4 +103,11 @@ try:
     logger.debug(f"資料庫URL: {settings.database_url}")
 except ValueError as e:
     logger.error(f"配置驗證失敗: {str(e)}")
-    raise
\ No newline at end of file
+    raise
+
+# 套用共用 HTTP 連線池的設定
+http_clients.configure(
+    pool_maxsize=settings.http_pool_maxsize,
+    timeout=settings.http_timeout,
+    http2=settings.http2_enabled
+)
\ No newline at end of file
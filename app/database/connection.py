@@ -7,6 +7,7 @@ from typing import Generator
 
 from app.config.settings import settings
 from app.models.news import Base
+from app.models import notification  # 註冊通知發件匣資料表，供 create_tables 建立
 from scraper.utils.logger import setup_logger
 
 # 使用自定義的logger設置
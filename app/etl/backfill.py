@@ -0,0 +1,170 @@
+"""
+app/etl/backfill.py
+
+歷史新聞回補：
+1. 對指定日期區間深度翻頁爬取 WNewsList
+2. 轉換後的資料以 COPY FROM STDIN 分段串流寫入暫存表，記憶體用量與筆數無關
+3. 每段以 INSERT ... SELECT ... ON CONFLICT 合併至 news_articles 後立即提交，
+   交易長度與回補區間無關，中途失敗時已提交的段落不需重爬
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.database.connection import db_manager
+from app.etl.crawl_coordinator import CrawlCoordinator, create_http_cache
+from app.etl.csv_stream import CsvStream
+from app.etl.dedup_index import UrlDedupIndex
+from app.services.category_service import get_categories
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+STAGING_TABLE = 'news_articles_backfill'
+COLUMNS = ('title', 'url', 'publish_time', 'source', 'news_category_key', 'content')
+
+
+class NewsBackfill:
+    """以 COPY 串流寫入的歷史新聞回補"""
+
+    def __init__(
+        self,
+        start: datetime,
+        end: datetime,
+        categories: Optional[List[str]] = None,
+        max_pages: int = 500,
+        chunk_size: int = 5000,
+        concurrency_per_host: Optional[int] = None,
+        download_delay: Optional[float] = None,
+        parse_workers: int = 0,
+        http_cache_mode: Optional[str] = None
+    ):
+        """
+        初始化回補流程
+
+        Args:
+            start: 回補起始時間（含）
+            end: 回補結束時間（含）
+            categories: 要回補的類別，未指定時使用 news_categories 中的所有類別
+            max_pages: 每個類別最多翻頁數
+            chunk_size: 每段 COPY 寫入並提交的資料列數
+            concurrency_per_host: 抓取器每個網域的同時請求數
+            download_delay: 抓取器同一網域請求間的禮貌延遲(秒)
+            parse_workers: 解析HTML的行程數
+            http_cache_mode: HTTP回應快取模式 off / normal / replay，未指定時依設定檔
+        """
+        if start > end:
+            raise ValueError(f"起始時間 {start} 晚於結束時間 {end}")
+        self.start = start
+        self.end = end
+        self.categories = categories
+        self.max_pages = max_pages
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency_per_host = concurrency_per_host
+        self.download_delay = download_delay
+        self.parse_workers = parse_workers
+        self.http_cache_mode = http_cache_mode
+
+    @staticmethod
+    def _load_all_categories() -> List[str]:
+        """取得資料庫中所有可爬取的新聞類別"""
+        categories = get_categories()
+        return sorted(categories.subscribable & categories.crawlable)
+
+    def _build_coordinator(self) -> CrawlCoordinator:
+        """建立設定好日期區間的爬取協調器"""
+        categories = self.categories or self._load_all_categories()
+        coordinator = CrawlCoordinator(
+            categories,
+            concurrency_per_host=self.concurrency_per_host,
+            download_delay=self.download_delay,
+            dedup_index=UrlDedupIndex(),
+            parse_workers=self.parse_workers,
+            http_cache=create_http_cache(self.http_cache_mode)
+        )
+        for spider in coordinator.spiders:
+            spider.cutoff_time = self.start
+            spider.until_time = self.end
+        return coordinator
+
+    @staticmethod
+    def _to_row(data: Dict) -> Tuple:
+        """將爬蟲資料轉為暫存表欄位順序"""
+        return (
+            data['title'],
+            data['url'],
+            data['publish_time'].isoformat(sep=' '),
+            data['source'],
+            data['category'],
+            data.get('content')
+        )
+
+    def run(self) -> Tuple[int, int]:
+        """
+        執行回補
+
+        Returns:
+            Tuple[int, int]: (寫入暫存表的資料列數, 實際新增至 news_articles 的數量)
+        """
+        coordinator = self._build_coordinator()
+        logger.info(
+            f"開始回補 {self.start:%Y-%m-%d %H:%M} ~ {self.end:%Y-%m-%d %H:%M}，"
+            f"類別: {coordinator.categories}"
+        )
+
+        rows = map(self._to_row, coordinator.crawl(max_pages=self.max_pages))
+        column_list = ', '.join(COLUMNS)
+        started = datetime.now()
+        copied = 0
+        inserted = 0
+
+        conn = db_manager.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                # 暫存表在連線期間保留，每次提交時清空，下一段從空表開始；
+                # 連線歸還連線池後暫存表仍存在，同一連線再次回補時沿用
+                cursor.execute(f"""
+                    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+                        title VARCHAR(500),
+                        url VARCHAR(1000),
+                        publish_time TIMESTAMP,
+                        source VARCHAR(100),
+                        news_category_key VARCHAR(50),
+                        content TEXT
+                    ) ON COMMIT DELETE ROWS
+                """)
+                conn.commit()
+
+                # 每段串流 chunk_size 筆後合併並提交，資料不會整批留在記憶體或單一交易中
+                while True:
+                    stream = CsvStream(rows, self.chunk_size)
+                    cursor.copy_expert(
+                        f"COPY {STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                        stream
+                    )
+                    if stream.count:
+                        # 段內重複的文章只保留一筆，與先前段落重複的由 ON CONFLICT 略過
+                        cursor.execute(f"""
+                            INSERT INTO news_articles ({column_list}, created_at, updated_at)
+                            SELECT DISTINCT ON (title, url) {column_list},
+                                NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'
+                            FROM {STAGING_TABLE}
+                            ORDER BY title, url, publish_time DESC
+                            ON CONFLICT ON CONSTRAINT uk_news_title_url DO NOTHING
+                        """)
+                        inserted += cursor.rowcount
+                    conn.commit()
+                    copied += stream.count
+                    elapsed = (datetime.now() - started).total_seconds() or 1
+                    logger.info(f"已提交 {copied} 筆，新增 {inserted} 篇 ({copied / elapsed:.0f} 筆/秒)")
+                    if stream.exhausted:
+                        break
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"回補失敗，僅回滾未提交的一段，已提交 {copied} 筆、新增 {inserted} 篇: {str(e)}")
+            raise
+        finally:
+            conn.close()
+
+        logger.info(f"回補完成: 暫存 {copied} 筆，新增 {inserted} 篇，略過 {copied - inserted} 篇")
+        return copied, inserted
@@ -0,0 +1,200 @@
+"""
+app/etl/crawl_coordinator.py
+
+多類別併發爬取協調器：
+1. 從訂閱資料取得需要爬取的新聞類別
+2. 所有類別共用同一個限流的非同步抓取器並同時爬取，HTML 交由共用的解析行程池處理
+3. 同一篇文章出現在多個類別時（如 aall 與 aie），每次執行只下載與解析一次
+4. 可在文章串流中插入類別完成標記，讓下游在單一類別結束時立即處理
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncGenerator, Dict, Generator, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.etl.dedup_index import UrlDedupIndex
+from app.models.user import SubNews
+from app.services.category_service import get_categories
+from scraper.engine.bridge import iterate_async
+from scraper.engine.http_cache import HttpCache
+from scraper.engine.parse_stage import ParseStage
+from scraper.spiders.cna.cna_spider import CnaSpider
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+
+@dataclass(frozen=True)
+class CategoryDone:
+    """類別爬取完成標記，位於該類別所有文章之後"""
+    category: str
+    ok: bool
+
+
+def create_http_cache(mode: Optional[str] = None) -> Optional[HttpCache]:
+    """
+    依設定建立HTTP回應快取
+
+    Args:
+        mode: 快取模式，未指定時使用 HTTP_CACHE_MODE
+
+    Returns:
+        Optional[HttpCache]: 快取，模式為 off 時回傳None
+    """
+    mode = mode or settings.http_cache_mode
+    if mode == 'off':
+        return None
+    return HttpCache(
+        settings.http_cache_path,
+        mode=mode,
+        ttl=settings.http_cache_ttl_hours * 3600,
+        max_bytes=settings.http_cache_max_mb * 1024 * 1024,
+        fresh_for=settings.http_cache_fresh_seconds
+    )
+
+
+class CrawlCoordinator:
+    """多類別併發爬取協調器"""
+
+    # 沒有任何訂閱時的預設類別
+    DEFAULT_CATEGORIES = ['acul', 'aie', 'ait']
+
+    def __init__(
+        self,
+        categories: List[str],
+        concurrency_per_host: Optional[int] = None,
+        download_delay: Optional[float] = None,
+        dedup_index: Optional[UrlDedupIndex] = None,
+        parse_workers: int = 0,
+        http_cache: Optional[HttpCache] = None
+    ):
+        """
+        初始化協調器
+
+        Args:
+            categories: 要爬取的新聞類別代碼
+            concurrency_per_host: 共用抓取器每個網域的同時請求數
+            download_delay: 共用抓取器同一網域請求間的禮貌延遲(秒)
+            dedup_index: 已入庫文章索引，命中的文章不會下載
+            parse_workers: 解析HTML的行程數，0 表示在背景執行緒中解析
+            http_cache: 所有類別共用的HTTP回應快取
+        """
+        self.dedup_index = dedup_index
+        self.parse_workers = parse_workers
+        self.spiders: List[CnaSpider] = []
+        crawlable = get_categories().crawlable
+        for category in dict.fromkeys(categories):
+            if category not in crawlable:
+                logger.error(f"略過無效的類別 {category}: 不在類別配置中")
+                continue
+            try:
+                self.spiders.append(CnaSpider(
+                    category=category,
+                    concurrency_per_host=concurrency_per_host,
+                    download_delay=download_delay,
+                    http_cache=http_cache
+                ))
+            except ValueError as e:
+                logger.error(f"略過無效的類別 {category}: {str(e)}")
+
+    @property
+    def categories(self) -> List[str]:
+        """實際會爬取的類別"""
+        return [spider.category for spider in self.spiders]
+
+    @classmethod
+    def load_subscribed_categories(cls, session: Session) -> List[str]:
+        """
+        取得所有被訂閱的新聞類別
+
+        Args:
+            session: SQLAlchemy session
+
+        Returns:
+            List[str]: 類別代碼列表，沒有訂閱時回傳預設類別
+        """
+        rows = session.query(SubNews.news_category_key).distinct().all()
+        categories = sorted(row[0] for row in rows)
+        if not categories:
+            logger.info(f"沒有新聞訂閱資料，使用預設類別: {cls.DEFAULT_CATEGORIES}")
+            return list(cls.DEFAULT_CATEGORIES)
+        return categories
+
+    async def crawl_async(
+        self,
+        max_pages: int = 2,
+        emit_progress: bool = False
+    ) -> AsyncGenerator[Union[Dict, CategoryDone], None]:
+        """
+        同時爬取所有類別，依完成順序產出文章
+
+        Args:
+            max_pages: 每個類別的最大爬取頁數
+            emit_progress: 是否在每個類別結束時產出 CategoryDone 標記
+
+        Yields:
+            Dict: 新聞資料；emit_progress 時另有 CategoryDone
+        """
+        if not self.spiders:
+            return
+
+        results: asyncio.Queue = asyncio.Queue(maxsize=100)
+        seen_urls = set()
+        url_filter = self.dedup_index.filter_unknown if self.dedup_index is not None else None
+
+        async def _run_spider(spider: CnaSpider) -> None:
+            ok = False
+            try:
+                async for article_data in spider.crawl_async(
+                    fetcher,
+                    max_pages=max_pages,
+                    seen_urls=seen_urls,
+                    url_filter=url_filter,
+                    parse_stage=parse_stage
+                ):
+                    await results.put(article_data)
+                ok = True
+            except Exception as e:
+                logger.error(f"類別 {spider.category} 爬取失敗: {str(e)}", exc_info=True)
+            finally:
+                await results.put(CategoryDone(spider.category, ok))
+
+        async with self.spiders[0].create_fetcher() as fetcher, ParseStage(self.parse_workers) as parse_stage:
+            tasks = [asyncio.ensure_future(_run_spider(spider)) for spider in self.spiders]
+            remaining = len(tasks)
+            try:
+                while remaining:
+                    item = await results.get()
+                    if isinstance(item, CategoryDone):
+                        remaining -= 1
+                        if emit_progress:
+                            yield item
+                        continue
+                    yield item
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+
+        logger.info(f"共爬取 {len(self.spiders)} 個類別，處理 {len(seen_urls)} 個不重複網址")
+
+    def crawl(
+        self,
+        max_pages: int = 2,
+        emit_progress: bool = False
+    ) -> Generator[Union[Dict, CategoryDone], None, None]:
+        """
+        同步介面，供 ETL 流程逐筆取得文章
+
+        Args:
+            max_pages: 每個類別的最大爬取頁數
+            emit_progress: 是否在每個類別結束時產出 CategoryDone 標記
+
+        Yields:
+            Dict: 新聞資料；emit_progress 時另有 CategoryDone
+        """
+        yield from iterate_async(lambda: self.crawl_async(max_pages=max_pages, emit_progress=emit_progress))
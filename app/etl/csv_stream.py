@@ -0,0 +1,58 @@
+"""
+app/etl/csv_stream.py
+
+COPY FROM STDIN 使用的CSV串流：
+將資料列即時轉為CSV文字，每個串流最多讀取固定筆數，
+回補時分段寫入暫存表，記憶體用量與筆數無關。
+"""
+import csv
+import io
+from typing import Iterator, Tuple
+
+
+class CsvStream(io.TextIOBase):
+    """將資料列即時轉為CSV的唯讀檔案物件，供 COPY 逐段讀取"""
+
+    def __init__(self, rows: Iterator[Tuple], limit: int):
+        """
+        初始化串流
+
+        Args:
+            rows: 資料列，多個串流可依序共用同一個迭代器
+            limit: 此串流最多讀取的資料列數
+        """
+        self._rows = rows
+        self._limit = limit
+        self._buffer = ''
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line, lineterminator='\n')
+        self.count = 0
+        self.exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_line(self) -> str:
+        """取得下一列的CSV文字，達到上限或資料結束時回傳空字串"""
+        if self.count >= self._limit:
+            return ''
+        row = next(self._rows, None)
+        if row is None:
+            self.exhausted = True
+            return ''
+        self.count += 1
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(row)
+        return self._line.getvalue()
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = self._next_line()
+            if not line:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
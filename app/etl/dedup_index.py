@@ -0,0 +1,127 @@
+"""
+app/etl/dedup_index.py
+
+文章URL去重索引：
+1. 行程內以LRU集合記住已入庫的文章URL
+2. 未命中的URL以每頁一次的批次查詢向資料庫確認
+3. 可選擇將索引寫入檔案，供下次執行直接載入
+
+爬蟲在下載文章前先查詢索引，已入庫的文章不再發送HTTP請求與解析HTML。
+"""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+
+from app.database.connection import db_manager
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+class UrlDedupIndex:
+    """已入庫文章URL的LRU索引，以資料庫為後備來源"""
+
+    def __init__(self, capacity: int = 50000, persist_path: Optional[str] = None):
+        """
+        初始化索引
+
+        Args:
+            capacity: 記憶體中最多保留的URL數量
+            persist_path: 索引檔案路徑，未指定時不跨執行保存
+        """
+        self.capacity = max(1, capacity)
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._urls: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.persist_path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            return self._touch(url)
+
+    def _touch(self, url: str) -> bool:
+        """命中時將URL移到最近使用端"""
+        if url in self._urls:
+            self._urls.move_to_end(url)
+            return True
+        return False
+
+    def add_many(self, urls: Iterable[str]) -> None:
+        """登記已入庫的URL，超過容量時淘汰最久未使用者"""
+        with self._lock:
+            for url in urls:
+                self._urls[url] = None
+                self._urls.move_to_end(url)
+            while len(self._urls) > self.capacity:
+                self._urls.popitem(last=False)
+
+    def _query_existing(self, urls: List[str]) -> List[str]:
+        """批次查詢資料庫中已存在的URL"""
+        with db_manager.engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT url FROM news_articles WHERE url = ANY(:urls)"),
+                {"urls": urls}
+            )
+            return [row[0] for row in rows]
+
+    def filter_unknown(self, urls: List[str]) -> List[str]:
+        """
+        篩選尚未入庫的URL
+
+        Args:
+            urls: 同一列表頁的文章URL
+
+        Returns:
+            List[str]: 需要下載的URL，保持原順序
+        """
+        with self._lock:
+            misses = [url for url in urls if not self._touch(url)]
+        if not misses:
+            return []
+
+        try:
+            existing = self._query_existing(misses)
+        except Exception as e:
+            # 查詢失敗時保守處理，交由入庫階段的唯一約束去重
+            logger.error(f"查詢已入庫文章失敗: {str(e)}")
+            return misses
+
+        self.add_many(existing)
+        existing = set(existing)
+        return [url for url in misses if url not in existing]
+
+    def load(self) -> None:
+        """從索引檔案載入URL"""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                self.add_many(line.strip() for line in f if line.strip())
+            logger.info(f"已載入 {len(self)} 筆去重索引")
+        except Exception as e:
+            logger.error(f"讀取去重索引失敗: {str(e)}")
+
+    def save(self) -> None:
+        """將索引寫入檔案，由舊到新排列以保留LRU順序"""
+        if not self.persist_path:
+            return
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix('.tmp')
+            with self._lock:
+                urls = list(self._urls)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{url}\n" for url in urls)
+            tmp_path.replace(self.persist_path)
+            logger.info(f"已保存 {len(urls)} 筆去重索引")
+        except Exception as e:
+            logger.error(f"保存去重索引失敗: {str(e)}")
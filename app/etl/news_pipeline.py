@@ -1,12 +1,16 @@
-from typing import Generator, Dict, List
+from typing import Callable, Generator, Dict, List, Optional, Tuple, Union
 from scraper.utils.logger import setup_logger
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import select
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
+from app.config.settings import settings
 from app.database.connection import db_manager
+from app.etl.crawl_coordinator import CategoryDone, CrawlCoordinator, create_http_cache
+from app.etl.dedup_index import UrlDedupIndex
+from app.etl.watermark import load_watermarks, save_watermarks
 from app.models.news import NewsArticle
-from scraper.spiders.cna.cna_spider import CnaSpider
 
 # 使用自定義的logger設置
 logger = setup_logger(__name__)
@@ -14,12 +18,92 @@ logger = setup_logger(__name__)
 class NewsETLPipeline:
     """新聞ETL管道"""
     
-    def __init__(self):
-        self.spider = CnaSpider(category="acul")
+    LOAD_MODES = ('bulk', 'orm')
+    ON_CONFLICT_ACTIONS = ('nothing', 'update')
+    
+    def __init__(
+        self,
+        categories: Optional[List[str]] = None,
+        incremental: Optional[bool] = None,
+        batch_size: Optional[int] = None,
+        load_mode: Optional[str] = None,
+        on_conflict: Optional[str] = None,
+        http_cache_mode: Optional[str] = None,
+        on_category_loaded: Optional[Callable[[str], None]] = None
+    ):
+        """
+        初始化ETL管道
         
-    def extract(self) -> Generator[Dict, None, None]:
-        """從爬蟲獲取數據"""
-        yield from self.spider.crawl(max_pages=2)
+        Args:
+            categories: 要爬取的新聞類別，未指定時使用預設類別
+            incremental: 是否依水位線增量爬取，未指定時依設定檔
+            batch_size: 每批寫入的文章數量，未指定時依設定檔
+            load_mode: 'bulk' 每批一次 INSERT ... ON CONFLICT；'orm' 逐篇 session.add
+            on_conflict: bulk 模式遇到重複文章時 'nothing' 略過或 'update' 更新內容
+            http_cache_mode: HTTP回應快取模式 off / normal / replay，未指定時依設定檔
+            on_category_loaded: 類別爬取完成且文章全部入庫後呼叫，參數為類別代碼
+        """
+        self.dedup_index = UrlDedupIndex(
+            capacity=settings.crawl_dedup_index_size,
+            persist_path=settings.crawl_dedup_index_path or None
+        )
+        self.coordinator = CrawlCoordinator(
+            categories or CrawlCoordinator.DEFAULT_CATEGORIES,
+            concurrency_per_host=settings.crawl_concurrency,
+            download_delay=settings.crawl_download_delay,
+            dedup_index=self.dedup_index,
+            parse_workers=settings.crawl_parse_workers,
+            http_cache=create_http_cache(http_cache_mode)
+        )
+        self.incremental = settings.crawl_incremental if incremental is None else incremental
+        self.batch_size = max(1, batch_size or settings.etl_batch_size)
+        self.load_mode = load_mode or settings.etl_load_mode
+        self.on_conflict = on_conflict or settings.etl_on_conflict
+        if self.load_mode not in self.LOAD_MODES:
+            raise ValueError(f"無效的載入模式: {self.load_mode}，可用: {self.LOAD_MODES}")
+        if self.on_conflict not in self.ON_CONFLICT_ACTIONS:
+            raise ValueError(f"無效的衝突處理方式: {self.on_conflict}，可用: {self.ON_CONFLICT_ACTIONS}")
+        self.on_category_loaded = on_category_loaded
+        self._failed_categories = set()
+        
+    def extract(self) -> Generator[Union[Dict, CategoryDone], None, None]:
+        """從爬蟲獲取數據，所有類別同時爬取，每個類別結束時產出 CategoryDone"""
+        yield from self.coordinator.crawl(max_pages=2, emit_progress=True)
+
+    def _category_loaded(self, done: CategoryDone) -> None:
+        """類別的文章全部入庫後通知下游，爬取或入庫失敗的類別不通知"""
+        if not done.ok:
+            # 爬取中斷時只拿到部分文章，保持原水位線，下次從原位置重新爬取
+            self._failed_categories.add(done.category)
+        if done.category in self._failed_categories:
+            logger.warning(f"類別 {done.category} 未完整入庫，不觸發後續處理")
+            return
+        logger.info(f"類別 {done.category} 入庫完成")
+        if self.on_category_loaded is None:
+            return
+        try:
+            self.on_category_loaded(done.category)
+        except Exception as e:
+            logger.error(f"類別 {done.category} 入庫後處理失敗: {str(e)}")
+
+    def _apply_watermarks(self) -> None:
+        """讀取各分類水位線並交給對應的爬蟲"""
+        with db_manager.get_session() as session:
+            watermarks = load_watermarks(session, self.coordinator.categories)
+        for spider in self.coordinator.spiders:
+            spider.watermark = watermarks.get(spider.category)
+            if spider.watermark:
+                logger.info(f"類別 {spider.category} 增量爬取，水位線: {spider.watermark[0]:%Y-%m-%d %H:%M}")
+
+    def _advance_watermarks(self) -> None:
+        """推進水位線，入庫失敗的分類保持原水位線以便下次重試"""
+        watermarks = {
+            spider.category: spider.next_watermark
+            for spider in self.coordinator.spiders
+            if spider.next_watermark and spider.category not in self._failed_categories
+        }
+        with db_manager.get_session() as session:
+            save_watermarks(session, watermarks)
         
     def transform(self, data: Dict) -> NewsArticle:
         """轉換數據為NewsArticle模型"""
@@ -48,43 +132,140 @@ class NewsETLPipeline:
             # 不記錄錯誤，讓它往上傳遞給 _save_batch 處理
             raise
             
-    def _save_batch(self, articles: List[NewsArticle]) -> int:
-        """批次保存文章
+    def _save_batch_orm(self, articles: List[NewsArticle]) -> Tuple[int, int]:
+        """逐篇保存文章
         
         Args:
             articles: 要保存的文章列表
             
         Returns:
-            int: 成功保存的文章數量
+            Tuple[int, int]: (成功保存數量, 已存在而略過的數量)
         """
         saved_count = 0
+        skipped_count = 0
+        stored_urls = []
         with db_manager.get_session() as session:
             for article in articles:
                 try:
                     if self.load(session, article):
                         saved_count += 1
-                        logger.info(f"成功保存文章: {article.title}")
+                        logger.debug(f"成功保存文章: {article.title}")
                     else:
-                        logger.warning(f"文章已存在，跳過: {article.title}")
+                        skipped_count += 1
+                        logger.debug(f"文章已存在，跳過: {article.title}")
+                    stored_urls.append(article.url)
                 except Exception as e:
                     # 在這裡統一處理並記錄數據庫操作錯誤
                     logger.error(f"文章 '{article.title}' 保存失敗: {str(e)}")
+                    self._failed_categories.add(article.news_category_key)
                     continue
-        return saved_count
+        
+        # 提交成功後登記至去重索引，後續爬取不再下載
+        self.dedup_index.add_many(stored_urls)
+        return saved_count, skipped_count
+
+    @staticmethod
+    def _to_row(article: NewsArticle) -> Dict:
+        """將文章模型轉為批次寫入用的欄位字典"""
+        return {
+            'title': article.title,
+            'url': article.url,
+            'publish_time': article.publish_time,
+            'source': article.source,
+            'news_category_key': article.news_category_key,
+            'content': article.content
+        }
+
+    def _build_upsert(self, rows: List[Dict]):
+        """組成多列 INSERT ... ON CONFLICT (title, url) 語句，並回傳每列是否為新增"""
+        stmt = insert(NewsArticle).values(rows)
+        if self.on_conflict == 'update':
+            stmt = stmt.on_conflict_do_update(
+                constraint='uk_news_title_url',
+                set_={
+                    'publish_time': stmt.excluded.publish_time,
+                    'source': stmt.excluded.source,
+                    'news_category_key': stmt.excluded.news_category_key,
+                    'content': stmt.excluded.content,
+                    'updated_at': func.timezone('UTC', func.now())
+                }
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(constraint='uk_news_title_url')
+        # xmax = 0 表示該列為本次新增，否則為衝突後更新
+        return stmt.returning(NewsArticle.id, literal_column('(xmax = 0)').label('inserted'))
+
+    def _save_batch_bulk(self, articles: List[NewsArticle]) -> Tuple[int, int]:
+        """以單一語句批次保存文章
+        
+        Args:
+            articles: 要保存的文章列表
+            
+        Returns:
+            Tuple[int, int]: (新增數量, 已存在而略過或更新的數量)
+        """
+        # 同一語句內不可重複影響同一列，先依唯一鍵去重
+        rows = list({
+            (row['title'], row['url']): row
+            for row in map(self._to_row, articles)
+        }.values())
+        
+        try:
+            with db_manager.get_session() as session:
+                returned = session.execute(self._build_upsert(rows)).all()
+        except Exception as e:
+            logger.error(f"批次保存 {len(rows)} 篇文章失敗: {str(e)}")
+            self._failed_categories.update(row['news_category_key'] for row in rows)
+            return 0, 0
+        
+        inserted_count = sum(1 for row in returned if row.inserted)
+        skipped_count = len(articles) - inserted_count
+        
+        # 提交成功後登記至去重索引，後續爬取不再下載
+        self.dedup_index.add_many(row['url'] for row in rows)
+        logger.info(f"批次保存 {len(articles)} 篇文章: 新增 {inserted_count} 篇，略過 {skipped_count} 篇")
+        return inserted_count, skipped_count
+
+    def _save_batch(self, articles: List[NewsArticle]) -> Tuple[int, int]:
+        """批次保存文章
+        
+        Args:
+            articles: 要保存的文章列表
+            
+        Returns:
+            Tuple[int, int]: (新增數量, 略過數量)
+        """
+        if self.load_mode == 'orm':
+            return self._save_batch_orm(articles)
+        return self._save_batch_bulk(articles)
 
     def run(self):
         """執行ETL流程"""
         try:
-            logger.info("開始ETL流程")
+            logger.info(f"開始ETL流程，類別: {self.coordinator.categories}")
             total_processed = 0
             total_saved = 0
-            batch_size = 10  # 可配置的批次大小
+            total_skipped = 0
             
             articles_batch = []
+            self._failed_categories = set()
+            
+            if self.incremental:
+                self._apply_watermarks()
             
             # 開始抓取和處理文章
             logger.info("開始抓取新聞數據...")
             for data in self.extract():
+                if isinstance(data, CategoryDone):
+                    # 該類別的文章都已進入批次，先寫入再通知下游
+                    if articles_batch:
+                        saved, skipped = self._save_batch(articles_batch)
+                        total_saved += saved
+                        total_skipped += skipped
+                        articles_batch = []
+                    self._category_loaded(data)
+                    continue
+                
                 total_processed += 1
                 try:
                     # 轉換數據
@@ -92,25 +273,35 @@ class NewsETLPipeline:
                     articles_batch.append(article)
                     
                     # 當達到批次大小時進行保存
-                    if len(articles_batch) >= batch_size:
-                        saved = self._save_batch(articles_batch)
+                    if len(articles_batch) >= self.batch_size:
+                        saved, skipped = self._save_batch(articles_batch)
                         total_saved += saved
+                        total_skipped += skipped
                         articles_batch = []
                         logger.info(f"已處理 {total_processed} 篇文章，成功保存 {total_saved} 篇")
                         
                 except Exception as e:
                     # 只記錄數據轉換錯誤
                     logger.error(f"第 {total_processed} 篇文章轉換失敗: {str(e)}")
+                    self._failed_categories.add(data.get('category'))
                     continue
             
             # 處理剩餘的文章
             if articles_batch:
-                saved = self._save_batch(articles_batch)
+                saved, skipped = self._save_batch(articles_batch)
                 total_saved += saved
+                total_skipped += skipped
+            
+            if self.incremental:
+                self._advance_watermarks()
+            self.dedup_index.save()
             
             # 輸出最終統計
             success_rate = (total_saved / total_processed * 100) if total_processed > 0 else 0
-            logger.info(f"ETL完成: 總共處理 {total_processed} 篇文章，成功保存 {total_saved} 篇 (成功率: {success_rate:.2f}%)")
+            logger.info(
+                f"ETL完成: 總共處理 {total_processed} 篇文章，成功保存 {total_saved} 篇，"
+                f"略過 {total_skipped} 篇 (成功率: {success_rate:.2f}%)"
+            )
             return True
             
         except Exception as e:
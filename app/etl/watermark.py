@@ -0,0 +1,73 @@
+"""
+app/etl/watermark.py
+
+增量爬取水位線的存取：
+每個新聞分類記錄已入庫的最新文章 (CreateTime, PageUrl)，
+爬蟲據此在到達已入庫文章時停止翻頁，且不再下載已知文章。
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.news import NewsCrawlState
+from scraper.spiders.cna.cna_spider import Watermark
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+def load_watermarks(session: Session, categories: Iterable[str]) -> Dict[str, Watermark]:
+    """
+    讀取指定分類的水位線
+
+    Args:
+        session: SQLAlchemy session
+        categories: 新聞分類代碼
+
+    Returns:
+        Dict[str, Watermark]: {分類代碼: (最新發布時間, 文章URL)}
+    """
+    states = (
+        session.query(NewsCrawlState)
+        .filter(NewsCrawlState.news_category_key.in_(list(categories)))
+        .all()
+    )
+    return {
+        state.news_category_key: (state.last_publish_time, state.last_url)
+        for state in states
+    }
+
+
+def save_watermarks(session: Session, watermarks: Dict[str, Watermark]) -> None:
+    """
+    寫入水位線，只會往較新的時間推進
+
+    Args:
+        session: SQLAlchemy session
+        watermarks: {分類代碼: (最新發布時間, 文章URL)}
+    """
+    if not watermarks:
+        return
+
+    rows = [
+        {
+            'news_category_key': category,
+            'last_publish_time': publish_time,
+            'last_url': url
+        }
+        for category, (publish_time, url) in watermarks.items()
+    ]
+    stmt = insert(NewsCrawlState).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[NewsCrawlState.news_category_key],
+        set_={
+            'last_publish_time': stmt.excluded.last_publish_time,
+            'last_url': stmt.excluded.last_url,
+            'updated_at': stmt.excluded.updated_at
+        },
+        where=NewsCrawlState.last_publish_time <= stmt.excluded.last_publish_time
+    )
+    session.execute(stmt)
+    logger.info(f"已更新 {len(rows)} 個分類的爬取水位線")
@@ -1,7 +1,7 @@
 from flask import Flask
 from app.database.connection import db_manager
 from app.services.scheduler_service import SchedulerService
-from line_broker.webhook_handler import webhook_blueprint
+from line_broker.webhook_handler import webhook_blueprint, event_queue
 from app.config.settings import settings
 from scraper.utils.logger import setup_logger
 import signal
@@ -71,6 +71,16 @@ def register_shutdown_handlers():
             logger.error(f"關閉排程器時發生錯誤: {str(e)}")
         return False
     
+    def shutdown_event_queue():
+        """停止接收 Webhook 事件，處理完已接受的事件"""
+        try:
+            logger.info(f"處理剩餘的 Webhook 事件（{event_queue.pending} 個）...")
+            event_queue.stop(timeout=settings.webhook_drain_seconds)
+            return True
+        except Exception as e:
+            logger.error(f"關閉 Webhook 事件佇列時發生錯誤: {str(e)}")
+        return False
+    
     def shutdown_db():
         """關閉資料庫連接"""
         try:
@@ -88,6 +98,7 @@ def register_shutdown_handlers():
         
         # 按優先順序關閉各項資源
         shutdown_scheduler()
+        shutdown_event_queue()
         shutdown_db()
         
         logger.info("應用程式已完成優雅關閉")
@@ -57,4 +57,17 @@ class NewsArticle(Base):
             source=data['source'],
             news_category_key=data['category'],
             content=data.get('content')
-        ) 
\ No newline at end of file
+        )
+
+
+class NewsCrawlState(Base):
+    """新聞爬取進度模型，記錄各分類已入庫的最新文章（增量爬取水位線）"""
+    __tablename__ = 'news_crawl_state'
+
+    news_category_key = Column(String(50), ForeignKey('news_categories.category_key', ondelete='CASCADE'), primary_key=True)
+    last_publish_time = Column(TIMESTAMP, nullable=False)
+    last_url = Column(String(1000), nullable=False)
+    updated_at = Column(TIMESTAMP, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<NewsCrawlState(category='{self.news_category_key}', last_publish_time='{self.last_publish_time}')>"
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Text, TIMESTAMP, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from app.models.base import Base  # 從統一的 Base 匯入
+
+class NotificationOutbox(Base):
+    """通知發件匣模型，每筆為一位使用者在一次通知中的一份訊息"""
+    __tablename__ = 'notification_outbox'
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(20), nullable=False)            # weather / news
+    run_key = Column(String(50), nullable=False)         # 同一次通知的識別（如日期），重跑時不重複建立
+    topic = Column(String(100), nullable=False)          # 同一次通知中區分同一使用者的多份訊息（如訂閱地點、分類）
+    line_user_id = Column(String(100), nullable=False)
+    messages = Column(JSONB, nullable=False)
+    retry_key = Column(UUID(as_uuid=False), nullable=False)  # 同一批 multicast 共用，重送時 LINE 據此去重
+    status = Column(String(20), nullable=False, default='pending')  # pending / sending / sent / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    locked_until = Column(TIMESTAMP)                     # 發送租約到期或下次重試的時間
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP, default=lambda: datetime.now(timezone.utc))
+    sent_at = Column(TIMESTAMP)
+
+    __table_args__ = (
+        UniqueConstraint('kind', 'run_key', 'topic', 'line_user_id', name='uq_outbox_run_topic_user'),
+        Index('idx_outbox_claim', 'kind', 'status', 'id'),
+        Index('idx_outbox_retry_key', 'retry_key', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<NotificationOutbox(kind='{self.kind}', user='{self.line_user_id}', status='{self.status}')>"
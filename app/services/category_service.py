@@ -0,0 +1,35 @@
+"""
+app/services/category_service.py
+
+將資料庫的 news_categories 加入共用的類別表：
+1. 類別表合併 categories.json（可爬取）與 news_categories（可訂閱），兩者不一致時記錄警告
+2. 爬蟲、通知與指令處理都查詢同一份記憶體中的快照，不再各自讀檔或查詢資料庫
+3. 每隔 CATEGORY_REFRESH_SECONDS 秒重新讀取一次，配置檔變更時也會重新載入
+"""
+from typing import Dict
+
+from sqlalchemy import select
+
+from app.config.settings import settings
+from app.database.connection import db_manager
+from app.models.news import NewsCategory
+from scraper.spiders.cna.category_registry import CategorySnapshot, category_registry
+
+
+def load_news_categories() -> Dict[str, str]:
+    """讀取資料庫中的新聞類別"""
+    # 使用獨立連線：重新載入可能發生在呼叫端的 session 之中，
+    # 而 get_session 取得的是同一執行緒共用的 scoped session，結束時會關閉呼叫端的 session
+    stmt = select(NewsCategory.category_key, NewsCategory.category_name)
+    with db_manager.engine.connect() as conn:
+        return {key: name for key, name in conn.execute(stmt)}
+
+
+def get_categories() -> CategorySnapshot:
+    """目前的類別表快照"""
+    return category_registry.snapshot()
+
+
+# 行程共用的類別表加入資料庫來源
+category_registry.refresh_interval = settings.category_refresh_seconds
+category_registry.add_source('news_categories', load_news_categories)
@@ -0,0 +1,135 @@
+"""
+app/services/job_lock.py
+
+以 PostgreSQL advisory lock 選出排程主節點：
+1. 每個行程（如 gunicorn worker）都啟動排程器，但只有持有鎖的主節點執行排程任務
+2. 鎖綁定在專用的資料庫連線上，主節點行程結束或連線中斷時由資料庫自動釋放
+3. 非主節點定期嘗試取得鎖，排程任務觸發時也會先嘗試，主節點失效後由其他節點接手
+"""
+import threading
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+class LeaderElection:
+    """以 session 層級 advisory lock 實作的主節點選舉"""
+
+    def __init__(self, engine: Engine, name: str = 'scheduler', retry_interval: float = 15):
+        """
+        初始化主節點選舉
+
+        Args:
+            engine: 資料庫引擎，主節點會長期佔用其中一個連線
+            name: 鎖名稱，同名的行程彼此競爭
+            retry_interval: 非主節點嘗試取得鎖、主節點檢查連線的間隔秒數
+        """
+        self.engine = engine
+        self.name = name
+        self.retry_interval = retry_interval
+        self._conn: Optional[Connection] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """目前是否為主節點"""
+        return self._conn is not None
+
+    def _drop_connection(self) -> None:
+        """捨棄持有鎖的連線，連線關閉後資料庫會釋放鎖"""
+        if self._conn is None:
+            return
+        try:
+            self._conn.invalidate()
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def try_acquire(self) -> bool:
+        """
+        嘗試成為主節點，已是主節點時確認連線仍然有效
+
+        Returns:
+            bool: 是否為主節點
+        """
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text("SELECT 1"))
+                    # 結束自動開始的交易，避免連線長期 idle in transaction
+                    # （阻擋 vacuum，且可能被 idle_in_transaction_session_timeout 中斷而失去鎖）
+                    self._conn.rollback()
+                    return True
+                except Exception as e:
+                    logger.error(f"主節點連線中斷，放棄 {self.name} 鎖: {str(e)}")
+                    self._drop_connection()
+                    return False
+
+            conn = None
+            try:
+                conn = self.engine.connect()
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(hashtext(:name))"), {'name': self.name}
+                ).scalar()
+                # 避免連線停留在交易中
+                conn.commit()
+            except Exception as e:
+                logger.error(f"取得 {self.name} 鎖失敗: {str(e)}")
+                if conn is not None:
+                    conn.invalidate()
+                    conn.close()
+                return False
+
+            if not acquired:
+                conn.close()
+                return False
+            self._conn = conn
+            logger.info(f"成為 {self.name} 主節點")
+            return True
+
+    def release(self) -> None:
+        """釋放鎖並歸還連線"""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:name))"), {'name': self.name}
+                )
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+            except Exception:
+                self._drop_connection()
+            logger.info(f"已釋放 {self.name} 主節點鎖")
+
+    def _run(self) -> None:
+        """背景執行緒：定期選舉與檢查連線"""
+        while not self._stop.is_set():
+            self.try_acquire()
+            self._stop.wait(self.retry_interval)
+
+    def start(self) -> None:
+        """開始在背景參與選舉"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止選舉並釋放鎖，讓其他節點接手"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.retry_interval)
+            self._thread = None
+        self.release()
@@ -1,9 +1,15 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from sqlalchemy.orm import scoped_session
 from app.database.connection import db_manager
-from scraper.spiders.cna.cna_spider import CnaSpider
+from app.etl.crawl_coordinator import CrawlCoordinator
+from app.etl.news_pipeline import NewsETLPipeline
+from app.services.job_lock import LeaderElection
 from line_broker.broker import NotificationBroker
+from line_broker.outbox import default_run_key
 from app.config.settings import settings
 from scraper.utils.logger import setup_logger
 # 使用自定義的logger設置
@@ -13,10 +19,14 @@ logger = setup_logger(__name__)
 scheduler = None
 
 class SchedulerService:
+    # 分類入庫後發送新聞通知的執行緒數
+    NEWS_NOTIFY_WORKERS = 2
+
     def __init__(self, app=None):
         self.app = app
         self.scheduler = BackgroundScheduler()
         self.session_factory = None
+        self.leader: Optional[LeaderElection] = None
         
         if app is not None:
             self.init_app(app)
@@ -41,21 +51,55 @@ class SchedulerService:
         return self.session_factory()
 
     def _crawl_job(self):
-        """排程任務：執行新聞爬蟲並存入資料庫"""
+        """排程任務：執行新聞ETL，每個分類入庫後立即發送該分類的新聞通知"""
+        logger.info("開始執行新聞爬蟲任務")
         session = self._get_db_session()
         try:
-            # 爬取所有訂閱類別的新聞
-            categories = ['acul', 'aie', 'ait']  # 可從資料庫動態獲取
-            # categories = session.query(SubNews.news_category_key).distinct().all()
-            for category in categories:
-                spider = CnaSpider(category=category)
-                for article in spider.crawl():
-                    # 這裡需實作將文章存入資料庫的邏輯
-                    logger.info(f"爬取到文章: {article.title}")
+            categories = CrawlCoordinator.load_subscribed_categories(session)
         except Exception as e:
             logger.error(f"排程任務執行失敗: {str(e)}")
+            return
         finally:
             session.close()
+            self.session_factory.remove()
+        
+        run_key = default_run_key()
+        loaded: List[str] = []
+        try:
+            with ThreadPoolExecutor(self.NEWS_NOTIFY_WORKERS, thread_name_prefix='news-notify') as notify_pool:
+                def _on_category_loaded(category: str) -> None:
+                    # 以目前已入庫的分類發送，不必等待其他分類爬完
+                    loaded.append(category)
+                    notify_pool.submit(self._notify_news, list(loaded), run_key)
+                
+                pipeline = NewsETLPipeline(
+                    categories=categories,
+                    on_category_loaded=_on_category_loaded if settings.line_channel_token else None
+                )
+                pipeline.run()
+                
+                # 爬取失敗的分類以資料庫中既有的新聞補發，已發送的收件者不會重複
+                if settings.line_channel_token and len(loaded) < len(pipeline.coordinator.categories):
+                    notify_pool.submit(self._notify_news, None, run_key)
+        except Exception as e:
+            logger.error(f"排程任務執行失敗: {str(e)}")
+        finally:
+            logger.info(f"新聞爬蟲任務完成，已入庫分類: {loaded}")
+    
+    def _notify_news(self, categories: Optional[List[str]], run_key: str):
+        """排程任務：發送新聞已就緒分類的通知"""
+        session = self._get_db_session()
+        try:
+            broker = NotificationBroker(
+                db_session=session,
+                line_token=settings.line_channel_token
+            )
+            broker.send_news_notifications(run_key=run_key, categories=categories)
+        except Exception as e:
+            logger.error(f"新聞通知任務執行失敗: {str(e)}")
+        finally:
+            session.close()
+            self.session_factory.remove()
     
     def _notify_weather(self):
         """排程任務：執行天氣通知"""
@@ -81,18 +125,36 @@ class SchedulerService:
             self.session_factory.remove()  # 然後清理線程本地存儲
             logger.info("天氣通知任務完成")
         
+    def _leader_only(self, job: Callable[[], None]) -> Callable[[], None]:
+        """包裝排程任務，只在主節點執行；任務觸發時先嘗試取得主節點，避免主節點剛失效時漏跑"""
+        @functools.wraps(job)
+        def _run():
+            if not self.leader.try_acquire():
+                logger.info(f"非排程主節點，略過任務 {job.__name__}")
+                return
+            job()
+        return _run
+    
     def start(self):
         """啟動排程器"""
-        # 每天早上八點執行新聞爬蟲
+        # 每個 worker 都啟動排程器，由資料庫鎖選出唯一執行任務的主節點
+        self.leader = LeaderElection(
+            db_manager.engine,
+            name=settings.scheduler_lock_name,
+            retry_interval=settings.scheduler_leader_retry_seconds
+        )
+        self.leader.start()
+        
+        # 每天早上七點半執行新聞爬蟲，各分類入庫後接著發送新聞通知，避免與天氣通知同時進行
         self.scheduler.add_job(
-            self._crawl_job,
-            trigger=CronTrigger(hour=8, minute=0),
+            self._leader_only(self._crawl_job),
+            trigger=CronTrigger(hour=7, minute=30),
             max_instances=1
         )
         
         # 每天早上八點執行天氣通知
         self.scheduler.add_job(
-            self._notify_weather,
+            self._leader_only(self._notify_weather),
             trigger=CronTrigger(hour=8, minute=0),
             max_instances=1
         )
@@ -100,7 +162,7 @@ class SchedulerService:
         # 添加一個測試任務，用於開發階段測試（每分鐘執行一次）
         if self.app and settings.scheduler_debug:
             self.scheduler.add_job(
-                self._notify_weather,
+                self._leader_only(self._notify_weather),
                 trigger=CronTrigger(second='*/10'),  # 每10秒執行一次，用於測試
                 max_instances=1,
                 id='weather_test_job'
@@ -114,4 +176,7 @@ class SchedulerService:
         """關閉排程器"""
         if self.scheduler.running:
             self.scheduler.shutdown()
-            logger.info("排程服務已關閉") 
\ No newline at end of file
+            logger.info("排程服務已關閉")
+        # 釋放主節點鎖，讓其他 worker 立即接手
+        if self.leader is not None:
+            self.leader.stop() 
\ No newline at end of file
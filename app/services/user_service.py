@@ -0,0 +1,175 @@
+"""
+app/services/user_service.py
+
+Webhook 使用的使用者服務：
+1. 以 line_user_id 快取使用者身分與訂閱摘要（TTL + LRU），已知使用者的查詢不需存取資料庫
+2. 註冊時寫入資料庫並同步更新快取；訂閱變更後使快取失效，下次查詢重新載入
+3. 整個行程共用一個實例，Webhook 處理函式不再為每個事件建立 broker
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload
+
+from app.config.settings import settings
+from app.database.connection import db_manager
+from app.models.user import User
+from scraper.utils.logger import setup_logger
+from scraper.utils.ttl_cache import TTLCache
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """快取中的使用者資料，不綁定資料庫 session，可跨執行緒共用"""
+    id: int
+    line_user_id: str
+    user_name: str
+    is_registered: bool
+    news_categories: Tuple[str, ...] = ()
+    weather_locations: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_model(cls, user: User) -> "UserIdentity":
+        """由 User 模型建立"""
+        return cls(
+            id=user.id,
+            line_user_id=user.line_user_id,
+            user_name=user.user_name,
+            is_registered=bool(user.is_registered),
+            news_categories=tuple(sorted(sub.news_category_key for sub in user.sub_news)),
+            weather_locations=tuple(sub.location_name for sub in user.sub_weathers)
+        )
+
+
+class UserService:
+    """使用者查詢與註冊，查詢結果以 line_user_id 快取"""
+
+    def __init__(self, cache_size: int = 10000, cache_ttl: float = 600):
+        """
+        初始化使用者服務
+
+        Args:
+            cache_size: 最多快取的使用者數
+            cache_ttl: 每位使用者資料的快取秒數，也是其他行程修改資料後最長的不一致時間
+        """
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @property
+    def cache(self) -> TTLCache:
+        """使用者快取，供觀察命中率"""
+        return self._cache
+
+    def _load(self, line_user_id: str) -> Optional[UserIdentity]:
+        """從資料庫載入使用者與訂閱"""
+        with db_manager.get_session() as session:
+            user = (
+                session.query(User)
+                .options(selectinload(User.sub_news), selectinload(User.sub_weathers))
+                .filter_by(line_user_id=line_user_id)
+                .first()
+            )
+            return UserIdentity.from_model(user) if user else None
+
+    def get(self, line_user_id: str) -> Optional[UserIdentity]:
+        """
+        取得使用者，快取期間內不存取資料庫
+
+        Args:
+            line_user_id: LINE user ID
+
+        Returns:
+            Optional[UserIdentity]: 使用者資料，未註冊時為None
+        """
+        return self._cache.get_or_load(line_user_id, lambda: self._load(line_user_id))
+
+    def register_many(self, line_user_ids: Iterable[str]) -> Dict[str, UserIdentity]:
+        """
+        以單一語句註冊多位使用者，已存在者更新最後活動時間並標記為已註冊，並寫入快取
+
+        Args:
+            line_user_ids: LINE user ID
+
+        Returns:
+            Dict[str, UserIdentity]: LINE user ID 對應的使用者資料
+        """
+        user_ids = list(dict.fromkeys(line_user_ids))
+        if not user_ids:
+            return {}
+        now = datetime.now()
+        stmt = insert(User).values([
+            {
+                'line_user_id': user_id,
+                'user_name': '新用戶',
+                'is_registered': True,
+                'registration_date': now,
+                'last_active': now
+            }
+            for user_id in user_ids
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['line_user_id'],
+            set_={'last_active': stmt.excluded.last_active, 'is_registered': True}
+        ).returning(
+            User.id, User.line_user_id, User.user_name, User.is_registered,
+            literal_column('(xmax = 0)').label('inserted')
+        )
+
+        with db_manager.get_session() as session:
+            rows = session.execute(stmt).all()
+
+        users = {}
+        existing: List[str] = []
+        for row in rows:
+            if row.inserted:
+                # 新使用者沒有訂閱，直接寫入快取
+                users[row.line_user_id] = UserIdentity(
+                    id=row.id,
+                    line_user_id=row.line_user_id,
+                    user_name=row.user_name,
+                    is_registered=bool(row.is_registered)
+                )
+                self._cache.set(row.line_user_id, users[row.line_user_id])
+                logger.info(f"新用戶註冊成功: {row.line_user_id}")
+            else:
+                existing.append(row.line_user_id)
+
+        # 已存在的使用者保留快取中的訂閱摘要；沒有快取、快取為未註冊，
+        # 或快取了「查無使用者」（由其他行程註冊）時使快取失效並重新載入
+        for user_id in existing:
+            cached = self._cache.get(user_id)
+            if cached is None or not cached.is_registered:
+                self._cache.delete(user_id)
+            users[user_id] = self.get(user_id)
+        return users
+
+    def get_or_register(self, line_user_id: str) -> UserIdentity:
+        """
+        取得使用者，尚未註冊時自動註冊
+
+        Args:
+            line_user_id: LINE user ID
+
+        Returns:
+            UserIdentity: 使用者資料
+        """
+        user = self.get(line_user_id)
+        if user is None:
+            user = self.register_many([line_user_id])[line_user_id]
+        return user
+
+    def invalidate(self, line_user_id: str) -> None:
+        """使用者或其訂閱變更後使快取失效"""
+        self._cache.delete(line_user_id)
+
+
+# 整個行程共用的使用者服務
+user_service = UserService(
+    cache_size=settings.user_cache_size,
+    cache_ttl=settings.user_cache_ttl
+)
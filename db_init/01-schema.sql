@@ -23,6 +23,15 @@ CREATE TABLE IF NOT EXISTS news_articles (
     FOREIGN KEY (news_category_key) REFERENCES news_categories(category_key)
 );
 
+-- 創建新聞爬取進度表，記錄各分類已入庫的最新文章（增量爬取水位線）
+CREATE TABLE IF NOT EXISTS news_crawl_state (
+    news_category_key VARCHAR(50) PRIMARY KEY,
+    last_publish_time TIMESTAMP NOT NULL,
+    last_url VARCHAR(1000) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (news_category_key) REFERENCES news_categories(category_key) ON DELETE CASCADE
+);
+
 -- 創建使用者表
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
@@ -51,4 +60,24 @@ CREATE TABLE IF NOT EXISTS sub_news (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (news_category_key) REFERENCES news_categories(category_key) ON DELETE CASCADE,
     CONSTRAINT uq_user_news_category UNIQUE (user_id, news_category_key)
-); 
\ No newline at end of file
+);
+
+-- 創建通知發件匣，每筆為一位使用者在一次通知中的一份訊息，發送中斷後可續傳且不重複發送
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    run_key VARCHAR(50) NOT NULL,
+    topic VARCHAR(100) NOT NULL,
+    line_user_id VARCHAR(100) NOT NULL,
+    messages JSONB NOT NULL,
+    retry_key UUID NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+    CONSTRAINT uq_outbox_run_topic_user UNIQUE (kind, run_key, topic, line_user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_claim ON notification_outbox (kind, status, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_retry_key ON notification_outbox (retry_key, id);
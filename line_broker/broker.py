@@ -5,20 +5,29 @@ line_broker/broker.py
 1. 讀取資料庫中的訂閱資訊
 2. 根據訂閱類型（天氣/新聞）獲取相應資料
 3. 格式化訊息
-4. 發送 LINE 通知
+4. 寫入通知發件匣，由工作執行緒認領並發送 LINE 通知
 """
 
 from scraper.utils.logger import setup_logger
+from scraper.utils.rate_limiter import TokenBucket
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.orm import Session, aliased, contains_eager, lazyload
+from sqlalchemy import desc, func
+
+from app.config.settings import settings
 
 from app.models.user import User, SubWeather, SubNews
+from app.services.category_service import get_categories
+from app.services.user_service import user_service
 from app.models.news import NewsArticle, NewsCategory
 from owm_weather.Weather_station import WeatherStation
-from .line_notification import LineNotification
+from .line_client import LineClient
+from .outbox import Outbox, default_run_key
 
 from owm_weather.utils import trans_temp_k2c
 
@@ -32,7 +41,9 @@ class NotificationBroker:
         self,
         db_session: Session,
         line_token: str,
-        owm_api_key: Optional[str] = None
+        owm_api_key: Optional[str] = None,
+        weather_workers: Optional[int] = None,
+        line_workers: Optional[int] = None
     ):
         """
         初始化通知代理
@@ -41,16 +52,38 @@ class NotificationBroker:
             db_session: SQLAlchemy session，用於資料庫操作
             line_token: LINE Channel Access Token
             owm_api_key: OpenWeatherMap API Key（可選，僅在需要發送天氣通知時必須）
+            weather_workers: 天氣查詢的執行緒數，未指定時依設定檔
+            line_workers: LINE 推播的執行緒數，未指定時依設定檔
         """
         self.session = db_session
         self.line_token = line_token
+        self.weather_workers = max(1, weather_workers or settings.notify_weather_workers)
         self.weather_station = (
-            WeatherStation(owm_api_key=owm_api_key) if owm_api_key else None
+            WeatherStation(
+                owm_api_key=owm_api_key,
+                grid_precision=settings.weather_grid_precision,
+                cache_ttl=settings.weather_cache_ttl,
+                pool_size=self.weather_workers
+            ) if owm_api_key else None
+        )
+        self.line_workers = max(1, line_workers or settings.notify_line_workers)
+        
+        # OWM 請求速率限制，由天氣查詢池內的所有執行緒共用
+        self.weather_limiter = TokenBucket(settings.owm_rate_limit)
+        
+        # 整個發送流程共用同一個 LINE 用戶端（連線池與速率限制）
+        self.line_client = LineClient(
+            line_token,
+            rate_limit=settings.line_rate_limit,
+            pool_size=self.line_workers
         )
+        
+        # 通知先寫入發件匣再由工作執行緒認領發送，中斷後重跑可續傳且不重複發送
+        self.outbox = Outbox(self.session.get_bind(), self.line_client)
     
     def _get_weather_data(self, longitude: float, latitude: float) -> Dict:
         """
-        獲取指定位置的天氣資料
+        獲取指定位置的天氣資料（同一網格共用快取）
         
         Args:
             longitude: 經度
@@ -61,31 +94,47 @@ class NotificationBroker:
         """
         if not self.weather_station:
             raise ValueError("Weather station not initialized. Missing OWM API key.")
-        return self.weather_station._get_data_by_coord(longitude, latitude)
+        return self.weather_station.get_weather(longitude, latitude)
     
-    def _get_latest_news(
-        self, 
-        category_key: str, 
+    def _get_latest_news_by_categories(
+        self,
+        category_keys: List[str],
         limit: int = 5
-    ) -> List[NewsArticle]:
+    ) -> Dict[str, List[NewsArticle]]:
         """
-        獲取指定分類的最新新聞
+        以單一查詢獲取多個分類各自的最新新聞
         
         Args:
-            category_key: 新聞分類代碼
-            limit: 獲取的新聞數量（預設5則）
+            category_keys: 新聞分類代碼列表
+            limit: 每個分類獲取的新聞數量（預設5則）
             
         Returns:
-            新聞文章列表
+            分類代碼對應的新聞文章列表
         """
-        return (
-            self.session.query(NewsArticle)
-            .filter(NewsArticle.news_category_key == category_key)
-            .order_by(desc(NewsArticle.publish_time))
-            .limit(limit)
+        ranked = (
+            self.session.query(
+                NewsArticle,
+                func.row_number().over(
+                    partition_by=NewsArticle.news_category_key,
+                    order_by=desc(NewsArticle.publish_time)
+                ).label('rank')
+            )
+            .filter(NewsArticle.news_category_key.in_(category_keys))
+            .subquery()
+        )
+        article = aliased(NewsArticle, ranked)
+        rows = (
+            self.session.query(article)
+            .filter(ranked.c.rank <= limit)
+            .order_by(article.news_category_key, desc(article.publish_time))
             .all()
         )
         
+        latest: Dict[str, List[NewsArticle]] = defaultdict(list)
+        for row in rows:
+            latest[row.news_category_key].append(row)
+        return latest
+    
     def _format_weather_msg(self, msg):
         """
         格式化天氣訊息
@@ -135,6 +184,7 @@ class NotificationBroker:
                 user = User(line_user_id=user_id)
                 self.session.add(user)
                 self.session.commit()
+                user_service.invalidate(user_id)
                 logger.info(f"新用戶註冊成功: {user_id}")
             return user
         except Exception as e:
@@ -142,96 +192,259 @@ class NotificationBroker:
             logger.error(f"用戶註冊失敗: {str(e)}")
             raise
     
-    def send_weather_notifications(self) -> None:
-        """發送天氣通知給所有訂閱者"""
-        logger.info("開始發送天氣通知...")
+    def _fetch_weather_cell(self, cell: Tuple[float, float]) -> Dict:
+        """在工作執行緒中查詢單一網格的天氣"""
+        self.weather_limiter.acquire()
+        return self._get_weather_data(longitude=cell[0], latitude=cell[1])
+    
+    def _deliver_outbox(self, kind: str, run_key: str, planning_failed: int = 0) -> Dict[str, int]:
+        """
+        發送發件匣中此次通知的資料並彙整統計
+        
+        Args:
+            kind: 通知類型
+            run_key: 通知批次識別
+            planning_failed: 規劃階段即失敗、未寫入發件匣的筆數
+            
+        Returns:
+            發送統計 {'total', 'sent', 'failed', 'pending'}，pending 為稍後再重試或由其他工作發送中的筆數
+        """
+        started = time.monotonic()
+        counts = self.outbox.deliver(kind, run_key, workers=self.line_workers)
+        stats = self.outbox.stats(kind, run_key)
+        logger.info(
+            f"{kind} 發件匣本次發送成功 {counts['sent']} 筆、放棄 {counts['failed']} 筆，"
+            f"耗時 {time.monotonic() - started:.1f} 秒"
+        )
+        return {
+            'total': stats['total'] + planning_failed,
+            'sent': stats['sent'],
+            'failed': stats['failed'] + planning_failed,
+            'pending': stats['pending'] + stats['sending'],
+        }
+    
+    def send_weather_notifications(self, run_key: Optional[str] = None) -> Dict[str, int]:
+        """
+        發送天氣通知給所有訂閱者
+        
+        訂閱先依經緯度網格分組，每格只查詢一次天氣，格式化後的訊息批次寫入發件匣，
+        再由多個執行緒認領發送。同一個 run_key 重跑時，已寫入的訂閱不再查詢天氣，
+        已發送的不再推播，只補完中斷時尚未完成的部分。
+        
+        Args:
+            run_key: 通知批次識別，未指定時為當天日期
+            
+        Returns:
+            發送統計 {'total': 訂閱數, 'sent': 成功數, 'failed': 失敗數, 'pending': 尚待重試數}
+        """
+        run_key = run_key or default_run_key()
+        logger.info(f"開始發送天氣通知（{run_key}）...")
         
         # 獲取所有天氣訂閱資訊
         weather_subs = (
             self.session.query(SubWeather)
             .join(User)
+            .options(contains_eager(SubWeather.user))
             .filter(User.is_registered == True)
             .all()
         )
         
         if not weather_subs:
             logger.info("沒有天氣訂閱資料")
-            return
-        
-        for sub in weather_subs:
-            try:
-                # 獲取天氣資料
-                weather_data = self._get_weather_data(
-                    longitude=sub.longitude,
-                    latitude=sub.latitude
-                )
-                
-                # 準備使用者資料
-                user_data = {
-                    "user": sub.user.user_name,
-                    "user_id": sub.user.line_user_id,
-                    "location_name": sub.location_name
-                }
-                
-                # 發送通知
-                notifier = LineNotification(self.line_token, user_data)
-                msg = self._format_weather_msg(weather_data)
-                status, response = notifier.notify(msg)
-                logger.info(
-                    f"天氣通知發送成功 - 使用者: {sub.user.user_name}, "
-                    f"地點: {sub.location_name}, status: {status}"
-                )
-                
-            except Exception as e:
-                logger.error(
-                    f"天氣通知發送失敗 - 使用者: {sub.user.user_name}, "
-                    f"地點: {sub.location_name}, error: {str(e)}"
-                )
+            return {'total': 0, 'sent': 0, 'failed': 0, 'pending': 0}
+        
+        # ORM 物件不能跨執行緒使用，先取出發送所需的資料；已寫入發件匣的訂閱略過
+        planned = self.outbox.planned('weather', run_key)
+        jobs = [
+            {
+                "topic": f"weather:{sub.id}",
+                "user": sub.user.user_name,
+                "user_id": sub.user.line_user_id,
+                "location_name": sub.location_name,
+                "longitude": sub.longitude,
+                "latitude": sub.latitude
+            }
+            for sub in weather_subs
+            if (f"weather:{sub.id}", sub.user.line_user_id) not in planned
+        ]
+        
+        planning_failed = 0
+        if jobs:
+            if not self.weather_station:
+                raise ValueError("Weather station not initialized. Missing OWM API key.")
+            # 先在主執行緒建立 OWM 用戶端，避免工作執行緒重複初始化
+            self.weather_station.owm
+            
+            # 同一網格的訂閱共用一次天氣查詢
+            cells: Dict[Tuple[float, float], List[Dict]] = defaultdict(list)
+            for job in jobs:
+                cells[self.weather_station.grid_cell(job['longitude'], job['latitude'])].append(job)
+            logger.info(
+                f"{len(jobs)} 筆天氣訂閱待規劃（已寫入 {len(weather_subs) - len(jobs)} 筆），"
+                f"分布於 {len(cells)} 個網格"
+            )
+            
+            deliveries = []
+            with ThreadPoolExecutor(self.weather_workers, thread_name_prefix='weather') as weather_pool:
+                futures = {weather_pool.submit(self._fetch_weather_cell, cell): cell for cell in cells}
+                for future in as_completed(futures):
+                    cell_jobs = cells[futures[future]]
+                    try:
+                        message = self._format_weather_msg(future.result())
+                    except Exception as e:
+                        # 未寫入發件匣，重跑時會再次查詢
+                        planning_failed += len(cell_jobs)
+                        for job in cell_jobs:
+                            logger.error(
+                                f"天氣查詢失敗 - 使用者: {job['user']}, "
+                                f"地點: {job['location_name']}, error: {str(e)}"
+                            )
+                        continue
+                    deliveries.extend((job['topic'], [message], [job['user_id']]) for job in cell_jobs)
+            self.outbox.enqueue('weather', run_key, deliveries)
+        
+        report = self._deliver_outbox('weather', run_key, planning_failed)
+        logger.info(
+            f"天氣通知完成: 共 {report['total']} 筆，成功 {report['sent']} 筆，"
+            f"失敗 {report['failed']} 筆，待重試 {report['pending']} 筆"
+        )
+        return report
     
-    def send_news_notifications(self) -> None:
-        """發送新聞通知給所有訂閱者"""
-        logger.info("開始發送新聞通知...")
+    def _render_category_messages(self, news_subs: List[SubNews]) -> Dict[str, str]:
+        """
+        以單一查詢取得所有被訂閱分類的最新新聞，每個分類只格式化一次
         
-        # 獲取所有新聞訂閱資訊
+        Args:
+            news_subs: 新聞訂閱列表
+            
+        Returns:
+            分類代碼對應的新聞訊息
+        """
+        categories = get_categories()
+        names = {sub.news_category_key: categories.name(sub.news_category_key) for sub in news_subs}
+        snapshot = self._get_latest_news_by_categories(list(names))
+        logger.info(
+            f"新聞快照: {len(names)} 個分類共 {sum(len(v) for v in snapshot.values())} 則新聞"
+        )
+        return {
+            key: self._format_news_message(name, snapshot.get(key, []))
+            for key, name in names.items()
+        }
+    
+    def _plan_category_deliveries(
+        self,
+        news_subs: List[SubNews],
+        rendered: Dict[str, str]
+    ) -> Dict[Tuple[str, Tuple[str, ...]], List[str]]:
+        """每筆訂閱一則訊息，以分類代碼為 topic，相同內容的收件者合併"""
+        recipients: Dict[Tuple[str, Tuple[str, ...]], List[str]] = defaultdict(list)
+        for sub in news_subs:
+            key = sub.news_category_key
+            recipients[(key, (rendered[key],))].append(sub.user.line_user_id)
+        return recipients
+    
+    def _plan_digest_deliveries(
+        self,
+        news_subs: List[SubNews],
+        rendered: Dict[str, str]
+    ) -> Dict[Tuple[str, Tuple[str, ...]], List[str]]:
+        """每位使用者一份摘要：所有訂閱分類各一則訊息，合併在同一個請求中發送"""
+        user_categories: Dict[str, List[str]] = defaultdict(list)
+        for sub in news_subs:
+            user_categories[sub.user.line_user_id].append(sub.news_category_key)
+        
+        # 訂閱相同分類組合的使用者收到相同的摘要
+        recipients: Dict[Tuple[str, Tuple[str, ...]], List[str]] = defaultdict(list)
+        for user_id, category_keys in user_categories.items():
+            digest = tuple(rendered[key] for key in sorted(category_keys))
+            recipients[('digest', digest)].append(user_id)
+        return recipients
+    
+    @staticmethod
+    def _filter_ready_subscriptions(
+        news_subs: List[SubNews],
+        categories: Iterable[str],
+        digest: bool
+    ) -> List[SubNews]:
+        """
+        只保留新聞已就緒的訂閱
+        
+        分類模式保留分類已就緒的訂閱；摘要模式需等使用者訂閱的所有分類都就緒才保留。
+        """
+        ready = set(categories)
+        if not digest:
+            return [sub for sub in news_subs if sub.news_category_key in ready]
+        pending_users = {
+            sub.user.line_user_id for sub in news_subs if sub.news_category_key not in ready
+        }
+        return [sub for sub in news_subs if sub.user.line_user_id not in pending_users]
+    
+    def send_news_notifications(
+        self,
+        digest: Optional[bool] = None,
+        run_key: Optional[str] = None,
+        categories: Optional[Iterable[str]] = None
+    ) -> Dict[str, int]:
+        """
+        發送新聞通知給所有訂閱者
+        
+        摘要模式下每位使用者只收到一次推播，內含所有訂閱分類；
+        否則每筆訂閱各發送一則訊息。兩種模式都依訊息內容將收件者分組寫入發件匣，
+        以 multicast 每次發送給最多500位使用者，而非逐一推播。
+        同一個 run_key 重跑時，已寫入的收件者不再重複建立，只補完尚未發送的部分，
+        因此可在每個分類入庫後以目前已就緒的分類重複呼叫。
+        
+        Args:
+            digest: 是否使用摘要模式，未指定時依設定檔
+            run_key: 通知批次識別，未指定時為當天日期
+            categories: 新聞已就緒的分類代碼，未指定時視為全部就緒
+            
+        Returns:
+            發送統計 {'total': 收件數, 'sent': 成功數, 'failed': 失敗數, 'pending': 尚待重試數}
+        """
+        digest = settings.news_digest if digest is None else digest
+        run_key = run_key or default_run_key()
+        logger.info(f"開始發送新聞通知（{'摘要' if digest else '分類'}模式，{run_key}）...")
+        
+        # 獲取所有新聞訂閱資訊，使用者隨同一個查詢載入，分類名稱由共用類別表提供
         news_subs = (
             self.session.query(SubNews)
             .join(User)
+            .options(contains_eager(SubNews.user), lazyload(SubNews.news_category))
             .filter(User.is_registered == True)
             .all()
         )
+        if categories is not None:
+            news_subs = self._filter_ready_subscriptions(news_subs, categories, digest)
         
         if not news_subs:
             logger.info("沒有新聞訂閱資料")
-            return
+            return {'total': 0, 'sent': 0, 'failed': 0, 'pending': 0}
         
-        for sub in news_subs:
-            try:
-                # 獲取最新新聞
-                articles = self._get_latest_news(sub.news_category_key)
-                
-                # 格式化訊息
-                news_message = self._format_news_message(
-                    sub.news_category.category_name,
-                    articles
-                )
-                
-                # 準備使用者資料
-                user_data = {
-                    "user": sub.user.user_name,
-                    "user_id": sub.user.line_user_id
-                }
-                
-                # 發送通知
-                notifier = LineNotification(self.line_token, user_data)
-                status, response = notifier.notify(news_message)
-                
-                logger.info(
-                    f"新聞通知發送成功 - 使用者: {sub.user.user_name}, "
-                    f"分類: {sub.news_category.category_name}, status: {status}"
-                )
-                
-            except Exception as e:
-                logger.error(
-                    f"新聞通知發送失敗 - 使用者: {sub.user.user_name}, "
-                    f"分類: {sub.news_category.category_name}, error: {str(e)}"
-                )
+        # 資料庫查詢次數與訂閱人數無關：一次載入訂閱與使用者、一次載入所有分類的新聞
+        rendered = self._render_category_messages(news_subs)
+        if digest:
+            recipients = self._plan_digest_deliveries(news_subs, rendered)
+        else:
+            recipients = self._plan_category_deliveries(news_subs, rendered)
+        
+        # 已寫入發件匣的收件者略過，其餘批次寫入
+        planned = self.outbox.planned('news', run_key)
+        deliveries = []
+        for (topic, messages), user_ids in recipients.items():
+            user_ids = [user_id for user_id in user_ids if (topic, user_id) not in planned]
+            if user_ids:
+                deliveries.append((topic, messages, user_ids))
+        logger.info(
+            f"{sum(len(user_ids) for user_ids in recipients.values())} 位收件者合併為 "
+            f"{len(recipients)} 種訊息，待寫入 {sum(len(d[2]) for d in deliveries)} 位"
+        )
+        if deliveries:
+            self.outbox.enqueue('news', run_key, deliveries)
+        
+        report = self._deliver_outbox('news', run_key)
+        logger.info(
+            f"新聞通知完成: 共 {report['total']} 筆，成功 {report['sent']} 筆，"
+            f"失敗 {report['failed']} 筆，待重試 {report['pending']} 筆"
+        )
+        return report
@@ -0,0 +1,325 @@
+"""
+line_broker/commands.py
+
+訂閱指令處理：
+1. 解析「訂閱天氣 [地點]」「訂閱新聞 [類別]」「取消天氣/新聞 [...]」「列表」等文字指令
+2. 新聞類別以共用類別表解析（代碼或名稱），地點以本地地名索引解析為座標
+3. 一批訊息的訂閱變更先依使用者合併（同一項目以最後一個指令為準），再以少數幾個批次語句寫入
+4. 寫入後使相關使用者的快取失效，列表指令讀取快取中的訂閱摘要
+"""
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Float, Integer, String, and_, column, delete, exists, select, tuple_, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.database.connection import db_manager
+from app.models.user import SubNews, SubWeather
+from app.services.category_service import CategorySnapshot, get_categories
+from app.services.user_service import UserIdentity, UserService, user_service
+from line_broker.gazetteer import Gazetteer, normalize_place_name
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+HELP_TEXT = (
+    "請使用以下指令操作：\n"
+    "- 訂閱天氣 [地點]\n"
+    "- 訂閱新聞 [類別]（可輸入多個，以空白分隔）\n"
+    "- 取消天氣 [地點]（未指定地點時取消全部）\n"
+    "- 取消新聞 [類別]（未指定類別時取消全部）\n"
+    "- 列表"
+)
+
+_COMMAND_PATTERN = re.compile(r'^(訂閱|取消訂閱|取消)\s*(天氣|新聞)\s*(.*)$', re.S)
+_LIST_COMMANDS = {'列表', '訂閱列表', '我的訂閱', '查詢訂閱'}
+_ARG_SEPARATORS = re.compile(r'[\s,，、]+')
+
+
+@dataclass(frozen=True)
+class Command:
+    """解析後的指令"""
+    action: str                       # subscribe / unsubscribe / list / help
+    kind: Optional[str] = None        # weather / news
+    args: Tuple[str, ...] = ()
+
+
+def parse_command(text: str) -> Command:
+    """
+    解析文字指令
+
+    Args:
+        text: 使用者輸入的文字
+
+    Returns:
+        Command: 指令，無法辨識時為 help
+    """
+    text = text.strip()
+    if text in _LIST_COMMANDS:
+        return Command('list')
+    match = _COMMAND_PATTERN.match(text)
+    if not match:
+        return Command('help')
+    verb, kind, rest = match.groups()
+    action = 'subscribe' if verb == '訂閱' else 'unsubscribe'
+    kind = 'weather' if kind == '天氣' else 'news'
+    rest = rest.strip()
+    if kind == 'weather':
+        # 地點名稱可能包含空白，整段視為一個地點
+        args = (rest,) if rest else ()
+    else:
+        args = tuple(arg for arg in _ARG_SEPARATORS.split(rest) if arg)
+    return Command(action, kind, args)
+
+
+@dataclass
+class _Operation:
+    """一則訊息中對單一項目的訂閱變更"""
+    user: UserIdentity
+    kind: str                          # weather / news
+    action: str                        # add / remove / clear
+    target: Optional[str] = None       # 類別代碼或地點名稱，clear 時為None
+    longitude: Optional[float] = None
+    latitude: Optional[float] = None
+    superseded: bool = False           # 被同一批次中之後的指令覆蓋
+
+
+@dataclass
+class _Message:
+    """一則訊息的解析結果與回覆內容"""
+    user: UserIdentity
+    command: Command
+    operations: List[_Operation] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _WriteResult:
+    """批次寫入後實際變更的 (訂閱類型, 使用者ID, 項目)"""
+    added: Set[Tuple[str, int, str]] = field(default_factory=set)
+    removed: Set[Tuple[str, int, str]] = field(default_factory=set)
+
+
+class SubscriptionCommandEngine:
+    """批次處理訂閱指令"""
+
+    def __init__(self, users: UserService, gazetteer: Gazetteer):
+        """
+        初始化指令處理
+
+        Args:
+            users: 使用者服務（查詢與快取失效）
+            gazetteer: 地名索引
+        """
+        self.users = users
+        self.gazetteer = gazetteer
+
+    @property
+    def categories(self) -> CategorySnapshot:
+        """共用類別表的目前快照"""
+        return get_categories()
+
+    def _plan(self, message: _Message) -> None:
+        """將訂閱指令轉為變更項目，無法解析的參數記錄在回覆中"""
+        command = message.command
+        if command.action not in ('subscribe', 'unsubscribe'):
+            return
+        if command.action == 'unsubscribe' and not command.args:
+            message.operations.append(_Operation(message.user, command.kind, 'clear'))
+            return
+        if command.action == 'subscribe' and not command.args:
+            message.notes.append(f"請指定{'地點' if command.kind == 'weather' else '類別'}，例如：" + (
+                "訂閱天氣 台北市" if command.kind == 'weather' else "訂閱新聞 科技"
+            ))
+            return
+
+        action = 'add' if command.action == 'subscribe' else 'remove'
+        if command.kind == 'news':
+            categories = self.categories
+            for arg in command.args:
+                key = categories.resolve(arg)
+                # 只能訂閱資料庫中存在的類別
+                if key is None or key not in categories.subscribable:
+                    message.notes.append(f"找不到新聞類別「{arg}」")
+                    continue
+                message.operations.append(_Operation(message.user, 'news', action, key))
+            return
+
+        place_name = command.args[0]
+        candidates = self.gazetteer.lookup(place_name)
+        if action == 'remove':
+            # 取消時以訂閱時保存的地點名稱比對
+            target = candidates[0].name if len(candidates) == 1 else normalize_place_name(place_name)
+            message.operations.append(_Operation(message.user, 'weather', 'remove', target))
+        elif len(candidates) > 1:
+            message.notes.append(
+                f"地點「{place_name}」有多個符合：{'、'.join(place.name for place in candidates)}，請輸入完整名稱"
+            )
+        elif not candidates:
+            message.notes.append(f"找不到地點「{place_name}」")
+        else:
+            place = candidates[0]
+            message.operations.append(
+                _Operation(message.user, 'weather', 'add', place.name, place.longitude, place.latitude)
+            )
+
+    @staticmethod
+    def _coalesce(operations: List[_Operation]) -> List[_Operation]:
+        """
+        依使用者與訂閱類型合併變更，同一項目只保留最後一個指令；
+        取消全部之前的變更被覆蓋，取消全部會先於之後的新增執行
+        """
+        clears: Dict[Tuple[str, int], _Operation] = {}
+        items: Dict[Tuple[str, int, str], _Operation] = OrderedDict()
+        for op in operations:
+            if op.action == 'clear':
+                for key in [key for key in items if key[:2] == (op.kind, op.user.id)]:
+                    items.pop(key).superseded = True
+                previous = clears.get((op.kind, op.user.id))
+                if previous is not None:
+                    previous.superseded = True
+                clears[(op.kind, op.user.id)] = op
+                continue
+            previous = items.pop((op.kind, op.user.id, op.target), None)
+            if previous is not None:
+                previous.superseded = True
+            items[(op.kind, op.user.id, op.target)] = op
+        return list(clears.values()) + list(items.values())
+
+    @staticmethod
+    def _write(session: Session, operations: List[_Operation]) -> _WriteResult:
+        """以批次語句寫入變更，執行順序為取消全部、取消單項、新增"""
+        result = _WriteResult()
+        clear = {kind: [op.user.id for op in operations if op.kind == kind and op.action == 'clear']
+                 for kind in ('news', 'weather')}
+        remove = {kind: [(op.user.id, op.target) for op in operations if op.kind == kind and op.action == 'remove']
+                  for kind in ('news', 'weather')}
+        news_adds = [op for op in operations if op.kind == 'news' and op.action == 'add']
+        weather_adds = [op for op in operations if op.kind == 'weather' and op.action == 'add']
+
+        if clear['news']:
+            rows = session.execute(
+                delete(SubNews).where(SubNews.user_id.in_(clear['news']))
+                .returning(SubNews.user_id, SubNews.news_category_key)
+            )
+            result.removed.update(('news', row[0], row[1]) for row in rows)
+        if clear['weather']:
+            rows = session.execute(
+                delete(SubWeather).where(SubWeather.user_id.in_(clear['weather']))
+                .returning(SubWeather.user_id, SubWeather.location_name)
+            )
+            result.removed.update(('weather', row[0], row[1]) for row in rows)
+        if remove['news']:
+            rows = session.execute(
+                delete(SubNews).where(tuple_(SubNews.user_id, SubNews.news_category_key).in_(remove['news']))
+                .returning(SubNews.user_id, SubNews.news_category_key)
+            )
+            result.removed.update(('news', row[0], row[1]) for row in rows)
+        if remove['weather']:
+            rows = session.execute(
+                delete(SubWeather).where(tuple_(SubWeather.user_id, SubWeather.location_name).in_(remove['weather']))
+                .returning(SubWeather.user_id, SubWeather.location_name)
+            )
+            result.removed.update(('weather', row[0], row[1]) for row in rows)
+
+        if news_adds:
+            stmt = (
+                insert(SubNews)
+                .values([{'user_id': op.user.id, 'news_category_key': op.target} for op in news_adds])
+                .on_conflict_do_nothing(constraint='uq_user_news_category')
+                .returning(SubNews.user_id, SubNews.news_category_key)
+            )
+            result.added.update(('news', row[0], row[1]) for row in session.execute(stmt))
+        if weather_adds:
+            # sub_weather 沒有唯一鍵，以 NOT EXISTS 略過已訂閱的地點
+            new_rows = values(
+                column('user_id', Integer),
+                column('longitude', Float),
+                column('latitude', Float),
+                column('location_name', String),
+                name='new_rows'
+            ).data([(op.user.id, op.longitude, op.latitude, op.target) for op in weather_adds])
+            stmt = insert(SubWeather).from_select(
+                ['user_id', 'longitude', 'latitude', 'location_name'],
+                select(new_rows).where(~exists().where(and_(
+                    SubWeather.user_id == new_rows.c.user_id,
+                    SubWeather.location_name == new_rows.c.location_name
+                )))
+            ).returning(SubWeather.user_id, SubWeather.location_name)
+            result.added.update(('weather', row[0], row[1]) for row in session.execute(stmt))
+        return result
+
+    def _label(self, op: _Operation) -> str:
+        """變更項目的顯示名稱"""
+        if op.kind == 'news':
+            return f"{self.categories.name(op.target)} 新聞"
+        return f"{op.target} 天氣"
+
+    def _format_list(self, user: Optional[UserIdentity]) -> str:
+        """訂閱列表回覆"""
+        if user is None or not (user.news_categories or user.weather_locations):
+            return "目前沒有任何訂閱\n" + HELP_TEXT
+        lines = ["目前的訂閱："]
+        if user.weather_locations:
+            lines.append(f"天氣：{'、'.join(user.weather_locations)}")
+        if user.news_categories:
+            lines.append(f"新聞：{'、'.join(self.categories.name(key) for key in user.news_categories)}")
+        return "\n".join(lines)
+
+    def _reply(self, message: _Message, result: _WriteResult) -> str:
+        """組成一則訊息的回覆"""
+        command = message.command
+        if command.action == 'help':
+            return HELP_TEXT
+        if command.action == 'list':
+            return self._format_list(self.users.get(message.user.line_user_id))
+
+        lines = []
+        for op in message.operations:
+            if op.action == 'clear':
+                lines.append(f"已取消所有{'天氣' if op.kind == 'weather' else '新聞'}訂閱")
+            elif op.action == 'add':
+                changed = op.superseded or (op.kind, op.user.id, op.target) in result.added
+                lines.append(f"已訂閱 {self._label(op)}" if changed else f"{self._label(op)} 已在訂閱中")
+            else:
+                changed = op.superseded or (op.kind, op.user.id, op.target) in result.removed
+                lines.append(f"已取消 {self._label(op)}" if changed else f"未訂閱 {self._label(op)}")
+        lines.extend(message.notes)
+        return "\n".join(lines) or HELP_TEXT
+
+    def handle(self, requests_: List[Tuple[str, str]]) -> List[str]:
+        """
+        處理一批文字訊息
+
+        Args:
+            requests_: (LINE user ID, 文字) 列表，依收到的順序
+
+        Returns:
+            List[str]: 每則訊息的回覆，順序與輸入相同
+        """
+        messages = []
+        for line_user_id, text in requests_:
+            message = _Message(self.users.get_or_register(line_user_id), parse_command(text))
+            self._plan(message)
+            messages.append(message)
+
+        operations = self._coalesce([op for message in messages for op in message.operations])
+        result = _WriteResult()
+        if operations:
+            with db_manager.get_session() as session:
+                result = self._write(session, operations)
+            for line_user_id in {op.user.line_user_id for op in operations}:
+                self.users.invalidate(line_user_id)
+            logger.info(
+                f"{len(messages)} 則指令合併為 {len(operations)} 項訂閱變更："
+                f"新增 {len(result.added)}，取消 {len(result.removed)}"
+            )
+        return [self._reply(message, result) for message in messages]
+
+
+# 整個行程共用的指令處理
+command_engine = SubscriptionCommandEngine(user_service, Gazetteer.from_file())
@@ -0,0 +1,171 @@
+"""
+line_broker/event_queue.py
+
+Webhook 事件的行程內佇列：
+1. Webhook 驗證簽章後只將事件放入佇列並立即回應，不在請求中存取資料庫或呼叫 LINE API
+2. 佇列有容量上限，已滿時整批拒絕，由呼叫端回應 503 讓 LINE 稍後重送
+3. 同一位使用者的事件固定由同一個工作執行緒處理，保持事件順序
+4. 工作執行緒一次取出多個事件，連續的同類型事件整批交給處理函式，合併資料庫寫入
+"""
+import queue
+import threading
+import time
+import zlib
+from itertools import groupby
+from typing import Callable, Dict, List, Optional, Sequence, Type
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+BatchHandler = Callable[[List[object]], None]
+
+
+class WebhookEventQueue:
+    """有容量上限、依使用者分流的事件佇列與工作執行緒"""
+
+    def __init__(
+        self,
+        handlers: Dict[Type, BatchHandler],
+        maxsize: int = 1000,
+        workers: int = 4,
+        batch_size: int = 50,
+        batch_wait: float = 0.05
+    ):
+        """
+        初始化事件佇列
+
+        Args:
+            handlers: 事件類別對應的批次處理函式，參數為同類別的事件列表
+            maxsize: 尚未處理完成的事件數上限
+            workers: 工作執行緒數
+            batch_size: 每次最多合併處理的事件數
+            batch_wait: 取得第一個事件後等待更多事件的秒數
+        """
+        self.handlers = handlers
+        self.maxsize = max(1, maxsize)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self._queues: List[queue.Queue] = [queue.Queue() for _ in range(max(1, workers))]
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    @property
+    def pending(self) -> int:
+        """尚未處理完成的事件數"""
+        return self._pending
+
+    def start(self) -> None:
+        """啟動工作執行緒（第一次放入事件時自動啟動）"""
+        if self._threads:
+            return
+        for index, events in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._worker, args=(events,), name=f'webhook-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    @staticmethod
+    def _user_key(event) -> str:
+        """事件來源的使用者，無法取得時為空字串"""
+        source = getattr(event, 'source', None)
+        return getattr(source, 'user_id', None) or ''
+
+    def submit(self, events: Sequence[object]) -> bool:
+        """
+        將一次 Webhook 的所有事件放入佇列
+
+        Args:
+            events: 已驗證簽章的事件
+
+        Returns:
+            bool: 是否接受；佇列已滿或已停止時整批拒絕
+        """
+        if not events:
+            return True
+        with self._lock:
+            if self._stopped or self._pending + len(events) > self.maxsize:
+                return False
+            self._pending += len(events)
+            self.start()
+        for event in events:
+            shard = zlib.crc32(self._user_key(event).encode()) % len(self._queues)
+            self._queues[shard].put(event)
+        return True
+
+    def _next_batch(self, events: queue.Queue) -> Optional[List[object]]:
+        """取出一批事件，收到停止訊號時回傳None"""
+        first = events.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                event = events.get(timeout=max(0.0, remaining)) if remaining > 0 else events.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                # 處理完這一批後再停止
+                events.put(None)
+                break
+            batch.append(event)
+        return batch
+
+    def _dispatch(self, batch: List[object]) -> None:
+        """
+        將連續的同類別事件合併後依序交給處理函式
+
+        只合併相鄰的事件，不跨類別重新排序，同一位使用者的事件（如封鎖後再加好友）依原順序處理
+        """
+        for event_type, run in groupby(batch, key=type):
+            events = list(run)
+            handler = self.handlers.get(event_type)
+            if handler is None:
+                logger.info(f"沒有 {event_type.__name__} 的處理函式，略過 {len(events)} 個事件")
+                continue
+            try:
+                handler(events)
+            except Exception as e:
+                logger.error(f"處理 {len(events)} 個 {event_type.__name__} 事件失敗: {str(e)}", exc_info=True)
+
+    def _worker(self, events: queue.Queue) -> None:
+        """工作執行緒：持續取出並處理事件"""
+        while True:
+            batch = self._next_batch(events)
+            if batch is None:
+                return
+            try:
+                self._dispatch(batch)
+            finally:
+                with self._lock:
+                    self._pending -= len(batch)
+                    if self._pending == 0:
+                        self._idle.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待佇列中的事件處理完成
+
+        Returns:
+            bool: 是否在時限內處理完成
+        """
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止接受新事件，處理完已接受的事件後結束工作執行緒"""
+        with self._lock:
+            self._stopped = True
+        for events in self._queues:
+            events.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        self._threads = []
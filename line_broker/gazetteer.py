@@ -0,0 +1,100 @@
+"""
+line_broker/gazetteer.py
+
+本地地名索引：訂閱天氣時將使用者輸入的地點解析為經緯度，不需每則訊息查詢遠端地理編碼服務。
+地名資料位於 configs/gazetteer.json，格式為 {"地名": {"longitude": 經度, "latitude": 緯度, "aliases": [別名]}}。
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'configs', 'gazetteer.json')
+
+# 比對時可省略的行政區後綴
+_SUFFIXES = ('市', '縣', '區', '鄉', '鎮')
+
+
+@dataclass(frozen=True)
+class Place:
+    """地名與座標"""
+    name: str
+    longitude: float
+    latitude: float
+
+
+def normalize_place_name(name: str) -> str:
+    """統一地名寫法：去除空白、臺改為台"""
+    return ''.join(name.split()).replace('臺', '台')
+
+
+class Gazetteer:
+    """地名、別名與省略後綴的寫法對應到座標"""
+
+    def __init__(self, places: Dict[str, Dict]):
+        """
+        建立索引
+
+        Args:
+            places: 地名對應的 {'longitude', 'latitude', 'aliases'}
+        """
+        self._index: Dict[str, List[Place]] = {}
+        for name, info in places.items():
+            place = Place(normalize_place_name(name), float(info['longitude']), float(info['latitude']))
+            for variant in self._variants(name, info.get('aliases', [])):
+                candidates = self._index.setdefault(variant, [])
+                if place not in candidates:
+                    candidates.append(place)
+
+    @staticmethod
+    def _variants(name: str, aliases: List[str]) -> List[str]:
+        """地名與別名，以及去除行政區後綴的寫法"""
+        variants = []
+        for text in [name, *aliases]:
+            text = normalize_place_name(text)
+            variants.append(text)
+            if len(text) > 2 and text.endswith(_SUFFIXES):
+                variants.append(text[:-1])
+        return variants
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_GAZETTEER_PATH) -> "Gazetteer":
+        """從JSON檔案載入"""
+        with open(path, 'r', encoding='utf-8') as f:
+            places = json.load(f)
+        logger.info(f"載入 {len(places)} 個地名: {path}")
+        return cls(places)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, name: str) -> List[Place]:
+        """
+        查詢地名
+
+        Args:
+            name: 使用者輸入的地點
+
+        Returns:
+            List[Place]: 符合的地點，多於一個表示名稱有歧義
+        """
+        name = normalize_place_name(name)
+        return list(self._index.get(name, []))
+
+    def resolve(self, name: str) -> Optional[Place]:
+        """
+        查詢唯一符合的地點
+
+        Args:
+            name: 使用者輸入的地點
+
+        Returns:
+            Optional[Place]: 地點，找不到或有歧義時為None
+        """
+        candidates = self.lookup(name)
+        return candidates[0] if len(candidates) == 1 else None
@@ -0,0 +1,388 @@
+"""
+line_broker/line_client.py
+
+LINE Messaging API 發送用戶端：
+1. 以 keep-alive 連線池重用連線，避免每次推播重新建立 TCP + TLS
+2. 以權杖桶限制每秒請求數，收到 429 時依 Retry-After 讓所有請求一起暫停
+3. 429 / 5xx 與網路錯誤依退避策略重試，每個請求皆有逾時
+4. 回傳每個請求（最多5則訊息）的發送結果
+5. 可指定 retry key，每個請求附帶衍生的 X-Line-Retry-Key，重送已被接受的請求時 LINE 不會重複推播
+
+LineClient 供執行緒池共用，AsyncLineClient 供事件迴圈使用。
+"""
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+import requests
+
+from scraper.engine.retry import RetryPolicy, parse_retry_after
+from scraper.utils.http_client import http_clients
+from scraper.utils.logger import setup_logger
+from scraper.utils.rate_limiter import TokenBucket
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+@dataclass
+class DeliveryResult:
+    """單一請求的發送結果"""
+    to: List[str]
+    messages: List[str]
+    status: int
+    response: Dict = field(default_factory=dict)
+    request_id: Optional[str] = None
+    error: Optional[str] = None
+    accepted_request_id: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """是否發送成功（409 且帶有先前被接受的請求ID時，表示同一個 retry key 已發送過）"""
+        return 200 <= self.status < 300 or (self.status == 409 and bool(self.accepted_request_id))
+
+
+class _LineClientBase:
+    """同步與非同步用戶端共用的設定、請求切分與重試判斷"""
+
+    API_BASE = "https://api.line.me/v2/bot/message"
+
+    # LINE Messaging API 限制
+    MAX_MESSAGES_PER_REQUEST = 5      # 每個請求最多5個訊息物件
+    MAX_MULTICAST_RECIPIENTS = 500    # multicast 每次最多500位使用者
+
+    def __init__(
+        self,
+        channel_token: str,
+        rate_limit: float = 100,
+        timeout: float = 10,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        初始化用戶端
+
+        Args:
+            channel_token: LINE Channel Access Token
+            rate_limit: 每秒請求數上限，0 表示不限
+            timeout: 單一請求的逾時秒數
+            retry_policy: 429 / 5xx 與網路錯誤的重試策略
+        """
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.limiter = TokenBucket(rate_limit)
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {channel_token}",
+        }
+
+    @classmethod
+    def _chunk_messages(cls, msgs: str | List[str]) -> List[List[str]]:
+        """將訊息每5則分為一組"""
+        if isinstance(msgs, str):
+            msgs = [msgs]
+        size = cls.MAX_MESSAGES_PER_REQUEST
+        return [list(msgs[i:i + size]) for i in range(0, len(msgs), size)]
+
+    def _push_requests(self, user_id: str, msgs: str | List[str]) -> Iterator[Tuple[str, Dict, List[str], List[str]]]:
+        """產生 push 的 (URL, payload, 收件者, 訊息)"""
+        for chunk in self._chunk_messages(msgs):
+            payload = {"to": user_id, "messages": [{"type": "text", "text": msg} for msg in chunk]}
+            yield f"{self.API_BASE}/push", payload, [user_id], chunk
+
+    def _multicast_requests(
+        self,
+        user_ids: List[str],
+        msgs: str | List[str]
+    ) -> Iterator[Tuple[str, Dict, List[str], List[str]]]:
+        """產生 multicast 的 (URL, payload, 收件者, 訊息)"""
+        size = self.MAX_MULTICAST_RECIPIENTS
+        chunks = self._chunk_messages(msgs)
+        for i in range(0, len(user_ids), size):
+            recipients = list(user_ids[i:i + size])
+            for chunk in chunks:
+                payload = {"to": recipients, "messages": [{"type": "text", "text": msg} for msg in chunk]}
+                yield f"{self.API_BASE}/multicast", payload, recipients, chunk
+
+    @staticmethod
+    def _request_retry_keys(retry_key: Optional[str], requests_: Iterator) -> Iterator[Tuple]:
+        """為每個請求附加由 retry key 衍生的固定 X-Line-Retry-Key，未指定時為None"""
+        for index, request in enumerate(requests_):
+            key = str(uuid.uuid5(uuid.UUID(retry_key), str(index))) if retry_key else None
+            yield (*request, key)
+
+    def _request_headers(self, retry_key: Optional[str]) -> Optional[Dict[str, str]]:
+        """單一請求額外的標頭"""
+        return {"X-Line-Retry-Key": retry_key} if retry_key else None
+
+    def _retry_delay(self, status: int, headers: Dict[str, str], attempt: int) -> Optional[float]:
+        """依回應狀態判斷是否重試，回傳等待秒數；不重試時回傳None"""
+        if status not in self.retry_policy.retriable_statuses or attempt >= self.retry_policy.max_retries:
+            return None
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            delay = min(retry_after, self.retry_policy.max_delay)
+        else:
+            delay = self.retry_policy.backoff(attempt)
+        if status == 429:
+            # 整個 channel 被限流，所有請求一起暫停
+            self.limiter.pause(delay)
+        logger.warning(f"LINE API 回應 {status}，{delay:.1f} 秒後重試 ({attempt + 1}/{self.retry_policy.max_retries})")
+        return delay
+
+    @staticmethod
+    def _parse_body(text: str) -> Dict:
+        """解析回應內容，非JSON時保留原文"""
+        if not text:
+            return {}
+        try:
+            return json.loads(text)
+        except ValueError:
+            return {"message": text}
+
+
+class LineClient(_LineClientBase):
+    """以共用的 requests.Session 連線池發送的同步用戶端，可在多個執行緒間共用"""
+
+    def __init__(
+        self,
+        channel_token: str,
+        rate_limit: float = 100,
+        timeout: float = 10,
+        pool_size: int = 10,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        初始化用戶端
+
+        Args:
+            channel_token: LINE Channel Access Token
+            rate_limit: 每秒請求數上限，0 表示不限
+            timeout: 單一請求的逾時秒數
+            pool_size: 連線池大小，應不小於使用此用戶端的執行緒數
+            retry_policy: 429 / 5xx 與網路錯誤的重試策略
+        """
+        super().__init__(channel_token, rate_limit, timeout, retry_policy)
+        # 與其他用戶端共用 api.line.me 的連線池，授權標頭隨每個請求傳入
+        self.session = http_clients.session(self.API_BASE, pool_maxsize=max(1, pool_size))
+
+    def __enter__(self) -> "LineClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """連線池由整個行程共用，不隨單一用戶端關閉"""
+
+    def _send(
+        self,
+        url: str,
+        payload: Dict,
+        to: List[str],
+        messages: List[str],
+        retry_key: Optional[str] = None
+    ) -> DeliveryResult:
+        """發送單一請求，依重試策略重試"""
+        headers = {**self._headers, **(self._request_headers(retry_key) or {})}
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt >= self.retry_policy.max_retries or not self.retry_policy.is_retriable(e):
+                    return DeliveryResult(to=to, messages=messages, status=0, error=str(e))
+                time.sleep(self.retry_policy.backoff(attempt))
+                attempt += 1
+                continue
+
+            delay = self._retry_delay(response.status_code, response.headers, attempt)
+            if delay is None:
+                return DeliveryResult(
+                    to=to,
+                    messages=messages,
+                    status=response.status_code,
+                    response=self._parse_body(response.text),
+                    request_id=response.headers.get('X-Line-Request-Id'),
+                    accepted_request_id=response.headers.get('X-Line-Accepted-Request-Id')
+                )
+            time.sleep(delay)
+            attempt += 1
+
+    def push(self, user_id: str, msgs: str | List[str], retry_key: Optional[str] = None) -> List[DeliveryResult]:
+        """
+        推播訊息給單一使用者
+
+        Args:
+            user_id: LINE user ID
+            msgs: 訊息，每5則合併為一個請求
+            retry_key: UUID 字串，重送相同的訊息時使用相同的值以避免重複推播
+
+        Returns:
+            List[DeliveryResult]: 每個請求的發送結果
+        """
+        requests_ = self._request_retry_keys(retry_key, self._push_requests(user_id, msgs))
+        return [self._send(*request) for request in requests_]
+
+    def reply(self, reply_token: str, msgs: str | List[str]) -> DeliveryResult:
+        """
+        以 reply token 回覆事件，reply token 只能使用一次，因此最多回覆5則訊息
+
+        Args:
+            reply_token: Webhook 事件的 reply token
+            msgs: 訊息，超過5則的部分不發送
+
+        Returns:
+            DeliveryResult: 發送結果
+        """
+        messages = self._chunk_messages(msgs)[0]
+        payload = {"replyToken": reply_token, "messages": [{"type": "text", "text": msg} for msg in messages]}
+        return self._send(f"{self.API_BASE}/reply", payload, [], messages)
+
+    def multicast(
+        self,
+        user_ids: List[str],
+        msgs: str | List[str],
+        retry_key: Optional[str] = None
+    ) -> List[DeliveryResult]:
+        """
+        以 multicast 發送相同訊息給多位使用者
+
+        Args:
+            user_ids: LINE user ID，每500位一個請求
+            msgs: 訊息，每5則合併為一個請求
+            retry_key: UUID 字串，重送相同的收件者與訊息時使用相同的值以避免重複推播
+
+        Returns:
+            List[DeliveryResult]: 每個請求的發送結果
+        """
+        requests_ = self._request_retry_keys(retry_key, self._multicast_requests(user_ids, msgs))
+        return [self._send(*request) for request in requests_]
+
+
+class AsyncLineClient(_LineClientBase):
+    """以 aiohttp 連線池發送的非同步用戶端"""
+
+    def __init__(
+        self,
+        channel_token: str,
+        rate_limit: float = 100,
+        timeout: float = 10,
+        pool_size: int = 10,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        初始化用戶端
+
+        Args:
+            channel_token: LINE Channel Access Token
+            rate_limit: 每秒請求數上限，0 表示不限
+            timeout: 單一請求的逾時秒數
+            pool_size: 同時進行的請求數上限
+            retry_policy: 429 / 5xx 與網路錯誤的重試策略
+        """
+        super().__init__(channel_token, rate_limit, timeout, retry_policy)
+        self.pool_size = max(1, pool_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncLineClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """建立連線池"""
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=self._headers,
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self) -> None:
+        """關閉連線池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _send(
+        self,
+        url: str,
+        payload: Dict,
+        to: List[str],
+        messages: List[str],
+        retry_key: Optional[str] = None
+    ) -> DeliveryResult:
+        """發送單一請求，依重試策略重試"""
+        await self.open()
+        request_headers = self._request_headers(retry_key)
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.limiter.reserve())
+            try:
+                async with self._session.post(url, json=payload, headers=request_headers) as response:
+                    status = response.status
+                    headers = response.headers.copy()
+                    text = await response.text()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.retry_policy.max_retries or not self.retry_policy.is_retriable(e):
+                    return DeliveryResult(to=to, messages=messages, status=0, error=str(e))
+                await asyncio.sleep(self.retry_policy.backoff(attempt))
+                attempt += 1
+                continue
+
+            delay = self._retry_delay(status, headers, attempt)
+            if delay is None:
+                return DeliveryResult(
+                    to=to,
+                    messages=messages,
+                    status=status,
+                    response=self._parse_body(text),
+                    request_id=headers.get('X-Line-Request-Id'),
+                    accepted_request_id=headers.get('X-Line-Accepted-Request-Id')
+                )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send_all(self, requests_: Iterator[Tuple]) -> List[DeliveryResult]:
+        """依序發送請求，確保同一批收件者收到的訊息順序不變"""
+        return [await self._send(*request) for request in requests_]
+
+    async def push(
+        self,
+        user_id: str,
+        msgs: str | List[str],
+        retry_key: Optional[str] = None
+    ) -> List[DeliveryResult]:
+        """推播訊息給單一使用者，回傳每個請求的發送結果"""
+        return await self._send_all(self._request_retry_keys(retry_key, self._push_requests(user_id, msgs)))
+
+    async def multicast(
+        self,
+        user_ids: List[str],
+        msgs: str | List[str],
+        retry_key: Optional[str] = None
+    ) -> List[DeliveryResult]:
+        """以 multicast 發送相同訊息給多位使用者，各批收件者同時發送"""
+        size = self.MAX_MULTICAST_RECIPIENTS
+        groups = [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+        # 各批收件者以批次序號衍生各自的 retry key，避免不同批次的請求使用相同的值
+        group_keys = [
+            str(uuid.uuid5(uuid.UUID(retry_key), f"group-{i}")) if retry_key else None
+            for i in range(len(groups))
+        ]
+        results = await asyncio.gather(
+            *(
+                self._send_all(self._request_retry_keys(key, self._multicast_requests(group, msgs)))
+                for group, key in zip(groups, group_keys)
+            )
+        )
+        return [result for group_results in results for result in group_results]
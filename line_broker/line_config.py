@@ -3,6 +3,7 @@ LINE 配置模組，集中管理 LINE API 相關實例
 """
 from linebot import LineBotApi, WebhookHandler
 from app.config.settings import settings
+from line_broker.line_client import LineClient
 from scraper.utils.logger import setup_logger
 
 # 使用自定義的logger設置
@@ -12,6 +13,12 @@ logger = setup_logger(__name__)
 try:
     line_bot_api = LineBotApi(settings.line_channel_token)
     handler = WebhookHandler(settings.line_channel_secret)
+    # Webhook 工作執行緒共用的回覆用戶端（連線池）
+    line_client = LineClient(
+        settings.line_channel_token,
+        rate_limit=settings.line_rate_limit,
+        pool_size=settings.webhook_workers
+    )
     logger.info("LINE API 初始化成功")
 except Exception as e:
     logger.error(f"LINE API 初始化失敗: {str(e)}")
@@ -1,46 +1,45 @@
-import requests
-from scraper.utils.logger import setup_logger   
+from typing import List, Optional, Tuple
+from scraper.utils.logger import setup_logger
+from .line_client import LineClient
 
 # 使用自定義的logger設置
 logger = setup_logger(__name__)
 
 class LineNotification:
     """LINE 通知服務類別，處理訊息發送和格式化"""
-    
-    LINE_API_URL = "https://api.line.me/v2/bot/message/push"
 
-    def __init__(self, channel_token, user_data):
+    # LINE Messaging API 限制
+    MAX_MESSAGES_PER_REQUEST = LineClient.MAX_MESSAGES_PER_REQUEST
+    MAX_MULTICAST_RECIPIENTS = LineClient.MAX_MULTICAST_RECIPIENTS
+
+    def __init__(self, channel_token, user_data=None, client: Optional[LineClient] = None):
         """
         初始化 LINE Messaging API 通知工具
         :param channel_token: LINE Channel Access Token
-        :param user_data: 使用者資料字典，包含 user_id 和 user 資訊: 如天氣地點、新聞類型
+        :param user_data: 使用者資料字典，包含 user_id 和 user 資訊: 如天氣地點、新聞類型（multicast 時不需要）
+        :param client: 共用的 LineClient，未指定時建立新的用戶端
         """
-        self._line_token = channel_token
-        self.user_data = user_data
+        self._client = client or LineClient(channel_token)
+        self.user_data = user_data or {}
 
     def notify(self, msgs: str | list[str]):
         """
-        發送通知訊息
+        發送通知訊息，每個請求最多包含5則訊息
         :param msg_list: 要發送的訊息列表
-        :return: LINE API 的回應狀態碼與回應數據
+        :return: LINE API 的回應狀態碼與回應數據（第一個失敗的請求，全部成功時為最後一個請求）
+        """
+        results = self._client.push(self.user_data['user_id'], msgs)
+        result = next((r for r in results if not r.ok), results[-1])
+        return result.status, result.response
+
+    def multicast(self, user_ids: List[str], msgs: str | list[str]) -> List[Tuple[List[str], int, dict]]:
+        """
+        以 multicast 將相同訊息發送給多位使用者，每次最多500位、每個請求最多5則訊息
+        :param user_ids: 收件者的 LINE user ID
+        :param msgs: 要發送的訊息
+        :return: 每個請求的 (user ID 列表, 狀態碼, 回應數據)
         """
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self._line_token}",
-        }
-        
-        last_response = None
-        # 如果 msg_list 是字串，轉換成列表
-        if isinstance(msgs, str):
-            msgs = [msgs]
-            
-        for msg in msgs:
-            payload = {
-                "to": self.user_data['user_id'],
-                "messages": [
-                    {"type": "text", "text": msg}
-                ],
-            }
-            response = requests.post(self.LINE_API_URL, headers=headers, json=payload)
-            last_response = response
-        return last_response.status_code, last_response.json()
+        return [
+            (result.to, result.status, result.response)
+            for result in self._client.multicast(user_ids, msgs)
+        ]
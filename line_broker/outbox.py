@@ -0,0 +1,336 @@
+"""
+line_broker/outbox.py
+
+通知發件匣：
+1. 規劃階段將每位使用者的每份訊息批次寫入 notification_outbox，同一次通知重跑時不重複建立
+2. 發送工作以 FOR UPDATE SKIP LOCKED 認領一批收件群組並取得租約，多個執行緒或容器可同時消化
+3. 發送成功標記為 sent；可重試的失敗退避後再認領，超過次數或無法重試時標記為 failed
+4. 行程中斷時租約到期的資料會被重新認領，已完成的不再發送
+5. 每個請求附帶由群組衍生的 X-Line-Retry-Key，重送已被 LINE 接受的請求時不會重複推播
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+
+from app.config.settings import settings
+from app.models.notification import NotificationOutbox
+from scraper.engine.retry import RetryPolicy
+from scraper.utils.logger import setup_logger
+from .line_client import DeliveryResult, LineClient
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+# 認領時只鎖定群組中 id 最小的一筆，確保同一群組（同一個 retry key）整批由同一個工作認領
+_CLAIM_HEADS_SQL = text("""
+    SELECT h.retry_key
+    FROM notification_outbox h
+    WHERE h.kind = :kind
+      AND (CAST(:run_key AS VARCHAR) IS NULL OR h.run_key = :run_key)
+      AND h.status IN ('pending', 'sending')
+      AND (h.locked_until IS NULL OR h.locked_until < NOW())
+      AND NOT EXISTS (
+          SELECT 1 FROM notification_outbox o
+          WHERE o.retry_key = h.retry_key AND o.id < h.id
+      )
+    ORDER BY h.id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+_CLAIM_GROUPS_SQL = text("""
+    UPDATE notification_outbox
+    SET status = 'sending',
+        attempts = attempts + 1,
+        locked_until = NOW() + make_interval(secs => :lease)
+    WHERE retry_key = ANY(CAST(:retry_keys AS UUID[]))
+      AND status IN ('pending', 'sending')
+      AND (locked_until IS NULL OR locked_until < NOW())
+    RETURNING id, retry_key, line_user_id, messages, attempts
+""")
+
+
+def default_run_key() -> str:
+    """預設的通知批次識別：當天日期，同一天重跑視為同一次通知"""
+    return date.today().isoformat()
+
+
+class Outbox:
+    """notification_outbox 的寫入、認領與發送"""
+
+    INSERT_CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        engine: Engine,
+        client: LineClient,
+        lease_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        claim_groups: int = 10,
+        retry_policy: Optional[RetryPolicy] = None
+    ):
+        """
+        初始化發件匣
+
+        Args:
+            engine: 資料庫引擎，每次認領與標記各自使用短交易
+            client: 發送用的 LINE 用戶端
+            lease_seconds: 認領後的租約秒數，逾時未完成視為中斷並可被重新認領
+            max_attempts: 每筆最多發送次數
+            claim_groups: 每次認領的收件群組數
+            retry_policy: 發送失敗後再次認領前的退避策略
+        """
+        self.engine = engine
+        self.client = client
+        self.lease_seconds = lease_seconds or settings.outbox_lease_seconds
+        self.max_attempts = max(1, max_attempts or settings.outbox_max_attempts)
+        self.claim_groups = max(1, claim_groups)
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def planned(self, kind: str, run_key: str) -> Set[Tuple[str, str]]:
+        """
+        取得此次通知已寫入的 (topic, LINE user ID)
+
+        Args:
+            kind: 通知類型
+            run_key: 通知批次識別
+
+        Returns:
+            Set[Tuple[str, str]]: 已建立的收件項目
+        """
+        stmt = (
+            select(NotificationOutbox.topic, NotificationOutbox.line_user_id)
+            .where(NotificationOutbox.kind == kind, NotificationOutbox.run_key == run_key)
+        )
+        with self.engine.connect() as conn:
+            return {(row.topic, row.line_user_id) for row in conn.execute(stmt)}
+
+    def enqueue(
+        self,
+        kind: str,
+        run_key: str,
+        deliveries: Iterable[Tuple[str, Sequence[str], List[str]]]
+    ) -> int:
+        """
+        批次寫入待發送的訊息，同一次通知中已存在的 (topic, 使用者) 略過
+
+        Args:
+            kind: 通知類型
+            run_key: 通知批次識別
+            deliveries: (topic, 訊息, LINE user ID 列表)，同一項的收件者以 multicast 一起發送
+
+        Returns:
+            int: 新寫入的筆數
+        """
+        size = LineClient.MAX_MULTICAST_RECIPIENTS
+        rows = []
+        for topic, messages, user_ids in deliveries:
+            for i in range(0, len(user_ids), size):
+                retry_key = str(uuid.uuid4())
+                rows.extend(
+                    {
+                        'kind': kind,
+                        'run_key': run_key,
+                        'topic': topic,
+                        'line_user_id': user_id,
+                        'messages': list(messages),
+                        'retry_key': retry_key,
+                    }
+                    for user_id in user_ids[i:i + size]
+                )
+
+        inserted = 0
+        with self.engine.begin() as conn:
+            for i in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+                stmt = (
+                    insert(NotificationOutbox)
+                    .values(rows[i:i + self.INSERT_CHUNK_SIZE])
+                    .on_conflict_do_nothing(constraint='uq_outbox_run_topic_user')
+                )
+                inserted += conn.execute(stmt).rowcount
+        logger.info(f"發件匣寫入 {kind}/{run_key}: {inserted} 筆（略過已存在 {len(rows) - inserted} 筆）")
+        return inserted
+
+    def claim(self, kind: str, run_key: Optional[str] = None) -> List[Dict]:
+        """
+        認領一批可發送的收件群組並取得租約
+
+        Args:
+            kind: 通知類型
+            run_key: 通知批次識別，未指定時認領所有批次
+
+        Returns:
+            List[Dict]: 每個群組的 {'retry_key', 'ids', 'user_ids', 'messages', 'attempts'}
+        """
+        with self.engine.begin() as conn:
+            retry_keys = conn.execute(
+                _CLAIM_HEADS_SQL,
+                {'kind': kind, 'run_key': run_key, 'limit': self.claim_groups}
+            ).scalars().all()
+            if not retry_keys:
+                return []
+            rows = conn.execute(
+                _CLAIM_GROUPS_SQL,
+                {'retry_keys': [str(key) for key in retry_keys], 'lease': self.lease_seconds}
+            ).all()
+
+        groups: "OrderedDict[str, Dict]" = OrderedDict()
+        for row in sorted(rows, key=lambda r: r.id):
+            group = groups.setdefault(str(row.retry_key), {
+                'retry_key': str(row.retry_key),
+                'ids': [],
+                'user_ids': [],
+                'messages': row.messages,
+                'attempts': 0,
+            })
+            group['ids'].append(row.id)
+            group['user_ids'].append(row.line_user_id)
+            group['attempts'] = max(group['attempts'], row.attempts)
+        return list(groups.values())
+
+    def _send_group(self, group: Dict) -> List[DeliveryResult]:
+        """發送一個收件群組，單一收件者使用 push，其餘使用 multicast"""
+        if len(group['user_ids']) == 1:
+            return self.client.push(group['user_ids'][0], group['messages'], retry_key=group['retry_key'])
+        return self.client.multicast(group['user_ids'], group['messages'], retry_key=group['retry_key'])
+
+    def _is_retriable(self, result: DeliveryResult) -> bool:
+        """網路錯誤與可重試的狀態碼才再次發送"""
+        return result.status == 0 or result.status in self.retry_policy.retriable_statuses
+
+    def _mark_sent(self, ids: List[int]) -> None:
+        """標記為已發送"""
+        stmt = (
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids))
+            .values(status='sent', sent_at=func.now(), locked_until=None, last_error=None)
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def _mark_failed(self, group: Dict, result: DeliveryResult) -> str:
+        """
+        記錄發送失敗，可重試時退避後回到待發送
+
+        Returns:
+            str: 更新後的狀態
+        """
+        error = f"{result.status}: {result.error or result.response}"
+        if self._is_retriable(result) and group['attempts'] < self.max_attempts:
+            status = 'pending'
+            locked_until = func.now() + func.make_interval(
+                0, 0, 0, 0, 0, 0, self.retry_policy.backoff(group['attempts'] - 1)
+            )
+        else:
+            status = 'failed'
+            locked_until = None
+        stmt = (
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(group['ids']))
+            .values(status=status, locked_until=locked_until, last_error=error[:1000])
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+        return status
+
+    def _seconds_until_due(self, kind: str, run_key: Optional[str]) -> Optional[float]:
+        """距離下一筆退避中的資料可再認領的秒數，沒有待發送資料時回傳None"""
+        stmt = (
+            select(func.extract('epoch', func.min(NotificationOutbox.locked_until) - func.now()))
+            .where(NotificationOutbox.kind == kind, NotificationOutbox.status == 'pending')
+        )
+        if run_key is not None:
+            stmt = stmt.where(NotificationOutbox.run_key == run_key)
+        with self.engine.connect() as conn:
+            remaining = conn.execute(stmt).scalar()
+        return None if remaining is None else max(0.0, float(remaining))
+
+    def deliver(self, kind: str, run_key: Optional[str] = None, workers: int = 1) -> Dict[str, int]:
+        """
+        以多個執行緒認領並發送，直到沒有可發送或退避中的資料
+
+        其他行程持有租約中的資料不等待，由持有者完成或租約到期後重新認領。
+
+        Args:
+            kind: 通知類型
+            run_key: 通知批次識別，未指定時消化所有批次
+            workers: 發送的執行緒數
+
+        Returns:
+            Dict[str, int]: 此次發送的統計 {'sent': 成功筆數, 'failed': 放棄筆數, 'retried': 退避重試筆數}
+        """
+        counts = {'sent': 0, 'failed': 0, 'retried': 0}
+        lock = threading.Lock()
+
+        def _worker() -> None:
+            try:
+                _drain()
+            except Exception as e:
+                logger.error(f"{kind} 發件匣工作中斷: {str(e)}")
+
+        def _drain() -> None:
+            while True:
+                groups = self.claim(kind, run_key)
+                if not groups:
+                    wait = self._seconds_until_due(kind, run_key)
+                    if wait is None:
+                        return
+                    time.sleep(min(max(wait, 0.05), self.retry_policy.max_delay))
+                    continue
+                for group in groups:
+                    try:
+                        results = self._send_group(group)
+                        failure = next((r for r in results if not r.ok), None)
+                    except Exception as e:
+                        failure = DeliveryResult(
+                            to=group['user_ids'], messages=group['messages'], status=0, error=str(e)
+                        )
+                    if failure is None:
+                        self._mark_sent(group['ids'])
+                        outcome = 'sent'
+                    else:
+                        status = self._mark_failed(group, failure)
+                        outcome = 'retried' if status == 'pending' else 'failed'
+                        logger.error(
+                            f"{kind} 通知發送失敗 - {len(group['ids'])} 位使用者, "
+                            f"第 {group['attempts']} 次, {'稍後重試' if status == 'pending' else '放棄'}, "
+                            f"error: {failure.status} {failure.error or failure.response}"
+                        )
+                    with lock:
+                        counts[outcome] += len(group['ids'])
+
+        threads = [
+            threading.Thread(target=_worker, name=f'outbox-{kind}-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts
+
+    def stats(self, kind: str, run_key: str) -> Dict[str, int]:
+        """
+        統計此次通知各狀態的筆數
+
+        Returns:
+            Dict[str, int]: {'total', 'pending', 'sending', 'sent', 'failed'}
+        """
+        stmt = (
+            select(NotificationOutbox.status, func.count())
+            .where(NotificationOutbox.kind == kind, NotificationOutbox.run_key == run_key)
+            .group_by(NotificationOutbox.status)
+        )
+        counts = {'pending': 0, 'sending': 0, 'sent': 0, 'failed': 0}
+        with self.engine.connect() as conn:
+            for status, count in conn.execute(stmt):
+                counts[status] = count
+        counts['total'] = sum(counts.values())
+        return counts
@@ -1,13 +1,19 @@
 """
 新增Webhook處理模組，負責接收LINE平台事件
+
+Webhook 只驗證簽章並將事件放入佇列後立即回應，事件由背景工作執行緒批次處理。
 """
+from typing import List
+
 from flask import Blueprint, request, abort
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import FollowEvent, MessageEvent, TextMessage
 from scraper.utils.logger import setup_logger
-from line_broker.broker import NotificationBroker
-from line_broker.line_config import line_bot_api, handler
-from app.database.connection import db_manager
+from line_broker.event_queue import WebhookEventQueue
+from line_broker.commands import HELP_TEXT, command_engine
+from line_broker.line_config import line_client, handler
+from app.config.settings import settings
+from app.services.user_service import user_service
 
 # 使用自定義的logger設置
 logger = setup_logger(__name__)
@@ -17,14 +23,19 @@ webhook_blueprint = Blueprint('webhook', __name__)
 
 @webhook_blueprint.route("/webhook", methods=['POST'])
 def callback():
-    """處理 LINE Webhook 回調"""
+    """處理 LINE Webhook 回調：驗證簽章、事件放入佇列後立即回應"""
     signature = request.headers['X-Line-Signature']
     body = request.get_data(as_text=True)
     
     try:
-        handler.handle(body, signature)
+        events = handler.parser.parse(body, signature)
     except InvalidSignatureError:
         abort(400)
+    
+    if not event_queue.submit(events):
+        # 佇列已滿，讓 LINE 稍後重送
+        logger.warning(f"Webhook 事件佇列已滿（{event_queue.pending} 個待處理），拒絕 {len(events)} 個事件")
+        abort(503)
     return 'OK'
 
 @webhook_blueprint.route("/health", methods=["GET"])
@@ -32,37 +43,49 @@ def test_route():
     """測試路由，確認服務是否正常運行"""
     return "Webhook testing is working!", 200
 
-# 註冊事件處理
-@handler.add(FollowEvent)
-def handle_follow(event):
-    """處理用戶加入好友事件"""
-    user_id = event.source.user_id
-    logger.info(f"新用戶加入: {user_id}")
+def handle_follow_events(events: List[FollowEvent]):
+    """處理用戶加入好友事件：一次寫入所有使用者，再逐一回覆歡迎訊息"""
+    user_ids = list(dict.fromkeys(event.source.user_id for event in events))
+    logger.info(f"新用戶加入: {len(user_ids)} 位")
     try:
-        # 取得資料庫會話
-        with db_manager.get_session() as session:
-            # 使用broker處理註冊
-            broker = NotificationBroker(
-                db_session=session,
-                line_token=line_bot_api.channel_access_token,
-                owm_api_key=None  # 根據需要傳入
-            )
-            user = broker.handle_user_registration(user_id)
-            
-            # 發送歡迎訊息
-            welcome_msg = f"歡迎 {user.user_name}!\n請使用以下指令操作：\n- 訂閱天氣 [地點]\n- 訂閱新聞 [類別]"
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextMessage(text=welcome_msg)
-            )
+        users = user_service.register_many(user_ids)
     except Exception as e:
         logger.error(f"處理新用戶失敗: {str(e)}")
+        return
+    
+    for event in events:
+        # 發送歡迎訊息
+        user = users.get(event.source.user_id)
+        _reply(event, f"歡迎 {user.user_name if user else '新用戶'}!\n{HELP_TEXT}")
 
-@handler.add(MessageEvent, message=TextMessage)
-def handle_message(event):
-    """處理用戶文字訊息"""
-    # 需要實作指令處理邏輯
-    pass
+def _reply(event, text: str):
+    """以共用的連線池回覆事件"""
+    result = line_client.reply(event.reply_token, text)
+    if not result.ok:
+        logger.error(f"回覆訊息失敗 {event.source.user_id}: {result.status} {result.error or result.response}")
+
+def handle_message_events(events: List[MessageEvent]):
+    """處理用戶文字訊息：整批指令合併寫入後逐一回覆"""
+    text_events = [event for event in events if isinstance(event.message, TextMessage)]
+    if not text_events:
+        return
+    try:
+        replies = command_engine.handle([(event.source.user_id, event.message.text) for event in text_events])
+    except Exception as e:
+        logger.error(f"處理 {len(text_events)} 則指令失敗: {str(e)}")
+        replies = ["系統忙碌中，請稍後再試"] * len(text_events)
+    for event, text in zip(text_events, replies):
+        _reply(event, text)
+
+# 註冊事件處理
+event_queue = WebhookEventQueue(
+    handlers={
+        FollowEvent: handle_follow_events,
+        MessageEvent: handle_message_events,
+    },
+    maxsize=settings.webhook_queue_size,
+    workers=settings.webhook_workers
+)
 
 def run(self, host='0.0.0.0', port=5000):
     try:
@@ -1,16 +1,31 @@
 from scraper.utils.logger import setup_logger
+from scraper.utils.http_client import http_clients
+from scraper.utils.ttl_cache import TTLCache
 import pyowm
 from requests import Timeout
 
 # 使用自定義的logger設置
 logger = setup_logger(__name__)
 
+OWM_API_URL = "https://api.openweathermap.org"
+
 class WeatherStation():
-    def __init__(self, owm_api_key=None):
+    def __init__(self, owm_api_key=None, grid_precision=2, cache_ttl=600, cache_size=4096, pool_size=None):
+        """
+        :param owm_api_key: OpenWeatherMap API Key
+        :param grid_precision: 經緯度網格的小數位數，同一格內共用一次查詢（2 位約 1 公里）
+        :param cache_ttl: 每格天氣資料的快取秒數
+        :param cache_size: 最多快取的網格數
+        :param pool_size: OWM 連線池大小，應不小於同時查詢的執行緒數
+        """
         self._owm_api_key = owm_api_key
         self._owm = None
-        self.observers = [] 
-    
+        self._weather_manager = None
+        self.pool_size = pool_size
+        self.observers = []
+        self.grid_precision = grid_precision
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
     @property
     def owm(self):
         try:
@@ -20,12 +35,33 @@ class WeatherStation():
             logger.error(
                 "WeatherStation owm fail with TimeOut error {}".format(err))
         return self._owm
-    
-    
+
+
+    @property
+    def weather_manager(self):
+        if not self._weather_manager:
+            mgr = self.owm.weather_manager()
+            # pyowm 未設定重試時直接呼叫 requests.get，每次查詢都重新建立連線；改用共用的連線池
+            mgr.http_client.http = http_clients.session(OWM_API_URL, pool_maxsize=self.pool_size)
+            self._weather_manager = mgr
+        return self._weather_manager
+
     def _get_data_by_coord(self, lon, lat):
-        mgr = self.owm.weather_manager()
+        mgr = self.weather_manager
         observations = mgr.weather_around_coords(lat=lat, lon=lon)
         return observations[0].weather.to_dict()
 
+    def grid_cell(self, lon, lat):
+        """
+        取得座標所在的網格
+        :return: (經度, 緯度) 四捨五入後的網格中心
+        """
+        return (round(lon, self.grid_precision), round(lat, self.grid_precision))
 
-
+    def get_weather(self, lon, lat):
+        """
+        依網格查詢天氣，同一格內的座標在快取期間只呼叫一次 OWM
+        :return: 天氣資料字典
+        """
+        cell = self.grid_cell(lon, lat)
+        return self._cache.get_or_load(cell, lambda: self._get_data_by_coord(*cell))
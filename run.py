@@ -1,6 +1,9 @@
 from scraper.spiders.cna.cna_menu_scraper import CnaMenuScraper
 from scraper.spiders.cna.cna_spider import CnaSpider
+from scraper.spiders.cna.content_extractor import extract_content_bs4, extract_content_lxml
 from app.etl.news_pipeline import NewsETLPipeline
+from app.etl.crawl_coordinator import CrawlCoordinator
+from app.etl.backfill import NewsBackfill
 from app.database.connection import db_manager
 from scraper.utils.logger import setup_logger
 from line_broker.broker import NotificationBroker
@@ -8,6 +11,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings  # 需確保設定檔路徑正確
 from app.main import create_app
+from datetime import datetime, timedelta
+from pathlib import Path
 
 # 設置日誌
 logger = setup_logger(__name__)
@@ -36,7 +41,24 @@ def test_news_scraper():
         logger.error(f"新聞爬取測試失敗: {str(e)}")
         raise
 
-def run_etl():
+def check_extractor_parity(fixture_dir):
+    """比對快速擷取與原本擷取方式在已保存HTML上的輸出是否一致"""
+    files = sorted(Path(fixture_dir).glob('**/*.html'))
+    if not files:
+        raise ValueError(f"找不到HTML檔案: {fixture_dir}")
+    
+    mismatches = []
+    for path in files:
+        html = path.read_text(encoding='utf-8', errors='replace')
+        if extract_content_lxml(html) != extract_content_bs4(html):
+            mismatches.append(path)
+            logger.error(f"擷取結果不一致: {path}")
+    
+    logger.info(f"比對 {len(files)} 個檔案，{len(mismatches)} 個不一致")
+    if mismatches:
+        raise ValueError(f"{len(mismatches)} 個檔案擷取結果不一致")
+
+def run_etl(http_cache_mode=None):
     """執行ETL流程"""
     try:
         # 確保資料庫已初始化
@@ -49,18 +71,46 @@ def run_etl():
         db_manager.create_tables()
         logger.info("資料表檢查完成")
         
+        # 取得所有被訂閱的類別，並同時爬取
+        with db_manager.get_session() as session:
+            categories = CrawlCoordinator.load_subscribed_categories(session)
+        
         # 執行ETL流程
-        pipeline = NewsETLPipeline()
-        categories = ['acul', 'aie', 'ait']
-        for category in categories:
-            pipeline.spider.category = category
-            pipeline.run()
+        pipeline = NewsETLPipeline(categories=categories, http_cache_mode=http_cache_mode)
+        pipeline.run()
         
     except Exception as e:
         logger.error(f"ETL執行失敗: {str(e)}")
         raise
 
-def send_notifications(weather_only=False, news_only=False):
+def run_backfill(start_date, end_date, categories=None, max_pages=500, http_cache_mode=None):
+    """回補指定日期區間的歷史新聞"""
+    try:
+        if not db_manager.engine:
+            if not settings.database_url:
+                raise ValueError("未設置資料庫連接字串 (DATABASE_URL)")
+            db_manager.init_with_url(settings.database_url)
+        
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) - timedelta(minutes=1)
+        
+        backfill = NewsBackfill(
+            start=start,
+            end=end,
+            categories=categories,
+            max_pages=max_pages,
+            concurrency_per_host=settings.crawl_concurrency,
+            download_delay=settings.crawl_download_delay,
+            parse_workers=settings.crawl_parse_workers,
+            http_cache_mode=http_cache_mode
+        )
+        backfill.run()
+        
+    except Exception as e:
+        logger.error(f"回補執行失敗: {str(e)}")
+        raise
+
+def send_notifications(weather_only=False, news_only=False, run_key=None):
     """發送LINE通知"""
     try:
         # 驗證必要設定
@@ -85,13 +135,13 @@ def send_notifications(weather_only=False, news_only=False):
         if weather_only:
             if not settings.owm_api_key:
                 raise ValueError("未設置 OpenWeatherMap API Key")
-            broker.send_weather_notifications()
+            broker.send_weather_notifications(run_key=run_key)
         elif news_only:
-            broker.send_news_notifications()
+            broker.send_news_notifications(run_key=run_key)
         else:
             if settings.owm_api_key:
-                broker.send_weather_notifications()
-            broker.send_news_notifications()
+                broker.send_weather_notifications(run_key=run_key)
+            broker.send_news_notifications(run_key=run_key)
             
         logger.info("通知發送流程完成")
         
@@ -115,14 +165,30 @@ if __name__ == "__main__":
     # news指令
     news_parser = subparsers.add_parser('news', help='測試新聞爬蟲')
     
+    # parity指令
+    parity_parser = subparsers.add_parser('parity', help='比對文章內容擷取方式的輸出')
+    parity_parser.add_argument('fixture_dir', help='已保存的文章HTML目錄')
+    
     # etl指令
     etl_parser = subparsers.add_parser('etl', help='執行ETL流程')
+    etl_parser.add_argument('--http-cache', choices=['off', 'normal', 'replay'],
+                            help='HTTP回應快取模式，replay 只使用已保存的回應不連網')
+    
+    # backfill指令
+    backfill_parser = subparsers.add_parser('backfill', help='回補歷史新聞')
+    backfill_parser.add_argument('--start', required=True, help='起始日期 (YYYY-MM-DD)')
+    backfill_parser.add_argument('--end', required=True, help='結束日期 (YYYY-MM-DD，含當日)')
+    backfill_parser.add_argument('--categories', nargs='+', help='類別代碼，未指定時回補所有類別')
+    backfill_parser.add_argument('--max-pages', type=int, default=500, help='每個類別最多翻頁數')
+    backfill_parser.add_argument('--http-cache', choices=['off', 'normal', 'replay'],
+                                 help='HTTP回應快取模式，replay 只使用已保存的回應不連網')
     
     # notify指令
     notify_parser = subparsers.add_parser('notify', help='發送LINE通知')
     notify_group = notify_parser.add_mutually_exclusive_group()
     notify_group.add_argument('--weather-only', action='store_true', help='僅發送天氣通知')
     notify_group.add_argument('--news-only', action='store_true', help='僅發送新聞通知')
+    notify_parser.add_argument('--run-key', help='通知批次識別（預設為當天日期），相同識別重跑時只補發未完成的部分')
     
     # webhook指令
     webhook_parser = subparsers.add_parser('webhook', help='啟動Webhook伺服器')
@@ -141,12 +207,23 @@ if __name__ == "__main__":
             update_menu_config()
         elif args.command == 'news':
             test_news_scraper()
+        elif args.command == 'parity':
+            check_extractor_parity(args.fixture_dir)
         elif args.command == 'etl':
-            run_etl()
+            run_etl(http_cache_mode=args.http_cache)
+        elif args.command == 'backfill':
+            run_backfill(
+                args.start,
+                args.end,
+                categories=args.categories,
+                max_pages=args.max_pages,
+                http_cache_mode=args.http_cache
+            )
         elif args.command == 'notify':
             send_notifications(
                 weather_only=args.weather_only,
-                news_only=args.news_only
+                news_only=args.news_only,
+                run_key=args.run_key
             )
         elif args.command == 'webhook':
             app = create_app()
@@ -0,0 +1,78 @@
+"""
+scraper/engine/bridge.py
+
+將非同步生成器橋接為同步生成器：
+非同步流程在背景執行緒的事件迴圈中執行，結果透過有界佇列逐筆交給呼叫端，
+讓既有的同步程式（如 ETL 的 extract）不需改寫即可使用非同步抓取引擎。
+"""
+import asyncio
+import queue
+import threading
+from typing import AsyncGenerator, Callable, Generator, TypeVar
+
+T = TypeVar('T')
+
+_DONE = object()
+
+
+class _Failure:
+    """包裝背景執行緒中發生的例外"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iterate_async(
+    agen_factory: Callable[[], AsyncGenerator[T, None]],
+    maxsize: int = 100
+) -> Generator[T, None, None]:
+    """
+    在背景事件迴圈中執行非同步生成器，並以同步方式逐筆產出
+
+    Args:
+        agen_factory: 回傳非同步生成器的函式
+        maxsize: 佇列上限，消費端跟不上時生產端會暫停
+
+    Yields:
+        非同步生成器產出的每一筆資料
+    """
+    results: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    async def _put(item) -> bool:
+        # 佇列已滿時讓出事件迴圈，避免阻塞進行中的請求
+        while not stop.is_set():
+            try:
+                results.put_nowait(item)
+                return True
+            except queue.Full:
+                await asyncio.sleep(0.05)
+        return False
+
+    async def _pump() -> None:
+        agen = agen_factory()
+        try:
+            async for item in agen:
+                if not await _put(item):
+                    break
+        except Exception as e:
+            await _put(_Failure(e))
+        finally:
+            await agen.aclose()
+            await _put(_DONE)
+
+    thread = threading.Thread(target=asyncio.run, args=(_pump(),), daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # 消費端提前結束時通知背景執行緒停止
+        stop.set()
+        thread.join()
@@ -0,0 +1,235 @@
+"""
+scraper/engine/fetcher.py
+
+非同步抓取引擎：
+1. 以單一 aiohttp 連線池發送所有請求
+2. 依網域限制同時進行的請求數量
+3. 對同一網域的連續請求保持禮貌延遲
+4. 依 RetryPolicy 以指數退避重試，並以 CircuitBreaker 對失效的網域快速失敗
+5. 可選擇搭配 HttpCache，以條件式請求重新驗證或在 replay 模式下完全不連網
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from scraper.engine.http_cache import CachedResponse, HttpCache
+from scraper.engine.retry import CircuitBreaker, RetryPolicy, response_status
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+@dataclass
+class FetchResponse:
+    """抓取結果，保留原始位元組以便後續解析"""
+    url: str
+    status: int
+    body: bytes
+    encoding: str = 'utf-8'
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        """以回應編碼解碼內容"""
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self) -> Any:
+        """解析JSON內容"""
+        return json.loads(self.text)
+
+    @classmethod
+    def from_cache(cls, entry: CachedResponse) -> "FetchResponse":
+        """由快取的回應建立抓取結果"""
+        return cls(
+            url=entry.url,
+            status=entry.status,
+            body=entry.body,
+            encoding=entry.encoding,
+            headers=dict(entry.headers)
+        )
+
+
+class AsyncFetcher:
+    """以網域為單位限流的非同步HTTP抓取器"""
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        concurrency_per_host: int = 4,
+        download_delay: float = 0.0,
+        timeout: float = 10,
+        cache: Optional[HttpCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        初始化抓取器
+
+        Args:
+            headers: 所有請求共用的headers
+            concurrency_per_host: 每個網域同時進行的最大請求數
+            download_delay: 同一網域兩次請求之間的最小間隔（秒）
+            timeout: 單一請求的逾時秒數
+            cache: HTTP回應快取，未指定時不使用快取
+            retry_policy: 重試策略，未指定時使用預設策略
+            circuit_breaker: 網域斷路器，可與其他抓取器共用
+        """
+        self.headers = dict(headers or {})
+        self.concurrency_per_host = max(1, int(concurrency_per_host))
+        self.download_delay = max(0.0, float(download_delay))
+        self.timeout = timeout
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._delay_locks: Dict[str, asyncio.Lock] = {}
+        self._last_request: Dict[str, float] = {}
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """建立共用的連線池"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.concurrency_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self) -> None:
+        """關閉連線池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        """取得網域專屬的併發限制"""
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.concurrency_per_host)
+        return self._semaphores[host]
+
+    async def _wait_politely(self, host: str) -> None:
+        """確保同一網域的請求間隔不小於 download_delay"""
+        if not self.download_delay:
+            return
+        lock = self._delay_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            elapsed = time.monotonic() - self._last_request.get(host, 0.0)
+            if elapsed < self.download_delay:
+                await asyncio.sleep(self.download_delay - elapsed)
+            self._last_request[host] = time.monotonic()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> FetchResponse:
+        """
+        發送請求，有設定快取時先查詢快取並以條件式請求重新驗證
+
+        Args:
+            method: HTTP方法
+            url: 目標URL
+            **kwargs: 傳給 aiohttp 的其他參數（如 json、headers）
+
+        Returns:
+            FetchResponse: 抓取結果
+
+        Raises:
+            CacheMissError: replay 模式下快取中沒有對應的回應
+            CircuitOpenError: 網域熔斷中
+        """
+        if self.cache is None:
+            return await self._fetch(method, url, **kwargs)
+
+        key, entry = await asyncio.to_thread(
+            self.cache.lookup, method, url, kwargs.get('json', kwargs.get('data'))
+        )
+        if self.cache.usable(entry):
+            return FetchResponse.from_cache(entry)
+
+        conditional = self.cache.conditional_headers(entry)
+        if conditional:
+            kwargs['headers'] = {**kwargs.get('headers', {}), **conditional}
+        response = await self._fetch(method, url, **kwargs)
+
+        if response.status == 304 and entry is not None:
+            await asyncio.to_thread(self.cache.touch, key)
+            return FetchResponse.from_cache(entry)
+        await asyncio.to_thread(
+            self.cache.put, key, url, response.status, response.body, response.encoding, response.headers
+        )
+        return response
+
+    async def _fetch(self, method: str, url: str, **kwargs) -> FetchResponse:
+        """實際發送請求，可重試的錯誤依重試策略退避後重試"""
+        await self.open()
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            probe = self.circuit_breaker.before_request(host)
+            try:
+                async with self._semaphore(host):
+                    await self._wait_politely(host)
+                    async with self._session.request(method, url, **kwargs) as response:
+                        response.raise_for_status()
+                        body = await response.read()
+                        result = FetchResponse(
+                            url=url,
+                            status=response.status,
+                            body=body,
+                            encoding=response.get_encoding(),
+                            headers=dict(response.headers)
+                        )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retriable = self.retry_policy.is_retriable(e)
+                if retriable:
+                    self.circuit_breaker.record_failure(host)
+                elif response_status(e) is not None:
+                    # 4xx 代表網域正常回應
+                    self.circuit_breaker.record_success(host)
+                if not retriable or attempt >= self.retry_policy.max_retries:
+                    logger.error(f"Failed to fetch {url}: {str(e)}")
+                    raise
+                delay = self.retry_policy.backoff(attempt, e)
+                attempt += 1
+                logger.warning(
+                    f"Retrying {url} in {delay:.1f}s ({attempt}/{self.retry_policy.max_retries}): {str(e)}"
+                )
+                # 退避等待時不佔用網域的併發名額
+                await asyncio.sleep(delay)
+            else:
+                self.circuit_breaker.record_success(host)
+                return result
+            finally:
+                # 試探請求被取消或以無法判定的錯誤結束時，避免網域一直停在等待試探結果
+                if probe:
+                    self.circuit_breaker.release_probe(host)
+
+    async def get(self, url: str, **kwargs) -> FetchResponse:
+        """發送GET請求"""
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> FetchResponse:
+        """發送POST請求"""
+        return await self.request('POST', url, **kwargs)
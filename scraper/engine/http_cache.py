@@ -0,0 +1,268 @@
+"""
+scraper/engine/http_cache.py
+
+HTTP回應快取：
+1. 以 SQLite 檔案保存回應內容與 ETag / Last-Modified
+2. 再次抓取時帶上 If-None-Match / If-Modified-Since，伺服器回應304時直接使用快取內容
+3. 依保存時間(TTL)與總容量淘汰最久未使用的回應
+4. replay 模式只從快取讀取、完全不連網，可用已錄製的資料重現整個流程
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+MODES = ('off', 'normal', 'replay')
+
+
+class CacheMissError(Exception):
+    """replay 模式下快取中沒有對應的回應"""
+
+
+@dataclass
+class CachedResponse:
+    """快取中的回應"""
+    url: str
+    status: int
+    body: bytes
+    encoding: str = 'utf-8'
+    headers: Dict[str, str] = field(default_factory=dict)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stored_at: float = 0.0
+
+
+def _header(headers: Dict[str, str], name: str) -> Optional[str]:
+    """不分大小寫取得header值"""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class HttpCache:
+    """以 SQLite 保存的HTTP回應快取，可在多個執行緒間共用"""
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = 'normal',
+        ttl: float = 7 * 24 * 3600,
+        max_bytes: int = 500 * 1024 * 1024,
+        fresh_for: float = 0
+    ):
+        """
+        初始化快取
+
+        Args:
+            path: SQLite 檔案路徑
+            mode: 'normal' 讀寫快取並向伺服器驗證，'replay' 只從快取讀取
+            ttl: 回應保存秒數，超過後淘汰
+            max_bytes: 快取內容總容量上限，超過時淘汰最久未使用的回應
+            fresh_for: 保存後多少秒內直接使用快取、不向伺服器驗證，0 表示每次都驗證
+        """
+        if mode not in MODES or mode == 'off':
+            raise ValueError(f"無效的快取模式: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                encoding TEXT,
+                headers TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+        self._total_bytes = 0
+        self.evict()
+        logger.info(f"HTTP快取({self.mode}): {self.path}，目前 {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    @property
+    def replay(self) -> bool:
+        """是否只從快取讀取"""
+        return self.mode == 'replay'
+
+    @staticmethod
+    def make_key(method: str, url: str, body: Any = None) -> str:
+        """
+        產生快取鍵，POST 請求的內容也納入計算
+
+        Args:
+            method: HTTP方法
+            url: 請求URL
+            body: 請求內容（如 json 參數）
+
+        Returns:
+            str: 快取鍵
+        """
+        payload = '' if body is None else json.dumps(body, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{method.upper()} {url}\n{payload}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """取得快取的回應，超過TTL的回應在非 replay 模式下視為不存在"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, body, encoding, headers, etag, last_modified, stored_at "
+                "FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not self.replay and time.time() - row[7] > self.ttl:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        return CachedResponse(
+            url=row[0],
+            status=row[1],
+            body=row[2],
+            encoding=row[3] or 'utf-8',
+            headers=json.loads(row[4] or '{}'),
+            etag=row[5],
+            last_modified=row[6],
+            stored_at=row[7]
+        )
+
+    def lookup(self, method: str, url: str, body: Any = None) -> Tuple[str, Optional[CachedResponse]]:
+        """
+        查詢請求對應的快取
+
+        Args:
+            method: HTTP方法
+            url: 請求URL
+            body: 請求內容
+
+        Returns:
+            Tuple[str, Optional[CachedResponse]]: (快取鍵, 快取的回應)
+
+        Raises:
+            CacheMissError: replay 模式下找不到快取
+        """
+        key = self.make_key(method, url, body)
+        entry = self.get(key)
+        if entry is None and self.replay:
+            raise CacheMissError(f"快取中沒有 {method.upper()} {url}")
+        return key, entry
+
+    def usable(self, entry: Optional[CachedResponse]) -> bool:
+        """快取的回應是否可不連網直接使用"""
+        if entry is None:
+            return False
+        return self.replay or time.time() - entry.stored_at < self.fresh_for
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CachedResponse]) -> Dict[str, str]:
+        """依快取的驗證資訊產生條件式請求headers"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def put(
+        self,
+        key: str,
+        url: str,
+        status: int,
+        body: bytes,
+        encoding: Optional[str],
+        headers: Dict[str, str]
+    ) -> None:
+        """保存回應，只保存 200 回應"""
+        if status != 200:
+            return
+        now = time.time()
+        size = len(body)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status, body, encoding, headers, etag, last_modified, stored_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, url, status, sqlite3.Binary(body), encoding,
+                    json.dumps(headers, ensure_ascii=False),
+                    _header(headers, 'ETag'), _header(headers, 'Last-Modified'),
+                    now, now, size
+                )
+            )
+            self._conn.commit()
+            self._total_bytes += size - (previous[0] if previous else 0)
+
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def touch(self, key: str) -> None:
+        """伺服器回應304時更新保存時間，視為重新驗證過的回應"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key)
+            )
+            self._conn.commit()
+
+    def evict(self) -> None:
+        """淘汰超過TTL的回應，總容量仍超過上限時由最久未使用者開始淘汰至上限的九成"""
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM responses WHERE stored_at < ?",
+                (time.time() - self.ttl,)
+            ).rowcount
+
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                target = total - int(self.max_bytes * 0.9)
+                freed = 0
+                keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    if freed >= target:
+                        break
+                    keys.append((key,))
+                    freed += size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+                total -= freed
+                evicted = len(keys)
+
+            self._conn.commit()
+            self._total_bytes = total
+
+        if expired or evicted:
+            logger.info(f"HTTP快取淘汰 {expired} 筆過期、{evicted} 筆超出容量的回應")
+
+    def close(self) -> None:
+        """關閉快取檔案"""
+        with self._lock:
+            self._conn.close()
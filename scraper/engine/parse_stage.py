@@ -0,0 +1,80 @@
+"""
+scraper/engine/parse_stage.py
+
+解析階段：
+HTML 解析屬於 CPU 密集工作，放在事件迴圈中會阻塞所有請求，且受 GIL 限制只能用到單核。
+此階段將原始回應交給行程池平行解析，並以信號量限制尚未解析完成的文章數量，
+抓取速度超過解析速度時抓取端會自動等待，記憶體用量不會無限增長。
+
+解析行程以 forkserver（不支援時為 spawn）啟動，不使用 fork：
+呼叫端已有背景執行緒（日誌、連線池、資料庫連線）時，fork 出的子行程可能複製到被佔用的鎖而卡住。
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+# 解析行程的啟動方式
+MP_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class ParseStage:
+    """以行程池執行解析，並限制待解析文章數量的處理階段"""
+
+    def __init__(self, workers: int = 0, max_pending: Optional[int] = None):
+        """
+        初始化解析階段
+
+        Args:
+            workers: 解析行程數，0 表示在事件迴圈的預設執行緒池中解析
+            max_pending: 同時抓取或等待解析的文章上限，未指定時為行程數的4倍
+        """
+        self.workers = max(0, int(workers))
+        self.max_pending = max_pending or max(self.workers, 1) * 4
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "ParseStage":
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if self.workers:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(MP_START_METHOD)
+            )
+            logger.info(f"啟動 {self.workers} 個解析行程，待解析上限 {self.max_pending} 篇")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            # 提前結束時取消尚未開始的解析工作
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=exc_type is not None)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        佔用一個待解析名額，應包住「抓取＋解析」整段流程，
+        名額用完時新的抓取會等待，形成背壓
+        """
+        async with self._slots:
+            yield
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """
+        在解析行程中執行函式
+
+        Args:
+            func: 模組層級、可序列化的解析函式
+            *args: 函式參數
+
+        Returns:
+            函式的回傳值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
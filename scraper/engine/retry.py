@@ -0,0 +1,191 @@
+"""
+scraper/engine/retry.py
+
+請求重試與熔斷：
+1. RetryPolicy: 只對逾時、連線錯誤與可重試的狀態碼(429/5xx)重試，
+   以帶隨機抖動的指數退避等待，並遵守伺服器的 Retry-After
+2. CircuitBreaker: 依網域累計連續失敗，超過門檻後在冷卻時間內直接失敗，
+   冷卻結束後只放行一個試探請求，成功才恢復
+
+同步(requests)與非同步(aiohttp)路徑共用同一套判斷。
+"""
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, FrozenSet, Optional
+
+import aiohttp
+import requests
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+RETRIABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# 沒有收到回應的網路錯誤
+NETWORK_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+
+class CircuitOpenError(Exception):
+    """網域熔斷中，請求未送出"""
+
+
+def response_status(exc: BaseException) -> Optional[int]:
+    """取得HTTP錯誤的狀態碼，非HTTP錯誤回傳None"""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code
+    return None
+
+
+def _response_headers(exc: BaseException) -> Dict[str, str]:
+    """取得HTTP錯誤回應的headers"""
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return dict(exc.headers or {})
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return dict(exc.response.headers)
+    return {}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After header
+
+    Args:
+        value: 秒數或HTTP日期
+
+    Returns:
+        Optional[float]: 需等待的秒數，無法解析時回傳None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """重試策略"""
+    max_retries: int = 3
+    base_delay: float = 0.5        # 第一次重試前的平均等待秒數
+    max_delay: float = 30.0        # 單次等待上限（含 Retry-After）
+    retriable_statuses: FrozenSet[int] = RETRIABLE_STATUSES
+
+    def is_retriable(self, exc: BaseException) -> bool:
+        """是否為值得重試的錯誤：網路錯誤或可重試的狀態碼"""
+        status = response_status(exc)
+        if status is not None:
+            return status in self.retriable_statuses
+        return isinstance(exc, NETWORK_ERRORS)
+
+    def backoff(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """
+        計算第 attempt 次重試前的等待秒數
+
+        Args:
+            attempt: 已重試次數，從0開始
+            exc: 本次的錯誤，回應帶有 Retry-After 時以其為準
+
+        Returns:
+            float: 等待秒數
+        """
+        if exc is not None:
+            headers = {k.lower(): v for k, v in _response_headers(exc).items()}
+            retry_after = parse_retry_after(headers.get('retry-after'))
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+        # full jitter：在 0 ~ base * 2^attempt 之間隨機，避免多個請求同時重試
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """依網域熔斷的斷路器，可在多個執行緒間共用"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """
+        初始化斷路器
+
+        Args:
+            failure_threshold: 連續失敗幾次後熔斷
+            reset_timeout: 熔斷後多少秒放行試探請求
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._probing: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, host: str) -> bool:
+        """
+        送出請求前檢查網域狀態
+
+        Returns:
+            bool: 此請求是否為冷卻結束後的試探請求，是的話呼叫端需在請求結束時呼叫 release_probe
+
+        Raises:
+            CircuitOpenError: 網域熔斷中，或試探請求尚未完成
+        """
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return False
+            remaining = opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(f"{host} 熔斷中，{remaining:.0f} 秒後重試")
+            if self._probing.get(host):
+                raise CircuitOpenError(f"{host} 熔斷中，等待試探請求結果")
+            self._probing[host] = True
+            return True
+
+    def release_probe(self, host: str) -> None:
+        """
+        試探請求結束但沒有判定成功或失敗時（如被取消、無狀態碼的非網路錯誤）釋放試探名額，
+        網域維持熔斷，下一個請求可再次試探；已記錄成功或失敗時不做任何事
+        """
+        with self._lock:
+            self._probing.pop(host, None)
+
+    def record_success(self, host: str) -> None:
+        """網域有正常回應，清除失敗紀錄"""
+        with self._lock:
+            if host in self._opened_at:
+                logger.info(f"{host} 已恢復，解除熔斷")
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._probing.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        """記錄一次失敗，達到門檻或試探失敗時熔斷"""
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if self._probing.pop(host, False) or failures >= self.failure_threshold:
+                logger.warning(f"{host} 連續失敗 {failures} 次，熔斷 {self.reset_timeout:.0f} 秒")
+                self._opened_at[host] = time.monotonic()
+
+    def is_open(self, host: str) -> bool:
+        """網域是否處於熔斷狀態"""
+        with self._lock:
+            return host in self._opened_at
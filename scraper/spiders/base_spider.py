@@ -1,36 +1,130 @@
 import requests
 from bs4 import BeautifulSoup
 import logging
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+from scraper.engine.fetcher import AsyncFetcher, FetchResponse
+from scraper.engine.http_cache import HttpCache
+from scraper.engine.retry import CircuitBreaker, RetryPolicy, response_status
+from scraper.utils.http_client import http_clients
 
 class BaseNewsSpider:
     name = 'base_spider'
     allowed_domains = []
     start_urls = []
-    
-    def __init__(self):
+    custom_headers = {}
+
+    # 非同步抓取引擎設定
+    concurrency_per_host = 4    # 每個網域同時進行的請求數
+    download_delay = 0.0        # 同一網域請求間的禮貌延遲(秒)
+    request_timeout = 10
+
+    # 重試策略與網域斷路器，斷路器由所有爬蟲共用
+    retry_policy = RetryPolicy()
+    circuit_breaker = CircuitBreaker()
+
+    # HTTP回應快取，None 表示不使用快取
+    http_cache: Optional[HttpCache] = None
+
+    def __init__(self, concurrency_per_host=None, download_delay=None, http_cache=None):
         self.logger = logging.getLogger(self.name)
-        self.session = requests.Session()
-        self.session.headers.update(self._default_headers())
-        
+        # 同一網域的爬蟲共用連線池，headers 隨每個請求傳入
+        self.headers = {**self._default_headers(), **self.custom_headers}
+
+        if concurrency_per_host is not None:
+            self.concurrency_per_host = concurrency_per_host
+        if download_delay is not None:
+            self.download_delay = download_delay
+        if http_cache is not None:
+            self.http_cache = http_cache
+
     def _default_headers(self):
         return {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
             'Accept-Language': 'zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7'
         }
-    
+
+    def create_fetcher(self) -> AsyncFetcher:
+        """建立使用相同headers與限流設定的非同步抓取器"""
+        return AsyncFetcher(
+            headers={**self._default_headers(), **self.custom_headers},
+            concurrency_per_host=self.concurrency_per_host,
+            download_delay=self.download_delay,
+            timeout=self.request_timeout,
+            cache=self.http_cache,
+            retry_policy=self.retry_policy,
+            circuit_breaker=self.circuit_breaker
+        )
+
     def start_requests(self):
         for url in self.start_urls:
             yield self._request_with_retry(url)
-            
-    def _request_with_retry(self, url, retries=3):
-        try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return response
-        except Exception as e:
-            if retries > 0:
-                self.logger.warning(f"Retrying {url}, remaining retries: {retries-1}")
-                return self._request_with_retry(url, retries-1)
+
+    def _send(self, method, url, **kwargs) -> FetchResponse:
+        """發送單次請求，有設定快取時先查詢快取並以條件式請求重新驗證"""
+        kwargs.setdefault('timeout', self.request_timeout)
+        key = entry = None
+        if self.http_cache is not None:
+            key, entry = self.http_cache.lookup(method, url, kwargs.get('json', kwargs.get('data')))
+            if self.http_cache.usable(entry):
+                return FetchResponse.from_cache(entry)
+            conditional = self.http_cache.conditional_headers(entry)
+            if conditional:
+                kwargs['headers'] = {**kwargs.get('headers', {}), **conditional}
+
+        response = self._send_with_retry(method, url, **kwargs)
+
+        if self.http_cache is not None:
+            if response.status_code == 304 and entry is not None:
+                self.http_cache.touch(key)
+                return FetchResponse.from_cache(entry)
+            self.http_cache.put(
+                key, url, response.status_code, response.content, response.encoding, dict(response.headers)
+            )
+        return FetchResponse(
+            url=url,
+            status=response.status_code,
+            body=response.content,
+            encoding=response.encoding or 'utf-8',
+            headers=dict(response.headers)
+        )
+
+    def _send_with_retry(self, method, url, **kwargs) -> requests.Response:
+        """以session發送請求，可重試的錯誤依重試策略退避後重試"""
+        host = urlsplit(url).netloc
+        session = http_clients.session(url, pool_maxsize=self.concurrency_per_host)
+        kwargs['headers'] = {**self.headers, **kwargs.get('headers', {})}
+        attempt = 0
+        while True:
+            probe = self.circuit_breaker.before_request(host)
+            try:
+                response = session.request(method, url, **kwargs)
+                response.raise_for_status()
+            except Exception as e:
+                retriable = self.retry_policy.is_retriable(e)
+                if retriable:
+                    self.circuit_breaker.record_failure(host)
+                elif response_status(e) is not None:
+                    # 4xx 代表網域正常回應
+                    self.circuit_breaker.record_success(host)
+                if not retriable or attempt >= self.retry_policy.max_retries:
+                    self.logger.error(f"Failed to fetch {url}: {str(e)}")
+                    raise
+                delay = self.retry_policy.backoff(attempt, e)
+                attempt += 1
+                self.logger.warning(
+                    f"Retrying {url} in {delay:.1f}s ({attempt}/{self.retry_policy.max_retries}): {str(e)}"
+                )
+                time.sleep(delay)
             else:
-                self.logger.error(f"Failed to fetch {url}: {str(e)}")
-                raise 
\ No newline at end of file
+                self.circuit_breaker.record_success(host)
+                return response
+            finally:
+                # 試探請求以無法判定的錯誤結束時（如 InvalidURL），避免網域一直停在等待試探結果
+                if probe:
+                    self.circuit_breaker.release_probe(host)
+
+    def _request_with_retry(self, url, method='GET', **kwargs) -> FetchResponse:
+        """發送請求，經過HTTP快取並依重試策略重試"""
+        return self._send(method, url, **kwargs)
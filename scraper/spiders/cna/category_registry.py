@@ -0,0 +1,250 @@
+"""
+scraper/spiders/cna/category_registry.py
+
+整個行程共用的新聞類別表：
+1. 第一次使用時載入 configs/categories.json（可爬取的類別），並合併其他來源（如資料庫的 news_categories）；
+   配置檔不存在或無法讀取時，爬取中央社主選單重新產生配置檔
+2. 載入結果為不可變的快照，查詢類別代碼或名稱不需存取磁碟，快照可跨執行緒共用
+3. 每隔 check_interval 秒才檢查一次配置檔的修改時間，檔案變更或超過 refresh_interval 秒時重新載入
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from scraper.utils.logger import setup_logger
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+CATEGORIES_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'configs', 'categories.json')
+
+CategorySource = Callable[[], Dict[str, str]]
+
+
+def scrape_menu_categories() -> Dict[str, str]:
+    """爬取中央社主選單的類別，成功時寫入 categories.json"""
+    # cna_menu_scraper 會匯入本模組，在使用時才匯入以避免循環匯入
+    from .cna_menu_scraper import CnaMenuScraper
+
+    scraper = CnaMenuScraper()
+    menu_mapping = scraper._scrape_menu_mapping()
+    if menu_mapping:
+        # 呼叫端正在重新載入類別表，寫入後不需再通知
+        scraper._save_config(menu_mapping, refresh=False)
+    return menu_mapping
+
+
+def normalize_category_text(text: str) -> str:
+    """統一寫法：去除空白、英文小寫、臺改為台、省略結尾的「新聞」"""
+    text = ''.join(text.split()).lower().replace('臺', '台')
+    if len(text) > 2 and text.endswith('新聞'):
+        text = text[:-2]
+    return text
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """某次載入的類別表，建立後不再變更"""
+    names: Mapping[str, str]               # 類別代碼對應的名稱
+    crawlable: FrozenSet[str]              # categories.json 中可爬取的類別
+    subscribable: FrozenSet[str]           # 其他來源（資料庫）中可訂閱的類別，沒有來源時同 crawlable
+    _index: Mapping[str, str] = field(repr=False, default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def build(cls, crawlable: Dict[str, str], sources: List[Dict[str, str]]) -> "CategorySnapshot":
+        """
+        合併配置檔與其他來源，其他來源的名稱優先
+
+        Args:
+            crawlable: categories.json 的類別代碼對應名稱
+            sources: 其他來源的類別代碼對應名稱
+        """
+        names = dict(crawlable)
+        subscribable = set()
+        for source in sources:
+            names.update(source)
+            subscribable.update(source)
+        if not sources:
+            subscribable = set(crawlable)
+
+        # 代碼與名稱都可查詢；名稱以來源中的寫法為主，配置檔的名稱作為別名
+        index: Dict[str, str] = {}
+        for key, name in names.items():
+            index.setdefault(key.lower(), key)
+            index.setdefault(normalize_category_text(name), key)
+        for key, name in crawlable.items():
+            index.setdefault(normalize_category_text(name), key)
+        return cls(
+            names=MappingProxyType(names),
+            crawlable=frozenset(crawlable),
+            subscribable=frozenset(subscribable),
+            _index=MappingProxyType(index)
+        )
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.names
+
+    def name(self, key: str) -> str:
+        """類別名稱，未知類別回傳代碼"""
+        return self.names.get(key, key)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        將類別代碼或名稱解析為類別代碼
+
+        Args:
+            text: 類別代碼或名稱
+
+        Returns:
+            Optional[str]: 類別代碼，找不到時為None
+        """
+        return self._index.get(normalize_category_text(text))
+
+
+class CategoryRegistry:
+    """延遲載入、定期更新的類別表"""
+
+    def __init__(
+        self,
+        config_path: str = CATEGORIES_CONFIG_PATH,
+        refresh_interval: float = 600,
+        check_interval: float = 30,
+        fallback: Optional[CategorySource] = scrape_menu_categories
+    ):
+        """
+        初始化類別表
+
+        Args:
+            config_path: 類別配置檔
+            refresh_interval: 即使配置檔未變更，也重新載入（包含其他來源）的間隔秒數
+            check_interval: 檢查配置檔修改時間的最短間隔秒數
+            fallback: 配置檔不存在或無法讀取時取得可爬取類別的函式，None 表示不使用
+        """
+        self.config_path = config_path
+        self.fallback = fallback
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self._sources: Dict[str, CategorySource] = {}
+        self._snapshot: Optional[CategorySnapshot] = None
+        self._mtime: Optional[float] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def add_source(self, name: str, source: CategorySource) -> None:
+        """
+        加入其他類別來源，下次查詢時重新載入
+
+        Args:
+            name: 來源名稱，同名來源會被取代
+            source: 回傳類別代碼對應名稱的函式
+        """
+        with self._lock:
+            self._sources[name] = source
+            self._checked_at = 0.0
+            self._loaded_at = 0.0
+
+    def _config_mtime(self) -> Optional[float]:
+        """配置檔的修改時間，檔案不存在時為None"""
+        try:
+            return os.stat(self.config_path).st_mtime
+        except OSError:
+            return None
+
+    def _load_config(self) -> Dict[str, str]:
+        """讀取類別配置檔，不存在、無法讀取或沒有類別時改用 fallback"""
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                categories = json.load(f)
+            if categories:
+                return categories
+            logger.error(f"類別配置檔沒有任何類別: {self.config_path}")
+        except FileNotFoundError:
+            logger.warning(f"找不到類別配置檔: {self.config_path}")
+        except Exception as e:
+            logger.error(f"讀取類別配置失敗: {str(e)}")
+
+        if self.fallback is None:
+            return {}
+        logger.info("改為爬取中央社主選單取得類別")
+        try:
+            categories = dict(self.fallback())
+        except Exception as e:
+            categories = {}
+            logger.error(f"爬取類別失敗: {str(e)}")
+        if not categories:
+            logger.error("無法取得可爬取的類別，所有爬取類別都會被拒絕，將於下次重新載入時重試")
+        return categories
+
+    def _load_sources(self) -> Tuple[List[Dict[str, str]], bool]:
+        """讀取其他來源，回傳 (結果, 是否全部成功)"""
+        results, complete = [], True
+        for name, source in self._sources.items():
+            try:
+                results.append(dict(source()))
+            except Exception as e:
+                logger.error(f"讀取類別來源 {name} 失敗: {str(e)}")
+                complete = False
+        return results, complete
+
+    def _reload(self, mtime: Optional[float]) -> None:
+        """在持有鎖的情況下重新載入"""
+        crawlable = self._load_config()
+        sources, complete = self._load_sources()
+        if not complete and self._snapshot is not None:
+            # 來源暫時無法讀取時保留上一份可訂閱類別
+            sources.append({key: self._snapshot.names[key] for key in self._snapshot.subscribable})
+        snapshot = CategorySnapshot.build(crawlable, sources)
+
+        if self._sources:
+            not_subscribable = sorted(snapshot.crawlable - snapshot.subscribable)
+            not_crawlable = sorted(snapshot.subscribable - snapshot.crawlable)
+            if not_subscribable:
+                logger.warning(f"類別配置中的 {not_subscribable} 不在可訂閱類別中")
+            if not_crawlable:
+                logger.warning(f"可訂閱類別 {not_crawlable} 不在類別配置中，無法爬取")
+
+        self._snapshot = snapshot
+        self._mtime = mtime
+        self._loaded_at = time.monotonic()
+        logger.info(f"載入 {len(snapshot.names)} 個新聞類別")
+
+    def snapshot(self) -> CategorySnapshot:
+        """
+        取得目前的類別表，必要時重新載入
+
+        Returns:
+            CategorySnapshot: 類別表快照
+        """
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            mtime = self._config_mtime()
+            if (
+                self._snapshot is None
+                or mtime != self._mtime
+                or now - self._loaded_at >= self.refresh_interval
+            ):
+                self._reload(mtime)
+            self._checked_at = now
+            return self._snapshot
+
+    def refresh(self) -> CategorySnapshot:
+        """立即重新載入，例如更新配置檔之後"""
+        with self._lock:
+            self._reload(self._config_mtime())
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+
+# 整個行程共用的類別表
+category_registry = CategoryRegistry()
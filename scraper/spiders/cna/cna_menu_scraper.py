@@ -1,9 +1,11 @@
 from scraper.spiders.base_spider import BaseNewsSpider
 import json
+import logging
 import os
 from typing import Dict
 from bs4 import BeautifulSoup
 from scraper.utils.logger import setup_logger
+from .category_registry import CATEGORIES_CONFIG_PATH, category_registry
 
 # 使用自定義的logger設置
 logger = setup_logger(__name__)
@@ -21,7 +23,7 @@ class CnaMenuScraper(BaseNewsSpider):
         # 設定配置文件路徑
         current_dir = os.path.dirname(os.path.abspath(__file__))
         self.config_dir = os.path.join(current_dir, 'configs')
-        self.config_path = os.path.join(self.config_dir, 'categories.json')
+        self.config_path = CATEGORIES_CONFIG_PATH
         
         # 確保配置目錄存在
         os.makedirs(self.config_dir, exist_ok=True)
@@ -54,12 +56,21 @@ class CnaMenuScraper(BaseNewsSpider):
             self.logger.error(f"讀取配置文件失敗: {str(e)}")
             return {}
 
-    def _save_config(self, menu_mapping: Dict[str, str]) -> None:
-        """保存類別映射到配置文件"""
+    def _save_config(self, menu_mapping: Dict[str, str], refresh: bool = True) -> None:
+        """
+        保存類別映射到配置文件
+        
+        Args:
+            menu_mapping: 類別映射
+            refresh: 是否讓共用的類別表重新載入（類別表自行爬取時為False）
+        """
         try:
             with open(self.config_path, 'w', encoding='utf-8') as f:
                 json.dump(menu_mapping, f, ensure_ascii=False, indent=2)
             self.logger.info("配置文件已更新")
+            if refresh:
+                # 讓共用的類別表立即使用新的配置
+                category_registry.refresh()
         except Exception as e:
             self.logger.error(f"保存配置文件失敗: {str(e)}")
 
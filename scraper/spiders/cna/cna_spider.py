@@ -1,28 +1,61 @@
 from scraper.spiders.base_spider import BaseNewsSpider
-import re
+from scraper.engine.fetcher import AsyncFetcher, FetchResponse
+from scraper.engine.http_cache import HttpCache
+from scraper.engine.bridge import iterate_async
+from scraper.engine.parse_stage import ParseStage
+import asyncio
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
 import requests
 import logging
 import os
-from typing import Dict, Optional, Generator
-from .cna_menu_scraper import CnaMenuScraper
+from typing import AsyncGenerator, Callable, Dict, List, Mapping, Optional, Generator, Set, Tuple
+from .category_registry import category_registry
+from .content_extractor import extract_content, extract_content_from_bytes
 from scraper.utils.logger import setup_logger
 
+# 增量爬取水位線：(最新文章的發布時間, 文章URL)
+Watermark = Tuple[datetime, str]
+
 class CnaSpider(BaseNewsSpider):
     """中央社新聞爬蟲"""
     
     name = "cna"
     api_url = "https://www.cna.com.tw/cna2018api/api/WNewsList"
     DEFAULT_PAGE_SIZE = 20     # 預設每頁新聞數量
+    download_delay = 0.2       # 同一網域請求間的禮貌延遲(秒)
+    content_parser = 'lxml'    # 文章內容擷取方式: 'lxml' 快速擷取 / 'bs4' 原本的擷取方式
+    parse_workers = 0          # 解析行程數，0 表示在背景執行緒中解析
+
+    # API專用的headers
+    custom_headers = {
+        'Referer': 'https://www.cna.com.tw/',
+        'Origin': 'https://www.cna.com.tw',
+        'Accept': 'application/json, text/plain, */*',
+        'Content-Type': 'application/json'
+    }
 
-    def __init__(self, category="acul"):
+    def __init__(
+        self,
+        category="acul",
+        concurrency_per_host=None,
+        download_delay=None,
+        watermark: Optional[Watermark] = None,
+        http_cache: Optional[HttpCache] = None
+    ):
         """
         初始化爬蟲
         Args:
             category (str): 新聞類別代碼
+            concurrency_per_host (int): 每個網域同時進行的請求數
+            download_delay (float): 同一網域請求間的禮貌延遲(秒)
+            watermark (Watermark): 已入庫的最新文章 (CreateTime, PageUrl)，用於增量爬取
+            http_cache (HttpCache): HTTP回應快取
         """
-        super().__init__()
+        super().__init__(
+            concurrency_per_host=concurrency_per_host,
+            download_delay=download_delay,
+            http_cache=http_cache
+        )
         # 設置logger，控制台只顯示INFO及以上級別
         self.logger = setup_logger(
             self.__class__.__name__,
@@ -30,21 +63,24 @@ class CnaSpider(BaseNewsSpider):
             file_level=logging.DEBUG
         )
         
-        # 設置API專用的headers
-        self.session.headers.update({
-            'Referer': 'https://www.cna.com.tw/',
-            'Origin': 'https://www.cna.com.tw',
-            'Accept': 'application/json, text/plain, */*',
-            'Content-Type': 'application/json'
-        })
-        
-        # 載入類別配置
-        menu_scraper = CnaMenuScraper()
-        self.categories_map = menu_scraper.get_menu_mapping()
-        
         # 利用 property 的 setter 設定初始類別
         self.category = category
         self.cutoff_time = datetime.now() - timedelta(hours=24)
+        # 回補歷史新聞時的上限時間，晚於此時間的新聞會略過但不停止翻頁
+        self.until_time: Optional[datetime] = None
+        
+        # 增量爬取：早於(或等於)水位線的文章視為已入庫
+        self.watermark = watermark
+        self._listed: List[Watermark] = []
+        self._failed_times: List[datetime] = []
+        # 列表是否完整列到截止時間或水位線；列表請求失敗或因頁數上限停止時為False
+        self._listing_complete = True
+
+    @property
+    def categories_map(self) -> Mapping[str, str]:
+        """可爬取的類別代碼與名稱，由共用的類別表提供"""
+        snapshot = category_registry.snapshot()
+        return {code: snapshot.name(code) for code in snapshot.crawlable}
 
     @property
     def category(self) -> str:
@@ -59,7 +95,7 @@ class CnaSpider(BaseNewsSpider):
             category_code (str): 類別代碼
         """
         # 檢查類別代碼是否在可用類別值中
-        if category_code not in self.categories_map.keys():
+        if category_code not in category_registry.snapshot().crawlable:
             available_categories = "\n".join([
                 f"- {code}: {name}" 
                 for code, name in self.categories_map.items()
@@ -70,6 +106,94 @@ class CnaSpider(BaseNewsSpider):
             )
         self._category = category_code
 
+    def _build_payload(self, page: int, page_size: int) -> Dict:
+        """組成新聞列表API的請求內容"""
+        return {
+            "action": "0",
+            "category": self.category,
+            "pagesize": str(page_size),
+            "pageidx": page
+        }
+
+    @staticmethod
+    def _parse_create_time(item: Dict) -> datetime:
+        """解析API回應中的CreateTime"""
+        return datetime.strptime(item['CreateTime'], '%Y/%m/%d %H:%M')
+
+    def _is_known(self, news_time: datetime, url: str) -> bool:
+        """判斷文章是否已在上次爬取時入庫"""
+        if not self.watermark:
+            return False
+        watermark_time, watermark_url = self.watermark
+        return news_time < watermark_time or url == watermark_url
+
+    def _select_news_items(self, data: Dict, page_size: int) -> Tuple[list, bool]:
+        """
+        從API回應中篩選時間範圍內且尚未入庫的新聞
+        Args:
+            data (Dict): API回應內容
+            page_size (int): 每頁新聞數量
+        Returns:
+            Tuple[list, bool]: (新聞列表, 是否需要繼續爬取下一頁)
+
+        Raises:
+            ValueError: API回應錯誤，與列表結尾區分
+        """
+        if data["Result"] != "Y":
+            raise ValueError(f"API返回錯誤: {data}")
+        
+        raw_items = data["ResultData"]["Items"]
+        # 頁面未滿表示已經沒有更多新聞
+        has_more = len(raw_items) >= page_size
+        news_items = []
+        for item in raw_items:
+            news_time = self._parse_create_time(item)
+            if news_time < self.cutoff_time or self._is_known(news_time, item['PageUrl']):
+                # 列表依時間由新到舊排列，到達截止時間或已入庫的文章後不需再翻頁
+                has_more = False
+                continue
+            if self.until_time and news_time > self.until_time:
+                continue
+            news_items.append(item)
+                
+        return news_items, has_more
+
+    def _filter_news_items(self, data: Dict, page_size: int = DEFAULT_PAGE_SIZE) -> list:
+        """
+        從API回應中篩選時間範圍內且尚未入庫的新聞
+        Args:
+            data (Dict): API回應內容
+            page_size (int): 每頁新聞數量
+        Returns:
+            list: 新聞列表
+        """
+        return self._select_news_items(data, page_size)[0]
+
+    @property
+    def listing_complete(self) -> bool:
+        """本次爬取是否列出了截止時間或水位線之前的所有文章"""
+        return self._listing_complete
+
+    @property
+    def next_watermark(self) -> Optional[Watermark]:
+        """
+        本次爬取後可推進到的水位線
+        
+        有文章下載失敗時，水位線只推進到最早失敗文章之前，確保下次執行會重試。
+        列表未完整列出時（列表請求失敗或到達頁數上限），未列出的文章都比已列出的舊，
+        推進到任何已列出的文章都會略過它們，因此保持原水位線。
+        """
+        if not self._listing_complete:
+            return self.watermark
+        failed_before = min(self._failed_times) if self._failed_times else None
+        candidates = [
+            mark for mark in self._listed
+            if failed_before is None or mark[0] < failed_before
+        ]
+        if self.watermark:
+            candidates.append(self.watermark)
+        return max(candidates, key=lambda mark: mark[0]) if candidates else None
+
     def get_news_list(self, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> list:
         """
         從API獲取新聞列表
@@ -80,89 +204,209 @@ class CnaSpider(BaseNewsSpider):
             list: 新聞列表
         """
         try:
-            payload = {
-                "action": "0",
-                "category": self.category,
-                "pagesize": str(page_size),
-                "pageidx": page
-            }
-            
-            # 使用父類的session發送請求
-            response = self.session.post(self.api_url, json=payload)
-            response.raise_for_status()
+            payload = self._build_payload(page, page_size)
             
-            data = response.json()
-            if data["Result"] != "Y":
-                self.logger.error(f"API返回錯誤: {data}")
-                return []
+            # 使用父類的_request_with_retry方法（經過HTTP快取並可重試）
+            response = self._request_with_retry(self.api_url, method='POST', json=payload)
             
-            # 篩選24小時內的新聞
-            news_items = []
-            for item in data["ResultData"]["Items"]:
-                news_time = datetime.strptime(
-                    item['CreateTime'], 
-                    '%Y/%m/%d %H:%M'
-                )
-                if news_time >= self.cutoff_time:
-                    news_items.append(item)
-                    
-            return news_items
+            return self._filter_news_items(response.json(), page_size)
             
         except Exception as e:
             self.logger.error(f"獲取新聞列表失敗: {str(e)}", exc_info=True)
             return []
 
-    def crawl(self, max_pages: int = 2) -> Generator[Dict, None, None]:
+    async def _fetch_news_list(
+        self,
+        fetcher: AsyncFetcher,
+        page: int,
+        page_size: int
+    ) -> Tuple[list, bool]:
+        """以非同步抓取器獲取新聞列表，失敗時回傳空列表並停止翻頁，且標記列表不完整"""
+        try:
+            payload = self._build_payload(page, page_size)
+            response = await fetcher.post(self.api_url, json=payload)
+            return self._select_news_items(response.json(), page_size)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"獲取第 {page} 頁新聞列表失敗，本次不推進水位線: {str(e)}", exc_info=True)
+            self._listing_complete = False
+            return [], False
+
+    def _build_article_data(self, news: Dict) -> Dict:
+        """從API回應中提取文章基本資料"""
+        return {
+            'title': news['HeadLine'],
+            'url': news['PageUrl'],
+            'publish_time': self._parse_create_time(news),
+            'source': '中央社',
+            'category': self.category
+        }
+
+    async def _parse_response(self, response: FetchResponse, parse_stage: Optional[ParseStage]) -> Optional[Dict]:
+        """在解析階段（或背景執行緒）解析文章，避免阻塞事件迴圈"""
+        if parse_stage is None:
+            return await asyncio.to_thread(self.parse_article, response.text, response.url)
+        
+        content = await parse_stage.run(
+            extract_content_from_bytes, response.body, response.encoding, self.content_parser
+        )
+        if not content:
+            self.logger.warning(f"找不到文章內容: {response.url}")
+            return None
+        return {
+            'content': content
+        }
+
+    async def _fetch_article(
+        self,
+        fetcher: AsyncFetcher,
+        news: Dict,
+        parse_stage: Optional[ParseStage] = None
+    ) -> Optional[Dict]:
+        """下載並解析單篇文章，失敗時回傳None"""
+        try:
+            article_data = self._build_article_data(news)
+            if parse_stage is None:
+                response = await fetcher.get(article_data['url'])
+                article_content = await self._parse_response(response, None)
+            else:
+                # 抓取與解析共用一個名額，解析跟不上時暫停抓取
+                async with parse_stage.slot():
+                    response = await fetcher.get(article_data['url'])
+                    article_content = await self._parse_response(response, parse_stage)
+            if not article_content:
+                return None
+            article_data.update(article_content)
+            return article_data
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(
+                f"處理新聞失敗 {news.get('PageUrl', '')}: {str(e)}", 
+                exc_info=True
+            )
+            if 'CreateTime' in news:
+                self._failed_times.append(self._parse_create_time(news))
+            return None
+
+    @staticmethod
+    def _claim_unseen(news_list: list, seen_urls: Set[str]) -> list:
+        """過濾已被其他類別處理過的文章，並登記本頁文章"""
+        unseen = []
+        for news in news_list:
+            url = news.get('PageUrl')
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+            unseen.append(news)
+        return unseen
+
+    async def _apply_url_filter(
+        self,
+        news_list: list,
+        url_filter: Callable[[List[str]], List[str]]
+    ) -> list:
+        """在背景執行緒中呼叫URL過濾器，略過不需下載的文章"""
+        urls = [news['PageUrl'] for news in news_list]
+        try:
+            wanted = set(await asyncio.to_thread(url_filter, urls))
+        except Exception as e:
+            self.logger.error(f"URL過濾失敗，將下載本頁所有文章: {str(e)}")
+            return news_list
+        
+        skipped = len(news_list) - len(wanted)
+        if skipped:
+            self.logger.info(f"略過 {skipped} 篇已入庫的文章")
+        return [news for news in news_list if news['PageUrl'] in wanted]
+
+    async def crawl_async(
+        self,
+        fetcher: AsyncFetcher,
+        max_pages: int = 2,
+        seen_urls: Optional[Set[str]] = None,
+        url_filter: Optional[Callable[[List[str]], List[str]]] = None,
+        parse_stage: Optional[ParseStage] = None
+    ) -> AsyncGenerator[Dict, None]:
         """
-        爬取新聞
+        以非同步方式爬取新聞，下一頁列表與本頁文章同時下載，文章依完成順序產出
         Args:
-            max_pages (int): 最大爬取頁數，預設2頁以確保獲取足夠的24小時內新聞
+            fetcher (AsyncFetcher): 共用的非同步抓取器
+            max_pages (int): 最大爬取頁數
+            seen_urls (Set[str]): 跨類別共用的已處理URL集合，已在其中的文章不會重複下載
+            url_filter (Callable): 每頁呼叫一次，傳入本頁URL並回傳仍需下載的URL（如已入庫去重）
+            parse_stage (ParseStage): 平行解析HTML的行程池，未指定時在背景執行緒中解析
         Yields:
             Dict: 新聞資料
         """
         total_fetched = 0
-        page = 1    
-        need_fetching = True
+        page = 1
         page_size = self.DEFAULT_PAGE_SIZE
+        self._listed = []
+        self._failed_times = []
+        self._listing_complete = True
+        next_list = asyncio.ensure_future(self._fetch_news_list(fetcher, page, page_size))
+        pending = []
         
-        while need_fetching and page <= max_pages:
-            news_list = self.get_news_list(page=page, page_size=page_size)
-            # 如果當前頁面的新聞數量小於預設值,表示已經沒有更多新聞,不需要繼續爬取下一頁
-            if len(news_list) < self.DEFAULT_PAGE_SIZE:
-                self.logger.info(f"新聞內容數量({len(news_list)})小於預設值({self.DEFAULT_PAGE_SIZE}),將會停止爬取")
-                need_fetching = False
-            else:
-                page += 1
+        try:
+            while next_list is not None:
+                news_list, has_more = await next_list
+                next_list = None
+                
+                self._listed.extend(
+                    (self._parse_create_time(news), news['PageUrl'])
+                    for news in news_list
+                )
                 
-            for news in news_list:
-                try:
-                    # 從API回應中提取資料
-                    article_data = {
-                        'title': news['HeadLine'],
-                        'url': news['PageUrl'],
-                        'publish_time': datetime.strptime(
-                            news['CreateTime'], 
-                            '%Y/%m/%d %H:%M'
-                        ),
-                        'source': '中央社',
-                        'category': self.category
-                    }
-                    
-                    # 獲取並解析文章內容
-                    article_content = self.get_article_content(article_data['url'])
-                    if article_content:
-                        article_data.update(article_content)
+                # 已經沒有更多新聞或已到達截止時間、已入庫的文章,不需要繼續爬取下一頁
+                if not has_more:
+                    self.logger.info(f"第 {page} 頁已到達列表結尾或截止時間,將會停止爬取")
+                elif page < max_pages:
+                    page += 1
+                    next_list = asyncio.ensure_future(self._fetch_news_list(fetcher, page, page_size))
+                else:
+                    self._listing_complete = False
+                    self.logger.warning(f"已到達頁數上限 {max_pages} 頁，尚有未列出的新聞，本次不推進水位線")
+                
+                if seen_urls is not None:
+                    news_list = self._claim_unseen(news_list, seen_urls)
+                
+                if url_filter is not None and news_list:
+                    news_list = await self._apply_url_filter(news_list, url_filter)
+                
+                pending = [
+                    asyncio.ensure_future(self._fetch_article(fetcher, news, parse_stage))
+                    for news in news_list
+                ]
+                for task in asyncio.as_completed(pending):
+                    article_data = await task
+                    if article_data:
                         total_fetched += 1
                         yield article_data
-                        
-                except Exception as e:
-                    self.logger.error(
-                        f"處理新聞失敗 {news.get('PageUrl', '')}: {str(e)}", 
-                        exc_info=True
-                    )
-                    continue
-            
-            self.logger.info(f"已爬取 {total_fetched} 篇24小時內的新聞")
+                
+                self.logger.info(f"已爬取 {total_fetched} 篇24小時內的新聞")
+        finally:
+            # 提前結束時取消尚未完成的請求
+            for task in [*pending, next_list]:
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def crawl(self, max_pages: int = 2) -> Generator[Dict, None, None]:
+        """
+        爬取新聞
+        Args:
+            max_pages (int): 最大爬取頁數，預設2頁以確保獲取足夠的24小時內新聞
+        Yields:
+            Dict: 新聞資料
+        """
+        async def _crawl():
+            async with self.create_fetcher() as fetcher, ParseStage(self.parse_workers) as parse_stage:
+                async for article_data in self.crawl_async(
+                    fetcher, max_pages=max_pages, parse_stage=parse_stage
+                ):
+                    yield article_data
+        
+        yield from iterate_async(_crawl)
 
     def get_article_content(self, url: str) -> Optional[Dict]:
         """
@@ -175,64 +419,26 @@ class CnaSpider(BaseNewsSpider):
         try:
             # 使用父類的_request_with_retry方法
             response = self._request_with_retry(url)
-            
-            soup = BeautifulSoup(response.text, 'lxml')
-            content_element = soup.select_one('div.paragraph')
-            
-            if not content_element:
-                self.logger.warning(f"找不到文章內容: {url}")
-                return None
-                
-            content = self._clean_content(content_element)
-            if not content:
-                return None
-                
-            return {
-                'content': content
-            }
+            return self.parse_article(response.text, url)
             
         except Exception as e:
             self.logger.error(f"獲取文章內容失敗 {url}: {str(e)}", exc_info=True)
             return None
 
-    def _clean_content(self, content_element) -> Optional[str]:
-        """清理文章內容"""
-        if not content_element:
+    def parse_article(self, html: str, url: str) -> Optional[Dict]:
+        """
+        解析文章HTML
+        Args:
+            html (str): 文章HTML
+            url (str): 文章URL，僅用於記錄
+        Returns:
+            Optional[Dict]: 文章內容
+        """
+        content = extract_content(html, self.content_parser)
+        if not content:
+            self.logger.warning(f"找不到文章內容: {url}")
             return None
             
-        try:
-            # 一次性選擇所有不需要的元素
-            unwanted_selectors = ', '.join([
-                '.shareBar', 
-                '.modalbox', 
-                'script',
-                '.SubscriptionInner',      # 移除訂閱區塊
-                '.articlekeywordGroup',    # 移除關鍵字區塊
-                '.paragraph.moreArticle',  # 移除相關文章區塊
-                '.paragraph.bottomArticleBanner',  # 移除底部廣告
-                '.paragraph.BtnShareGroup',  # 移除分享按鈕
-                '.advertiseGroup',         # 移除廣告區塊
-                '.advertiseMobile'         # 移除手機版廣告
-            ])
-            
-            # 一次性移除所有不需要的元素
-            for element in content_element.select(unwanted_selectors):
-                element.extract()
-            
-            # 獲取純文本並清理
-            text = content_element.get_text(strip=True)
-            
-            # 移除多餘的空白
-            text = re.sub(r'\s+', ' ', text)
-            
-            # 移除版權聲明
-            text = re.sub(r'本網站之文字、圖片及影音，非經授權，不得轉載、公開播送或公開傳輸及利用。', '', text)
-            
-            # 移除編輯資訊
-            text = re.sub(r'（編輯：[^）]*）\d+', '', text)
-            
-            return text.strip() or None
-            
-        except Exception as e:
-            self.logger.error(f"清理內容失敗: {str(e)}", exc_info=True)
-            return None 
\ No newline at end of file
+        return {
+            'content': content
+        }
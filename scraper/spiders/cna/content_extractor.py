@@ -0,0 +1,176 @@
+"""
+scraper/spiders/cna/content_extractor.py
+
+中央社文章內容擷取：
+- extract_content_bs4: 原本以 BeautifulSoup 建立完整文件樹的擷取方式
+- extract_content_lxml: 直接使用 lxml 的快速擷取，只走訪 div.paragraph 子樹，
+  輸出與 BeautifulSoup 版本逐字相同
+
+兩者皆為模組層級的純函式，可直接交給其他行程平行執行。
+"""
+import re
+from typing import Iterator, Optional, Set
+
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+
+# 清理文字用的正規表示式（預先編譯）
+_WHITESPACE_RE = re.compile(r'\s+')
+_COPYRIGHT_RE = re.compile(r'本網站之文字、圖片及影音，非經授權，不得轉載、公開播送或公開傳輸及利用。')
+_EDITOR_RE = re.compile(r'（編輯：[^）]*）\d+')
+
+# 文章內容中不需要的區塊
+UNWANTED_SELECTORS = [
+    '.shareBar',
+    '.modalbox',
+    'script',
+    '.SubscriptionInner',      # 移除訂閱區塊
+    '.articlekeywordGroup',    # 移除關鍵字區塊
+    '.paragraph.moreArticle',  # 移除相關文章區塊
+    '.paragraph.bottomArticleBanner',  # 移除底部廣告
+    '.paragraph.BtnShareGroup',  # 移除分享按鈕
+    '.advertiseGroup',         # 移除廣告區塊
+    '.advertiseMobile'         # 移除手機版廣告
+]
+
+
+def _has_class(name: str) -> str:
+    """產生比對 class 屬性中單一類別的 XPath 條件"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _selector_to_xpath(selector: str) -> str:
+    """將 UNWANTED_SELECTORS 中的簡單選擇器（標籤或複合類別）轉為 XPath 條件"""
+    if not selector.startswith('.'):
+        return f"self::{selector}"
+    return ' and '.join(_has_class(name) for name in selector.split('.')[1:])
+
+
+_CONTENT_XPATH = etree.XPath(f"(//div[{_has_class('paragraph')}])[1]")
+_UNWANTED_XPATH = etree.XPath(
+    './/*[' + ' or '.join(f'({_selector_to_xpath(s)})' for s in UNWANTED_SELECTORS) + ']'
+)
+
+# BeautifulSoup 的 get_text 不包含這些標籤內的文字
+_NON_TEXT_TAGS = frozenset({'script', 'style', 'template', 'rt', 'rp'})
+
+
+def clean_text(text: str) -> Optional[str]:
+    """移除多餘空白、版權聲明與編輯資訊"""
+    # 移除多餘的空白
+    text = _WHITESPACE_RE.sub(' ', text)
+
+    # 移除版權聲明
+    text = _COPYRIGHT_RE.sub('', text)
+
+    # 移除編輯資訊
+    text = _EDITOR_RE.sub('', text)
+
+    return text.strip() or None
+
+
+def extract_content_bs4(html: str) -> Optional[str]:
+    """
+    以 BeautifulSoup 擷取文章內容
+
+    Args:
+        html: 文章HTML
+
+    Returns:
+        Optional[str]: 清理後的內容，找不到內容時回傳None
+    """
+    soup = BeautifulSoup(html, 'lxml')
+    content_element = soup.select_one('div.paragraph')
+    if not content_element:
+        return None
+
+    # 一次性移除所有不需要的元素
+    for element in content_element.select(', '.join(UNWANTED_SELECTORS)):
+        element.extract()
+
+    # 獲取純文本並清理
+    return clean_text(content_element.get_text(strip=True))
+
+
+def _parse_document(html: str):
+    """以 lxml 解析HTML，帶有XML編碼宣告的字串改以位元組解析"""
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        parser = lxml_html.HTMLParser(encoding='utf-8')
+        return lxml_html.document_fromstring(html.encode('utf-8'), parser=parser)
+
+
+def _iter_text(element, skipped: Set) -> Iterator[str]:
+    """依文件順序產出元素內的文字，略過被移除的子樹但保留其後的文字"""
+    if element.text:
+        yield element.text
+    for child in element:
+        # 註解、處理指令與被移除的元素只略過自身內容
+        if isinstance(child.tag, str) and child not in skipped and child.tag not in _NON_TEXT_TAGS:
+            yield from _iter_text(child, skipped)
+        if child.tail:
+            yield child.tail
+
+
+def extract_content_lxml(html: str) -> Optional[str]:
+    """
+    以 lxml 直接擷取文章內容，結果與 extract_content_bs4 相同
+
+    Args:
+        html: 文章HTML
+
+    Returns:
+        Optional[str]: 清理後的內容，找不到內容時回傳None
+    """
+    try:
+        document = _parse_document(html)
+    except etree.ParserError:
+        return None
+
+    matches = _CONTENT_XPATH(document)
+    if not matches:
+        return None
+    content_element = matches[0]
+
+    skipped = set(_UNWANTED_XPATH(content_element))
+    text = ''.join(
+        stripped for stripped in (s.strip() for s in _iter_text(content_element, skipped))
+        if stripped
+    )
+    return clean_text(text)
+
+
+EXTRACTORS = {
+    'lxml': extract_content_lxml,
+    'bs4': extract_content_bs4,
+}
+
+
+def extract_content(html: str, parser: str = 'lxml') -> Optional[str]:
+    """
+    擷取文章內容
+
+    Args:
+        html: 文章HTML
+        parser: 'lxml' 快速擷取或 'bs4' 原本的擷取方式
+
+    Returns:
+        Optional[str]: 清理後的內容
+    """
+    return EXTRACTORS[parser](html)
+
+
+def extract_content_from_bytes(body: bytes, encoding: str = 'utf-8', parser: str = 'lxml') -> Optional[str]:
+    """
+    從原始回應位元組擷取文章內容，解碼與解析都在執行此函式的行程中完成
+
+    Args:
+        body: 回應內容
+        encoding: 回應編碼
+        parser: 'lxml' 快速擷取或 'bs4' 原本的擷取方式
+
+    Returns:
+        Optional[str]: 清理後的內容
+    """
+    return extract_content(body.decode(encoding or 'utf-8', errors='replace'), parser)
@@ -0,0 +1,227 @@
+"""
+scraper/utils/http_client.py
+
+整個行程共用的 HTTP 連線池：
+1. 每個網域（scheme + host）一個 requests.Session，所有爬蟲與對外用戶端共用 keep-alive 連線
+2. 連線池大小、預設逾時集中設定，呼叫端未指定 timeout 時使用預設值
+3. 可選擇以 httpx 的 HTTP/2 連線發送（需安裝 httpx[http2]），呼叫端仍使用 requests 的介面；
+   HTTP/2 模式由 httpx 處理重新導向並一次讀完回應內容，不支援 allow_redirects=False、proxies 與 cert
+4. Session 不保存各呼叫端的 headers，headers 需隨每個請求傳入
+"""
+import io
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3 import HTTPResponse
+
+from scraper.utils.logger import setup_logger
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 為選用功能
+    httpx = None
+
+# 使用自定義的logger設置
+logger = setup_logger(__name__)
+
+
+class _TimeoutSession(requests.Session):
+    """未指定 timeout 的請求使用預設逾時"""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.default_timeout
+        return super().request(method, url, **kwargs)
+
+
+class _Http2Adapter(BaseAdapter):
+    """
+    以 httpx 的 HTTP/2 連線發送 requests 的請求，錯誤轉換為 requests 的例外
+
+    回應內容已由 httpx 讀完並解壓縮，以 BytesIO 包成 urllib3 的回應放在 response.raw，
+    iter_content、stream=True 與讀取 raw 的呼叫端都能使用
+    """
+
+    def __init__(self, pool_maxsize: int):
+        super().__init__()
+        self._client = httpx.Client(
+            http2=True,
+            # requests 需要可重新讀取的 raw 才能處理重新導向，改由 httpx 處理
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+        )
+
+    @staticmethod
+    def _timeout(timeout):
+        """將 requests 的 timeout（秒數或 (連線, 讀取)）轉為 httpx 的設定"""
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return httpx.Timeout(read, connect=connect)
+        return httpx.Timeout(timeout)
+
+    def _to_response(self, reply, request) -> requests.Response:
+        """將 httpx 的回應轉為 requests 的回應"""
+        response = requests.Response()
+        response.status_code = reply.status_code
+        response.reason = reply.reason_phrase
+        response.headers = CaseInsensitiveDict(reply.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        # 內容已解壓縮，raw 不帶 Content-Encoding 以免 requests 重複解壓縮
+        raw_headers = {
+            key: value for key, value in reply.headers.items()
+            if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')
+        }
+        response.raw = HTTPResponse(
+            body=io.BytesIO(reply.content),
+            headers=raw_headers,
+            status=reply.status_code,
+            reason=reply.reason_phrase,
+            preload_content=False,
+            decode_content=False
+        )
+        response.url = str(reply.url)
+        response.request = request
+        response.connection = self
+        return response
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        try:
+            reply = self._client.request(
+                request.method,
+                request.url,
+                headers=dict(request.headers),
+                content=request.body,
+                timeout=self._timeout(timeout)
+            )
+        except httpx.TooManyRedirects as e:
+            raise requests.TooManyRedirects(str(e), request=request)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e), request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e), request=request)
+
+        response = self._to_response(reply, request)
+        response.history = [self._to_response(hop, request) for hop in reply.history]
+        return response
+
+    def close(self):
+        self._client.close()
+
+
+class HttpClientFactory:
+    """依網域提供共用連線池的 Session"""
+
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 20,
+        timeout: float = 10,
+        http2: bool = False
+    ):
+        """
+        初始化連線池設定
+
+        Args:
+            pool_connections: 每個 Session 保留連線池的網域數（重新導向到其他網域時使用）
+            pool_maxsize: 每個網域保留的 keep-alive 連線數，應不小於同時發送請求的執行緒數
+            timeout: 呼叫端未指定時的逾時秒數
+            http2: 是否使用 HTTP/2，未安裝 httpx 時改用 HTTP/1.1
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.http2 = http2
+        self._sessions: Dict[str, _TimeoutSession] = {}
+        self._pool_sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        pool_maxsize: Optional[int] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None
+    ) -> None:
+        """
+        更新設定，只影響之後建立的 Session
+
+        Args:
+            pool_maxsize: 每個網域保留的 keep-alive 連線數
+            timeout: 預設逾時秒數
+            http2: 是否使用 HTTP/2
+        """
+        if pool_maxsize is not None:
+            self.pool_maxsize = max(1, pool_maxsize)
+        if timeout is not None:
+            self.timeout = timeout
+        if http2 is not None:
+            self.http2 = http2
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        """網址的 scheme://host[:port]"""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _adapter(self, pool_maxsize: int) -> BaseAdapter:
+        """建立連線池"""
+        if self.http2:
+            if httpx is not None:
+                return _Http2Adapter(pool_maxsize)
+            logger.warning("未安裝 httpx，改用 HTTP/1.1 連線")
+            self.http2 = False
+        return HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=pool_maxsize)
+
+    def _mount(self, session: requests.Session, pool_maxsize: int) -> None:
+        """為 Session 掛上新的連線池"""
+        adapter = self._adapter(pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def session(self, url: str, pool_maxsize: Optional[int] = None) -> requests.Session:
+        """
+        取得網域共用的 Session
+
+        Args:
+            url: 網址或 scheme://host，同一網域回傳同一個 Session
+            pool_maxsize: 此網域至少需要的連線數，大於目前的連線池時擴大
+
+        Returns:
+            requests.Session: 可在多個執行緒間共用的 Session
+        """
+        origin = self._origin(url)
+        size = max(pool_maxsize or 0, self.pool_maxsize)
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = _TimeoutSession(self.timeout)
+                self._mount(session, size)
+                self._sessions[origin] = session
+                self._pool_sizes[origin] = size
+                logger.debug(f"建立 {origin} 連線池（{size} 個連線）")
+            elif size > self._pool_sizes[origin]:
+                # 原有的閒置連線隨舊連線池關閉，之後的請求使用較大的連線池
+                self._mount(session, size)
+                self._pool_sizes[origin] = size
+                logger.debug(f"擴大 {origin} 連線池至 {size} 個連線")
+            return session
+
+    def close(self) -> None:
+        """關閉所有連線池"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._pool_sizes.clear()
+
+
+# 整個行程共用的連線池
+http_clients = HttpClientFactory()
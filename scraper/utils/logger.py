@@ -1,16 +1,25 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+import threading
 import traceback
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime
+from dotenv import load_dotenv
 from rich.logging import RichHandler
 from rich.console import Console
 from rich.traceback import install
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 # 安裝 rich 的異常追蹤，關閉本地變數顯示
 install(show_locals=False)
 
+# logger 在 settings 載入 .env 之前就會建立，日誌模式需先讀取 .env
+load_dotenv()
+
 class CustomFormatter(logging.Formatter):
     """自定義日誌格式"""
     
@@ -27,6 +36,218 @@ class CustomFormatter(logging.Formatter):
             record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
         return super().format(record)
 
+
+class PlainFormatter(logging.Formatter):
+    """單行的純文字格式，供 queue 模式的檔案與控制台使用"""
+
+    def __init__(self):
+        super().__init__(
+            fmt="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """將日誌紀錄放入佇列，佇列已滿時捨棄並計數，不讓呼叫端等待"""
+
+    def __init__(self, log_queue: queue.Queue, logging_queue: "_QueueLogging"):
+        super().__init__(log_queue)
+        self._logging_queue = logging_queue
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """只合併訊息參數，格式化與異常追蹤留給背景執行緒"""
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._logging_queue.dropped += 1
+
+
+class _SinkLevelFilter(logging.Filter):
+    """依各 logger 設定的級別過濾共用輸出端的紀錄"""
+
+    def __init__(self, levels: Dict[str, Tuple[int, int]], index: int):
+        super().__init__()
+        self.levels = levels
+        self.index = index
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        levels = self.levels.get(record.name)
+        return levels is None or record.levelno >= levels[self.index]
+
+
+class _DeferredFlushMixin:
+    """每筆紀錄不立即 flush，由背景執行緒在佇列清空時一次 flush"""
+
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        super().flush()
+
+
+class _DeferredFlushStreamHandler(_DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _DeferredFlushFileHandler(_DeferredFlushMixin, logging.FileHandler):
+    pass
+
+
+class _BatchingQueueListener(QueueListener):
+    """佇列清空（或停止）時才 flush 輸出端，連續寫入時合併系統呼叫"""
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        if self.queue.empty():
+            self.flush()
+
+    def flush(self) -> None:
+        for handler in self.handlers:
+            handler.flush_now()
+
+    def stop(self) -> None:
+        super().stop()
+        self.flush()
+
+
+class _QueueLogging:
+    """
+    queue 模式：所有 logger 共用一個有容量上限的佇列，
+    由單一背景執行緒寫入共用的日誌檔與控制台
+    """
+
+    def __init__(self, queue_size: int, log_dir: Path, file_name: str):
+        self.queue_size = max(1, queue_size)
+        self.log_dir = log_dir
+        self.file_name = file_name
+        self.dropped = 0
+        # logger名稱對應的 (控制台級別, 檔案級別)
+        self.levels: Dict[str, Tuple[int, int]] = {}
+        self._handlers: Dict[str, _NonBlockingQueueHandler] = {}
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._listener: Optional[_BatchingQueueListener] = None
+        self._forking: List[logging.Handler] = []
+
+    def _sinks(self) -> List[logging.Handler]:
+        """共用的檔案與控制台輸出端"""
+        self.log_dir.mkdir(exist_ok=True)
+        file_handler = _DeferredFlushFileHandler(
+            self.log_dir / f"{self.file_name}_{datetime.now():%Y%m%d}.log", encoding='utf-8'
+        )
+        console_handler = _DeferredFlushStreamHandler(sys.stderr)
+        for index, handler in ((0, console_handler), (1, file_handler)):
+            handler.setFormatter(PlainFormatter())
+            handler.addFilter(_SinkLevelFilter(self.levels, index))
+        return [console_handler, file_handler]
+
+    def start(self) -> None:
+        """建立佇列並啟動背景寫入執行緒"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            for handler in self._handlers.values():
+                handler.queue = self._queue
+            self._listener = _BatchingQueueListener(self._queue, *self._sinks())
+            self._listener.start()
+
+    def stop(self) -> None:
+        """寫完佇列中剩餘的紀錄後停止背景執行緒"""
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        if self.dropped:
+            listener.handle(logging.makeLogRecord({
+                'name': __name__,
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': f"日誌佇列已滿，共捨棄 {self.dropped} 筆紀錄"
+            }))
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+    def _before_fork(self) -> None:
+        """fork 前取得輸出端的鎖，確保背景執行緒不在寫入途中（否則子行程的串流鎖會一直被佔用）"""
+        self._forking = list(self._listener.handlers) if self._listener is not None else []
+        for handler in self._forking:
+            handler.acquire()
+
+    def _after_fork_in_parent(self) -> None:
+        for handler in self._forking:
+            handler.release()
+        self._forking = []
+
+    def _after_fork_in_child(self) -> None:
+        """子行程不會繼承背景執行緒，重新建立佇列與執行緒（處理器的鎖已由 logging 重新初始化）"""
+        self._forking = []
+        self._lock = threading.Lock()
+        self.dropped = 0
+        if self._listener is not None:
+            self._listener = None
+            self.start()
+
+    def handler(self, name: str, console_level: int, file_level: int) -> logging.Handler:
+        """建立放入共用佇列的處理器"""
+        self.start()
+        self.levels[name] = (console_level, file_level)
+        # 同名的logger重複設置時（如每個爬蟲實例）沿用同一個處理器
+        handler = self._handlers.get(name)
+        if handler is None:
+            handler = _NonBlockingQueueHandler(self._queue, self)
+            self._handlers[name] = handler
+        handler.setLevel(min(console_level, file_level))
+        return handler
+
+    def stats(self) -> Dict[str, int]:
+        """佇列中尚未寫出的紀錄數與捨棄的紀錄數"""
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'dropped': self.dropped
+        }
+
+
+_queue_logging: Optional[_QueueLogging] = None
+
+
+def _get_queue_logging() -> _QueueLogging:
+    """第一次使用 queue 模式時建立共用的佇列與背景執行緒"""
+    global _queue_logging
+    if _queue_logging is None:
+        _queue_logging = _QueueLogging(
+            queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+            log_dir=Path(os.getenv("LOG_DIR", "logs")),
+            file_name=os.getenv("LOG_FILE_NAME", "app")
+        )
+        atexit.register(_queue_logging.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(
+                before=_queue_logging._before_fork,
+                after_in_parent=_queue_logging._after_fork_in_parent,
+                after_in_child=_queue_logging._after_fork_in_child
+            )
+    return _queue_logging
+
+
+def logging_stats() -> Dict[str, int]:
+    """
+    queue 模式的日誌佇列狀態
+
+    Returns:
+        Dict[str, int]: {'queued': 尚未寫出的紀錄數, 'dropped': 佇列已滿時捨棄的紀錄數}
+    """
+    if _queue_logging is None:
+        return {'queued': 0, 'dropped': 0}
+    return _queue_logging.stats()
+
+
 def setup_logger(
     name: str,
     console_level: int = logging.INFO,
@@ -35,12 +256,15 @@ def setup_logger(
 ) -> logging.Logger:
     """
     設置logger
+
+    LOG_MODE=rich（預設）時每個logger有自己的日誌檔與 rich 控制台輸出；
+    LOG_MODE=queue 時紀錄放入共用佇列，由背景執行緒以純文字寫入共用的日誌檔與控制台。
     
     Args:
         name: logger名稱
         console_level: 控制台日誌級別
         file_level: 文件日誌級別
-        log_dir: 日誌目錄路徑
+        log_dir: 日誌目錄路徑（queue 模式使用共用的 LOG_DIR）
         
     Returns:
         logging.Logger: 配置好的logger實例
@@ -52,6 +276,12 @@ def setup_logger(
     # 如果logger已經有處理器，先清除
     if logger.handlers:
         logger.handlers.clear()
+
+    if os.getenv("LOG_MODE", "rich").lower() == "queue":
+        logger.addHandler(_get_queue_logging().handler(name, console_level, file_level))
+        # 共用輸出端已涵蓋所有logger，避免再傳遞給 root logger 重複輸出
+        logger.propagate = False
+        return logger
         
     # 創建日誌目錄
     log_dir = Path(log_dir) if log_dir else Path("logs")
@@ -0,0 +1,78 @@
+"""
+scraper/utils/rate_limiter.py
+
+權杖桶限流器：
+每秒補充固定數量的權杖，呼叫外部API前先取得權杖，
+可在多個執行緒間共用，讓整個工作池的總請求速率不超過API限制。
+"""
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """執行緒安全的權杖桶"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        初始化權杖桶
+
+        Args:
+            rate: 每秒補充的權杖數，0 或負數表示不限流
+            capacity: 桶的容量（允許的瞬間爆量），預設等於 rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """依經過時間補充權杖"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        預約權杖並回傳需要等待的秒數，不會阻塞，適合在事件迴圈中搭配 asyncio.sleep 使用
+
+        Args:
+            tokens: 需要的權杖數
+
+        Returns:
+            float: 呼叫者應等待的秒數
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        取得權杖，不足時等待
+
+        Args:
+            tokens: 需要的權杖數
+
+        Returns:
+            float: 實際等待的秒數
+        """
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        清空權杖並延後補充，API要求等待（如 429 Retry-After）時讓所有呼叫者一起暫停
+
+        Args:
+            seconds: 暫停秒數
+        """
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
@@ -0,0 +1,130 @@
+"""
+scraper/utils/ttl_cache.py
+
+具過期時間的LRU快取：
+1. 每筆資料保存固定秒數，過期後視為不存在
+2. 超過容量時淘汰最久未使用的資料
+3. get_or_load 對同一個鍵只載入一次，其他同時查詢的執行緒等待同一份結果
+4. 載入期間被 delete/clear 使失效的鍵，載入結果不保存，避免寫回過時的資料
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """執行緒安全的TTL + LRU快取"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600):
+        """
+        初始化快取
+
+        Args:
+            maxsize: 最多保存的資料筆數
+            ttl: 每筆資料保存的秒數
+        """
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        # 載入中的鍵的版本，delete/clear 時遞增，載入完成時版本不同即捨棄結果
+        self._versions: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable) -> Any:
+        """在持有鎖的情況下查詢，過期資料順便移除"""
+        item = self._data.get(key)
+        if item is None:
+            return self._MISSING
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return self._MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """取得未過期的資料"""
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is self._MISSING else value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        """在持有鎖的情況下保存，超過容量時淘汰最久未使用者"""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """保存資料，超過容量時淘汰最久未使用者"""
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        取得資料，不存在時呼叫 loader 載入並保存
+
+        同一個鍵同時只有一個執行緒會呼叫 loader，載入失敗時不保存並拋出例外；
+        載入期間此鍵被 delete/clear 時，結果仍回傳給呼叫者但不保存。
+
+        Args:
+            key: 快取鍵
+            loader: 載入資料的函式
+
+        Returns:
+            快取或新載入的資料
+        """
+        while True:
+            with self._lock:
+                value = self._lookup(key)
+                if value is not self._MISSING:
+                    self.hits += 1
+                    return value
+                key_lock = self._loading.setdefault(key, threading.Lock())
+
+            with key_lock:
+                with self._lock:
+                    # 等待期間可能已由其他執行緒載入
+                    value = self._lookup(key)
+                    if value is not self._MISSING:
+                        self.hits += 1
+                        return value
+                    # 前一次載入失敗或被使失效後，新的查詢已改用新的鎖，重新排隊以免重複載入
+                    if self._loading.get(key) is not key_lock:
+                        continue
+                    self.misses += 1
+                    version = self._versions.setdefault(key, 0)
+                value = self._MISSING
+                try:
+                    value = loader()
+                    return value
+                finally:
+                    # 保存與移除載入中的標記在同一次加鎖內完成
+                    with self._lock:
+                        if value is not self._MISSING and self._versions.get(key) == version:
+                            self._store(key, value)
+                        self._loading.pop(key, None)
+                        self._versions.pop(key, None)
+
+    def delete(self, key: Hashable) -> None:
+        """移除資料，資料來源更新後使快取失效"""
+        with self._lock:
+            self._data.pop(key, None)
+            if key in self._versions:
+                self._versions[key] += 1
+
+    def clear(self) -> None:
+        """清空快取"""
+        with self._lock:
+            self._data.clear()
+            for key in self._versions:
+                self._versions[key] += 1
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# 讓測試可以直接匯入專案內的套件
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """monotonic 只在 sleep 或測試手動調整 now 時前進"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """以假的時鐘取代限流器與快取使用的 time 模組"""
+    from scraper.utils import rate_limiter, ttl_cache
+
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    monkeypatch.setattr(ttl_cache, 'time', fake)
+    return fake
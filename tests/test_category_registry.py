@@ -0,0 +1,96 @@
+"""
+tests/test_category_registry.py
+
+類別表：配置檔的載入、不存在或無法讀取時的主選單爬取備援，以及類別名稱解析
+"""
+import json
+
+import pytest
+
+from scraper.spiders.cna import cna_menu_scraper
+from scraper.spiders.cna.category_registry import CategoryRegistry, CategorySnapshot
+
+MENU = {'aipl': '政治', 'afe': '產經', 'ahel': '生活'}
+
+
+class _Fallback:
+    def __init__(self, result=None, error=None):
+        self.result = result if result is not None else dict(MENU)
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def _write(path, content):
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+def test_reads_config_without_fallback(tmp_path):
+    fallback = _Fallback()
+    registry = CategoryRegistry(_write(tmp_path / 'categories.json', json.dumps(MENU)), fallback=fallback)
+    assert registry.snapshot().crawlable == frozenset(MENU)
+    assert fallback.calls == 0
+
+
+@pytest.mark.parametrize('content', [None, '{not json', '{}'], ids=['missing', 'invalid', 'empty'])
+def test_falls_back_to_menu_when_config_unusable(tmp_path, content):
+    path = tmp_path / 'categories.json'
+    if content is not None:
+        _write(path, content)
+    fallback = _Fallback()
+    registry = CategoryRegistry(str(path), fallback=fallback)
+    snapshot = registry.snapshot()
+    assert fallback.calls == 1
+    assert snapshot.crawlable == frozenset(MENU)
+    assert snapshot.name('aipl') == '政治'
+
+
+def test_fallback_failure_leaves_no_crawlable_categories(tmp_path):
+    fallback = _Fallback(error=RuntimeError('連線失敗'))
+    registry = CategoryRegistry(str(tmp_path / 'missing.json'), fallback=fallback)
+    assert registry.snapshot().crawlable == frozenset()
+    # 下次重新載入時再試一次
+    fallback.error = None
+    assert registry.refresh().crawlable == frozenset(MENU)
+    assert fallback.calls == 2
+
+
+def test_no_fallback(tmp_path):
+    registry = CategoryRegistry(str(tmp_path / 'missing.json'), fallback=None)
+    assert registry.snapshot().crawlable == frozenset()
+
+
+def test_default_fallback_scrapes_menu_and_saves_config(tmp_path, monkeypatch):
+    path = tmp_path / 'categories.json'
+    monkeypatch.setattr(cna_menu_scraper, 'CATEGORIES_CONFIG_PATH', str(path))
+    monkeypatch.setattr(cna_menu_scraper.CnaMenuScraper, '_scrape_menu_mapping', lambda self: dict(MENU))
+
+    registry = CategoryRegistry(str(path))
+    assert registry.snapshot().crawlable == frozenset(MENU)
+    assert json.loads(path.read_text(encoding='utf-8')) == MENU
+
+
+def test_config_change_is_reloaded(tmp_path):
+    path = tmp_path / 'categories.json'
+    _write(path, json.dumps({'aipl': '政治'}))
+    registry = CategoryRegistry(str(path), check_interval=0, fallback=None)
+    assert registry.snapshot().crawlable == frozenset({'aipl'})
+    _write(path, json.dumps(MENU))
+    assert registry.refresh().crawlable == frozenset(MENU)
+
+
+def test_snapshot_resolves_codes_and_names():
+    snapshot = CategorySnapshot.build({'aipl': '政治', 'ahel': '生活'}, [{'aipl': '政治新聞', 'acn': '兩岸'}])
+    assert snapshot.resolve('AIPL') == 'aipl'
+    assert snapshot.resolve('政治') == 'aipl'
+    assert snapshot.resolve('政治新聞') == 'aipl'
+    assert snapshot.resolve('生活') == 'ahel'
+    assert snapshot.resolve('體育') is None
+    assert snapshot.crawlable == frozenset({'aipl', 'ahel'})
+    assert snapshot.subscribable == frozenset({'aipl', 'acn'})
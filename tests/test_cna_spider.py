@@ -0,0 +1,181 @@
+"""
+tests/test_cna_spider.py
+
+中央社爬蟲的列表篩選與增量爬取水位線：
+列表請求失敗、API錯誤或到達頁數上限時不推進水位線，避免未列出的文章永遠不會被爬取
+"""
+import asyncio
+import json as json_module
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from scraper.engine.fetcher import FetchResponse
+from scraper.spiders.cna.cna_spider import CnaSpider
+
+ARTICLE_HTML = (Path(__file__).parent / 'fixtures' / 'cna' / 'aipl_202410150123.html').read_bytes()
+NOW = datetime(2024, 10, 15, 12, 0)
+PAGE_SIZE = 3
+
+
+def _item(minutes_ago):
+    created = NOW - timedelta(minutes=minutes_ago)
+    return {
+        'HeadLine': f'新聞 {minutes_ago}',
+        'PageUrl': f'https://www.cna.com.tw/news/aipl/{minutes_ago}.aspx',
+        'CreateTime': created.strftime('%Y/%m/%d %H:%M'),
+    }
+
+
+def _page(*minutes_ago):
+    return {'Result': 'Y', 'ResultData': {'Items': [_item(m) for m in minutes_ago]}}
+
+
+def _mark(minutes_ago):
+    item = _item(minutes_ago)
+    return CnaSpider._parse_create_time(item), item['PageUrl']
+
+
+class FakeFetcher:
+    """依頁碼回傳列表（dict 為JSON、bytes 為原始內容、例外則拋出）；文章回傳保存的頁面"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested_pages = []
+
+    async def post(self, url, json=None):
+        page = json['pageidx']
+        self.requested_pages.append(page)
+        result = self.pages.get(page, _page())
+        if isinstance(result, Exception):
+            raise result
+        body = result if isinstance(result, bytes) else json_module.dumps(result).encode('utf-8')
+        return FetchResponse(url, 200, body)
+
+    async def get(self, url):
+        return FetchResponse(url, 200, ARTICLE_HTML)
+
+
+@pytest.fixture
+def spider():
+    spider = CnaSpider('aipl')
+    spider.DEFAULT_PAGE_SIZE = PAGE_SIZE
+    spider.cutoff_time = NOW - timedelta(hours=24)
+    return spider
+
+
+def _crawl(spider, pages, max_pages=5):
+    fetcher = FakeFetcher(pages)
+
+    async def run():
+        return [article async for article in spider.crawl_async(fetcher, max_pages=max_pages)]
+
+    return asyncio.run(run()), fetcher
+
+
+# _select_news_items
+
+def test_full_page_has_more(spider):
+    items, has_more = spider._select_news_items(_page(1, 2, 3), PAGE_SIZE)
+    assert [item['HeadLine'] for item in items] == ['新聞 1', '新聞 2', '新聞 3']
+    assert has_more
+
+
+def test_short_page_is_end_of_list(spider):
+    items, has_more = spider._select_news_items(_page(1, 2), PAGE_SIZE)
+    assert len(items) == 2 and not has_more
+
+
+def test_stops_at_cutoff_time(spider):
+    spider.cutoff_time = NOW - timedelta(minutes=2)
+    items, has_more = spider._select_news_items(_page(1, 2, 3), PAGE_SIZE)
+    assert [item['HeadLine'] for item in items] == ['新聞 1', '新聞 2']
+    assert not has_more
+
+
+def test_stops_at_watermark(spider):
+    spider.watermark = _mark(2)
+    items, has_more = spider._select_news_items(_page(1, 2, 3), PAGE_SIZE)
+    assert [item['HeadLine'] for item in items] == ['新聞 1']
+    assert not has_more
+
+
+def test_skips_items_after_until_time_but_keeps_paging(spider):
+    spider.until_time = NOW - timedelta(minutes=2)
+    items, has_more = spider._select_news_items(_page(1, 2, 3), PAGE_SIZE)
+    assert [item['HeadLine'] for item in items] == ['新聞 2', '新聞 3']
+    assert has_more
+
+
+def test_api_error_is_not_end_of_list(spider):
+    with pytest.raises(ValueError):
+        spider._select_news_items({'Result': 'N', 'ResultData': None}, PAGE_SIZE)
+
+
+# next_watermark
+
+def test_next_watermark_is_newest_listed(spider):
+    spider._listed = [_mark(5), _mark(1), _mark(3)]
+    assert spider.next_watermark == _mark(1)
+
+
+def test_next_watermark_stops_before_failed_article(spider):
+    spider._listed = [_mark(1), _mark(2), _mark(3)]
+    spider._failed_times = [_mark(2)[0]]
+    assert spider.next_watermark == _mark(3)
+
+
+def test_next_watermark_keeps_old_when_nothing_new(spider):
+    spider.watermark = _mark(10)
+    assert spider.next_watermark == _mark(10)
+    spider._listed = [_mark(1)]
+    spider._failed_times = [_mark(1)[0]]
+    assert spider.next_watermark == _mark(10)
+
+
+# crawl_async
+
+def test_complete_listing_advances_watermark(spider):
+    spider.watermark = _mark(10)
+    articles, fetcher = _crawl(spider, {1: _page(1, 2, 3), 2: _page(4, 5, 10)})
+    assert len(articles) == 5
+    assert fetcher.requested_pages == [1, 2]
+    assert spider.listing_complete
+    assert spider.next_watermark == _mark(1)
+
+
+@pytest.mark.parametrize('failure', [
+    ConnectionError('連線中斷'),
+    {'Result': 'N', 'ResultData': None},
+    '<html>系統維護中</html>'.encode('utf-8'),
+], ids=['network', 'api-error', 'parse-error'])
+def test_failed_list_page_keeps_watermark(spider, failure):
+    spider.watermark = _mark(10)
+    articles, _ = _crawl(spider, {1: _page(1, 2, 3), 2: failure})
+    # 第 1 頁的文章照常產出，但第 2 頁之後的文章尚未列出，水位線不能越過它們
+    assert len(articles) == 3
+    assert not spider.listing_complete
+    assert spider.next_watermark == _mark(10)
+
+
+def test_first_run_with_failed_list_page_sets_no_watermark(spider):
+    _crawl(spider, {1: _page(1, 2, 3), 2: ConnectionError('連線中斷')})
+    assert spider.next_watermark is None
+
+
+def test_max_pages_with_more_items_keeps_watermark(spider):
+    spider.watermark = _mark(10)
+    articles, fetcher = _crawl(spider, {1: _page(1, 2, 3), 2: _page(4, 5, 6)}, max_pages=2)
+    assert len(articles) == 6
+    assert fetcher.requested_pages == [1, 2]
+    assert not spider.listing_complete
+    assert spider.next_watermark == _mark(10)
+
+
+def test_new_crawl_resets_listing_flag(spider):
+    _crawl(spider, {1: ConnectionError('連線中斷')})
+    assert not spider.listing_complete
+    _crawl(spider, {1: _page(1, 2)})
+    assert spider.listing_complete
+    assert spider.next_watermark == _mark(1)
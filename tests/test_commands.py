@@ -0,0 +1,82 @@
+"""
+tests/test_commands.py
+
+訂閱指令：文字指令解析與同一批次訂閱變更的合併
+匯入 line_broker.commands 時會連線資料庫，未設置 DATABASE_URL 時略過
+"""
+import os
+
+import pytest
+
+if not os.getenv('DATABASE_URL'):
+    pytest.skip('需要 DATABASE_URL 才能匯入 app 模組', allow_module_level=True)
+
+from app.services.user_service import UserIdentity
+from line_broker.commands import Command, SubscriptionCommandEngine, _Operation, parse_command
+
+ALICE = UserIdentity(id=1, line_user_id='U1', user_name='Alice', is_registered=True)
+BOB = UserIdentity(id=2, line_user_id='U2', user_name='Bob', is_registered=True)
+
+
+def _op(user, kind, action, target=None):
+    return _Operation(user=user, kind=kind, action=action, target=target)
+
+
+def _keys(operations):
+    return [(op.user.id, op.kind, op.action, op.target) for op in operations]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('列表', Command('list')),
+    ('訂閱新聞 政治 產經,生活', Command('subscribe', 'news', ('政治', '產經', '生活'))),
+    ('取消訂閱新聞', Command('unsubscribe', 'news', ())),
+    ('訂閱天氣 新竹 縣', Command('subscribe', 'weather', ('新竹 縣',))),
+    ('取消天氣', Command('unsubscribe', 'weather', ())),
+    ('你好', Command('help')),
+])
+def test_parse_command(text, expected):
+    assert parse_command(text) == expected
+
+
+def test_coalesce_keeps_last_command_per_item():
+    first = _op(ALICE, 'news', 'add', 'aipl')
+    second = _op(ALICE, 'news', 'remove', 'aipl')
+    other = _op(ALICE, 'news', 'add', 'afe')
+    merged = SubscriptionCommandEngine._coalesce([first, other, second])
+    assert _keys(merged) == [(1, 'news', 'add', 'afe'), (1, 'news', 'remove', 'aipl')]
+    assert first.superseded and not second.superseded and not other.superseded
+
+
+def test_coalesce_clear_supersedes_earlier_changes_only():
+    before = _op(ALICE, 'news', 'add', 'aipl')
+    weather = _op(ALICE, 'weather', 'add', '台北市')
+    clear = _op(ALICE, 'news', 'clear')
+    after = _op(ALICE, 'news', 'add', 'afe')
+    merged = SubscriptionCommandEngine._coalesce([before, weather, clear, after])
+    # 取消全部排在最前面，之後的新增保留；不同訂閱類型不受影響
+    assert _keys(merged) == [
+        (1, 'news', 'clear', None),
+        (1, 'weather', 'add', '台北市'),
+        (1, 'news', 'add', 'afe'),
+    ]
+    assert before.superseded and not weather.superseded and not after.superseded
+
+
+def test_coalesce_repeated_clear_keeps_last():
+    first = _op(ALICE, 'weather', 'clear')
+    second = _op(ALICE, 'weather', 'clear')
+    assert SubscriptionCommandEngine._coalesce([first, second]) == [second]
+    assert first.superseded
+
+
+def test_coalesce_separates_users():
+    alice = _op(ALICE, 'news', 'add', 'aipl')
+    bob_clear = _op(BOB, 'news', 'clear')
+    bob = _op(BOB, 'news', 'remove', 'aipl')
+    merged = SubscriptionCommandEngine._coalesce([alice, bob_clear, bob])
+    assert _keys(merged) == [
+        (2, 'news', 'clear', None),
+        (1, 'news', 'add', 'aipl'),
+        (2, 'news', 'remove', 'aipl'),
+    ]
+    assert not any(op.superseded for op in (alice, bob_clear, bob))
@@ -0,0 +1,58 @@
+"""
+tests/test_content_extractor.py
+
+以 tests/fixtures/cna 中保存的中央社文章頁面，確認 lxml 快速擷取與 BeautifulSoup 擷取逐字相同
+"""
+import warnings
+from pathlib import Path
+
+import pytest
+from bs4 import XMLParsedAsHTMLWarning
+
+from scraper.spiders.cna.content_extractor import (
+    extract_content_bs4,
+    extract_content_from_bytes,
+    extract_content_lxml,
+)
+
+FIXTURES = sorted((Path(__file__).parent / 'fixtures' / 'cna').glob('*.html'))
+
+
+@pytest.fixture(autouse=True)
+def _ignore_xml_warning():
+    # 帶有XML宣告的頁面以HTML解析時 BeautifulSoup 會發出警告
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', XMLParsedAsHTMLWarning)
+        yield
+
+
+def test_fixtures_exist():
+    assert FIXTURES
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda p: p.name)
+def test_lxml_matches_bs4(path):
+    html = path.read_text(encoding='utf-8')
+    content = extract_content_lxml(html)
+    assert content
+    assert content == extract_content_bs4(html)
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda p: p.name)
+def test_unwanted_blocks_removed(path):
+    content = extract_content_lxml(path.read_text(encoding='utf-8'))
+    for text in ('本網站之文字', '（編輯：', '分享', '廣告', '訂閱', '相關新聞', '不應出現', '樣板內容'):
+        assert text not in content
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda p: p.name)
+def test_from_bytes_matches(path):
+    body = path.read_bytes()
+    assert extract_content_from_bytes(body) == extract_content_from_bytes(body, parser='bs4')
+    assert extract_content_from_bytes(body) == extract_content_lxml(body.decode('utf-8'))
+
+
+def test_missing_paragraph():
+    html = '<html><body><h1>標題</h1><div class="article">沒有內文區塊</div></body></html>'
+    assert extract_content_lxml(html) is None
+    assert extract_content_bs4(html) is None
@@ -0,0 +1,60 @@
+"""
+tests/test_csv_stream.py
+
+COPY 使用的CSV串流：依上限分段讀取同一個資料列迭代器，以及特殊字元的跳脫
+"""
+import csv
+import io
+
+import pytest
+
+from app.etl.csv_stream import CsvStream
+
+
+def _rows(count):
+    return iter([(f'標題 {i}', f'https://example.com/{i}', '2024-10-01 08:00:00', '中央社', 'aipl', None)
+                 for i in range(count)])
+
+
+def _read_all(stream, size):
+    chunks = []
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return ''.join(chunks)
+        chunks.append(chunk)
+
+
+@pytest.mark.parametrize('size', [-1, 1, 7, 4096])
+def test_csv_stream_splits_rows_into_chunks(size):
+    rows = _rows(5)
+    first = CsvStream(rows, limit=2)
+    text_1 = _read_all(first, size)
+    assert first.count == 2 and not first.exhausted
+    assert len(list(csv.reader(io.StringIO(text_1)))) == 2
+
+    second = CsvStream(rows, limit=2)
+    _read_all(second, size)
+    assert second.count == 2 and not second.exhausted
+
+    last = CsvStream(rows, limit=2)
+    text_3 = _read_all(last, size)
+    assert last.count == 1 and last.exhausted
+    assert next(csv.reader(io.StringIO(text_3)))[0] == '標題 4'
+
+
+def test_csv_stream_exact_multiple_ends_with_empty_chunk():
+    rows = _rows(2)
+    first = CsvStream(rows, limit=2)
+    _read_all(first, -1)
+    assert first.count == 2 and not first.exhausted
+    last = CsvStream(rows, limit=2)
+    assert last.read() == ''
+    assert last.count == 0 and last.exhausted
+
+
+def test_csv_stream_quotes_special_characters():
+    row = ('含,逗號', '有"引號"', '換\n行', '', 'aipl', None)
+    stream = CsvStream(iter([row]), limit=10)
+    parsed = next(csv.reader(io.StringIO(stream.read())))
+    assert parsed == ['含,逗號', '有"引號"', '換\n行', '', 'aipl', '']
@@ -0,0 +1,97 @@
+"""
+tests/test_event_queue.py
+
+Webhook 事件佇列：連續同類型事件的合併與同一位使用者的事件順序
+"""
+from types import SimpleNamespace
+
+from line_broker.event_queue import WebhookEventQueue
+
+
+class Follow(SimpleNamespace):
+    pass
+
+
+class Unfollow(SimpleNamespace):
+    pass
+
+
+class Message(SimpleNamespace):
+    pass
+
+
+class Postback(SimpleNamespace):
+    pass
+
+
+def _event(cls, user_id, tag=None):
+    return cls(source=SimpleNamespace(user_id=user_id), tag=tag)
+
+
+def _recording_queue(**kwargs):
+    calls = []
+    handlers = {
+        cls: (lambda events, cls=cls: calls.append((cls.__name__, [e.tag for e in events])))
+        for cls in (Follow, Unfollow, Message)
+    }
+    return WebhookEventQueue(handlers, **kwargs), calls
+
+
+def test_dispatch_merges_only_consecutive_runs():
+    event_queue, calls = _recording_queue()
+    batch = [
+        _event(Follow, 'U1', 1),
+        _event(Follow, 'U2', 2),
+        _event(Unfollow, 'U1', 3),
+        _event(Follow, 'U1', 4),
+        _event(Message, 'U2', 5),
+        _event(Message, 'U3', 6),
+    ]
+    event_queue._dispatch(batch)
+    assert calls == [
+        ('Follow', [1, 2]),
+        ('Unfollow', [3]),
+        ('Follow', [4]),
+        ('Message', [5, 6]),
+    ]
+
+
+def test_dispatch_skips_unknown_type_and_continues():
+    event_queue, calls = _recording_queue()
+    event_queue._dispatch([_event(Follow, 'U1', 1), _event(Postback, 'U1'), _event(Follow, 'U1', 2)])
+    assert calls == [('Follow', [1]), ('Follow', [2])]
+
+
+def test_dispatch_continues_after_handler_error():
+    calls = []
+
+    def failing(events):
+        raise RuntimeError('boom')
+
+    event_queue = WebhookEventQueue({Follow: failing, Unfollow: lambda events: calls.append(len(events))})
+    event_queue._dispatch([_event(Follow, 'U1'), _event(Unfollow, 'U1')])
+    assert calls == [1]
+
+
+def test_user_events_keep_order():
+    event_queue, calls = _recording_queue(workers=2, batch_wait=0.2)
+    events = [
+        _event(cls, 'U1', index)
+        for index, cls in enumerate([Unfollow, Follow, Unfollow, Follow, Message, Follow])
+    ]
+    assert event_queue.submit(events)
+    assert event_queue.join(timeout=5)
+    event_queue.stop(timeout=5)
+
+    handled = [(name, tag) for name, tags in calls for tag in tags]
+    assert [tag for _, tag in handled] == list(range(len(events)))
+    assert [name for name, _ in handled] == [type(e).__name__ for e in events]
+
+
+def test_submit_rejects_when_full():
+    event_queue, _ = _recording_queue(maxsize=2)
+    event_queue._stopped = True
+    assert not event_queue.submit([_event(Follow, 'U1')])
+    event_queue._stopped = False
+    assert not event_queue.submit([_event(Follow, 'U1')] * 3)
+    assert event_queue.pending == 0
@@ -0,0 +1,55 @@
+"""
+tests/test_gazetteer.py
+
+本地地名索引：別名、省略行政區後綴與名稱歧義
+"""
+from line_broker.gazetteer import Gazetteer, Place, normalize_place_name
+
+PLACES = {
+    '臺北市': {'longitude': 121.56, 'latitude': 25.03, 'aliases': ['北市']},
+    '新竹市': {'longitude': 120.96, 'latitude': 24.80},
+    '新竹縣': {'longitude': 121.01, 'latitude': 24.83},
+    '大安區': {'longitude': 121.54, 'latitude': 25.02},
+}
+
+
+def test_normalize_place_name():
+    assert normalize_place_name(' 臺 北市 ') == '台北市'
+
+
+def test_lookup_name_alias_and_suffix():
+    gazetteer = Gazetteer(PLACES)
+    expected = [Place('台北市', 121.56, 25.03)]
+    assert gazetteer.lookup('臺北市') == expected
+    assert gazetteer.lookup('台北') == expected
+    assert gazetteer.lookup('北市') == expected
+    assert gazetteer.lookup('大安') == [Place('大安區', 121.54, 25.02)]
+
+
+def test_lookup_reports_ambiguity():
+    gazetteer = Gazetteer(PLACES)
+    candidates = gazetteer.lookup('新竹')
+    assert [place.name for place in candidates] == ['新竹市', '新竹縣']
+    assert gazetteer.resolve('新竹') is None
+    # 完整名稱沒有歧義
+    assert gazetteer.resolve('新竹縣') == Place('新竹縣', 121.01, 24.83)
+
+
+def test_lookup_unknown_and_short_names():
+    gazetteer = Gazetteer(PLACES)
+    assert gazetteer.lookup('高雄') == []
+    assert gazetteer.resolve('高雄') is None
+    # 兩個字的地名不去除後綴，避免「北市」變成「北」
+    assert gazetteer.lookup('北') == []
+
+
+def test_lookup_returns_copy():
+    gazetteer = Gazetteer(PLACES)
+    gazetteer.lookup('新竹').clear()
+    assert len(gazetteer.lookup('新竹')) == 2
+
+
+def test_shipped_gazetteer_loads():
+    gazetteer = Gazetteer.from_file()
+    assert gazetteer.resolve('台北市') is not None
+    assert len(gazetteer.lookup('嘉義')) == 2
@@ -0,0 +1,110 @@
+"""
+tests/test_http_client.py
+
+共用連線池：同網域共用 Session，以及 HTTP/2 轉接器的重新導向、串流讀取與 raw
+HTTP/2 的測試需要 httpx，未安裝時略過
+"""
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from scraper.utils.http_client import HttpClientFactory
+
+BODY = ('中央社新聞內容 ' * 500).encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/article')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/loop':
+            self.send_response(302)
+            self.send_header('Location', '/loop')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = BODY
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if self.path == '/gzip':
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(params=[False, True], ids=['http1', 'http2'])
+def factory(request):
+    if request.param:
+        pytest.importorskip('httpx')
+    clients = HttpClientFactory(timeout=5, http2=request.param)
+    yield clients
+    clients.close()
+
+
+def test_same_origin_shares_session(factory, server):
+    assert factory.session(f'{server}/a') is factory.session(f'{server}/b?x=1')
+    assert factory.session(server) is not factory.session('http://127.0.0.1:1')
+
+
+def test_follows_redirects(factory, server):
+    response = factory.session(server).get(f'{server}/redirect')
+    assert response.status_code == 200
+    assert response.url == f'{server}/article'
+    assert [hop.status_code for hop in response.history] == [302]
+    assert response.content == BODY
+
+
+def test_too_many_redirects(factory, server):
+    with pytest.raises(requests.TooManyRedirects):
+        factory.session(server).get(f'{server}/loop')
+
+
+def test_stream_and_iter_content(factory, server):
+    response = factory.session(server).get(f'{server}/article', stream=True)
+    assert b''.join(response.iter_content(chunk_size=1024)) == BODY
+
+
+def test_gzip_decoded_once(factory, server):
+    session = factory.session(server)
+    assert session.get(f'{server}/gzip').content == BODY
+    streamed = session.get(f'{server}/gzip', stream=True)
+    assert b''.join(streamed.iter_content(chunk_size=1024)) == BODY
+
+
+def test_text_uses_declared_encoding(factory, server):
+    response = factory.session(server).get(f'{server}/article')
+    assert response.encoding == 'utf-8'
+    assert response.text.startswith('中央社新聞內容')
+
+
+def test_raw_is_readable(server):
+    pytest.importorskip('httpx')
+    clients = HttpClientFactory(timeout=5, http2=True)
+    try:
+        response = clients.session(server).get(f'{server}/article', stream=True)
+        assert response.raw.read() == BODY
+    finally:
+        clients.close()
+
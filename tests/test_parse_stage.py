@@ -0,0 +1,37 @@
+"""
+tests/test_parse_stage.py
+
+解析階段：行程池以 forkserver/spawn 啟動，結果與在執行緒中解析相同
+"""
+import asyncio
+from pathlib import Path
+
+from scraper.engine.parse_stage import MP_START_METHOD, ParseStage
+from scraper.spiders.cna.content_extractor import extract_content_from_bytes
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'cna' / 'aipl_202410150123.html'
+
+
+async def _parse(workers: int):
+    body = FIXTURE.read_bytes()
+    async with ParseStage(workers) as stage:
+        async def one():
+            async with stage.slot():
+                return await stage.run(extract_content_from_bytes, body, 'utf-8')
+        return await asyncio.gather(*(one() for _ in range(4)))
+
+
+def test_does_not_fork():
+    assert MP_START_METHOD in ('forkserver', 'spawn')
+
+
+def test_process_pool_matches_thread():
+    in_processes = asyncio.run(_parse(workers=2))
+    in_thread = asyncio.run(_parse(workers=0))
+    assert in_processes[0]
+    assert in_processes == in_thread
+
+
+def test_max_pending_defaults_to_four_per_worker():
+    assert ParseStage(3).max_pending == 12
+    assert ParseStage(0).max_pending == 4
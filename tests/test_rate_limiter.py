@@ -0,0 +1,94 @@
+"""
+tests/test_rate_limiter.py
+
+權杖桶限流器：以假的時鐘確認補充速率、瞬間爆量與等待時間
+"""
+import threading
+import time
+
+import pytest
+
+from scraper.utils.rate_limiter import TokenBucket
+
+
+def test_burst_up_to_capacity_then_waits(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.slept == [pytest.approx(0.5)] * 2
+
+
+def test_refills_while_idle_but_not_above_capacity(clock):
+    bucket = TokenBucket(rate=10)
+    for _ in range(10):
+        bucket.acquire()
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(10)] == [0] * 10
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+def test_sustained_rate(clock):
+    bucket = TokenBucket(rate=5, capacity=1)
+    start = clock.now
+    for _ in range(21):
+        bucket.acquire()
+    # 第一個權杖不需等待，之後每秒 5 個
+    assert clock.now - start == pytest.approx(4.0)
+
+
+def test_multiple_tokens(clock):
+    bucket = TokenBucket(rate=4, capacity=4)
+    assert bucket.acquire(4) == 0
+    assert bucket.acquire(2) == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize('rate', [0, -1])
+def test_non_positive_rate_is_unlimited(clock, rate):
+    bucket = TokenBucket(rate=rate)
+    assert all(bucket.acquire() == 0 for _ in range(1000))
+    assert clock.slept == []
+
+
+def test_shared_between_threads():
+    # 使用真實時間：4 個執行緒共取 20 個權杖，容量 5、每秒 50 個，至少需要 0.3 秒
+    bucket = TokenBucket(rate=50, capacity=5)
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started >= (20 - 5) / 50 * 0.95
+
+
+def test_reserve_does_not_block(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    assert bucket.reserve() == 0
+    # 預約的權杖依序排隊，回傳各自需等待的秒數
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert clock.slept == []
+
+
+def test_pause_delays_all_callers(clock):
+    bucket = TokenBucket(rate=10, capacity=10)
+    bucket.pause(3)
+    assert bucket.reserve() == pytest.approx(3.1)
+    clock.now += 5
+    # 暫停結束後恢復正常速率
+    assert bucket.reserve() == pytest.approx(0.0)
+
+
+def test_pause_extends_existing_debt(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.reserve()
+    bucket.reserve()  # 已欠 1 個權杖
+    bucket.pause(2)
+    assert bucket.reserve() == pytest.approx(4.0)
+
+
+def test_pause_ignored_when_unlimited(clock):
+    bucket = TokenBucket(rate=0)
+    bucket.pause(10)
+    assert bucket.reserve() == 0
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from scraper.engine.fetcher import AsyncFetcher
+from scraper.engine.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+from scraper.spiders.base_spider import BaseNewsSpider
+
+
+def _open_breaker(host: str, reset_timeout: float = 0.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure(host)
+    breaker.record_failure(host)
+    return breaker
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure('a')
+    assert not breaker.is_open('a')
+    assert breaker.before_request('a') is False
+    breaker.record_failure('a')
+    assert breaker.is_open('a')
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('a')
+    # 其他網域不受影響
+    assert breaker.before_request('b') is False
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure('a')
+    breaker.record_success('a')
+    breaker.record_failure('a')
+    assert not breaker.is_open('a')
+
+
+def test_half_open_allows_single_probe():
+    breaker = _open_breaker('a')
+    assert breaker.before_request('a') is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('a')
+
+
+def test_probe_success_closes():
+    breaker = _open_breaker('a')
+    assert breaker.before_request('a') is True
+    breaker.record_success('a')
+    assert not breaker.is_open('a')
+    assert breaker.before_request('a') is False
+
+
+def test_probe_failure_reopens():
+    breaker = _open_breaker('a', reset_timeout=0.05)
+    time.sleep(0.06)
+    assert breaker.before_request('a') is True
+    breaker.record_failure('a')
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('a')
+    time.sleep(0.06)
+    assert breaker.before_request('a') is True
+
+
+def test_release_probe_allows_next_probe():
+    breaker = _open_breaker('a')
+    assert breaker.before_request('a') is True
+    breaker.release_probe('a')
+    assert breaker.is_open('a')
+    assert breaker.before_request('a') is True
+
+
+def test_cancelled_async_probe_is_released():
+    async def scenario():
+        async def stall(reader, writer):
+            await asyncio.sleep(10)
+            writer.close()
+
+        server = await asyncio.start_server(stall, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        host = f'127.0.0.1:{port}'
+        breaker = _open_breaker(host)
+        fetcher = AsyncFetcher(circuit_breaker=breaker, timeout=30)
+        try:
+            task = asyncio.create_task(fetcher.get(f'http://{host}/'))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        finally:
+            await fetcher.close()
+            server.close()
+        return breaker, host
+
+    breaker, host = asyncio.run(scenario())
+    assert breaker.before_request(host) is True
+
+
+def test_sync_probe_with_non_http_error_is_released(monkeypatch):
+    class FailingSession:
+        def request(self, method, url, **kwargs):
+            raise requests.exceptions.InvalidURL('bad url')
+
+    spider = BaseNewsSpider()
+    spider.circuit_breaker = _open_breaker('example.invalid')
+    spider.retry_policy = RetryPolicy(max_retries=0)
+    monkeypatch.setattr('scraper.spiders.base_spider.http_clients.session', lambda *a, **k: FailingSession())
+
+    with pytest.raises(requests.exceptions.InvalidURL):
+        spider._send_with_retry('GET', 'http://example.invalid/x')
+    assert spider.circuit_breaker.before_request('example.invalid') is True
@@ -0,0 +1,180 @@
+"""
+tests/test_ttl_cache.py
+
+TTL + LRU 快取：過期、淘汰，以及 get_or_load 對同一個鍵只載入一次
+"""
+import threading
+import time
+
+import pytest
+
+from scraper.utils.ttl_cache import TTLCache
+
+
+def test_expires_after_ttl(clock):
+    cache = TTLCache(ttl=10)
+    cache.set('a', 1)
+    clock.now += 9.9
+    assert cache.get('a') == 1
+    clock.now += 0.1
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_get_or_load_caches_result_and_counts(clock):
+    cache = TTLCache(ttl=10)
+    calls = []
+    loader = lambda: calls.append(1) or 'value'
+    assert cache.get_or_load('k', loader) == 'value'
+    assert cache.get_or_load('k', loader) == 'value'
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    clock.now += 10
+    cache.get_or_load('k', loader)
+    assert len(calls) == 2
+
+
+def test_get_or_load_caches_none():
+    cache = TTLCache()
+    calls = []
+    assert cache.get_or_load('missing', lambda: calls.append(1)) is None
+    assert cache.get_or_load('missing', lambda: calls.append(1)) is None
+    assert len(calls) == 1
+
+
+def test_get_or_load_failure_is_not_cached():
+    cache = TTLCache()
+
+    def failing():
+        raise RuntimeError('載入失敗')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('k', failing)
+    assert cache.get_or_load('k', lambda: 'ok') == 'ok'
+    assert cache._loading == {}
+
+
+def test_get_or_load_loads_once_under_concurrency():
+    cache = TTLCache()
+    calls = []
+    started = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load('k', slow_loader)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait(1)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ['value'] * 8
+
+
+def test_different_keys_load_in_parallel():
+    cache = TTLCache()
+    barrier = threading.Barrier(2, timeout=1)
+
+    def loader(key):
+        # 兩個鍵的載入必須同時進行才能通過 barrier
+        barrier.wait()
+        return key
+
+    threads = [threading.Thread(target=cache.get_or_load, args=(key, lambda key=key: loader(key)))
+               for key in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('a') == 'a' and cache.get('b') == 'b'
+
+
+@pytest.mark.parametrize('invalidate', [lambda cache: cache.delete('k'), TTLCache.clear], ids=['delete', 'clear'])
+def test_invalidate_during_load_drops_stale_value(invalidate):
+    cache = TTLCache()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow_loader():
+        started.set()
+        release.wait(1)
+        return 'stale'
+
+    thread = threading.Thread(target=lambda: results.append(cache.get_or_load('k', slow_loader)))
+    thread.start()
+    started.wait(1)
+    # 資料來源在載入期間更新
+    invalidate(cache)
+    release.set()
+    thread.join()
+
+    assert results == ['stale']
+    assert cache.get('k') is None
+    assert cache.get_or_load('k', lambda: 'fresh') == 'fresh'
+    assert cache._loading == {} and cache._versions == {}
+
+
+def test_failed_load_is_retried_by_one_thread_only():
+    cache = TTLCache()
+    calls = []
+    first_started = threading.Event()
+    release_first = threading.Event()
+    second_started = threading.Event()
+    release_second = threading.Event()
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            first_started.set()
+            release_first.wait(1)
+            raise RuntimeError('載入失敗')
+        second_started.set()
+        release_second.wait(1)
+        return 'value'
+
+    def call():
+        try:
+            results.append(cache.get_or_load('k', loader))
+        except RuntimeError:
+            pass
+
+    results = []
+    first = threading.Thread(target=call)
+    first.start()
+    first_started.wait(1)
+    # 在第一次載入期間排隊等待的執行緒，會在失敗後重新載入
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    time.sleep(0.05)
+    release_first.set()
+    second_started.wait(1)
+    # 重新載入期間才到達的執行緒必須等待，而不是另外再載入一次
+    late = threading.Thread(target=call)
+    late.start()
+    time.sleep(0.05)
+    release_second.set()
+    for thread in (first, waiter, late):
+        thread.join()
+
+    assert len(calls) == 2
+    assert results == ['value', 'value']
@@ -0,0 +1,83 @@
+"""
+tests/test_user_service.py
+
+使用者服務的批次註冊與快取
+匯入 app 模組時會連線資料庫，未設置 DATABASE_URL 時略過
+"""
+import os
+from dataclasses import replace
+
+import pytest
+
+if not os.getenv('DATABASE_URL'):
+    pytest.skip('需要 DATABASE_URL 才能匯入 app 模組', allow_module_level=True)
+
+from sqlalchemy import text
+
+from app.database.connection import db_manager
+from app.services.user_service import UserService
+
+PREFIX = 'Utest_user_service_'
+
+
+def _execute(sql, **params):
+    with db_manager.engine.begin() as conn:
+        return conn.execute(text(sql), params)
+
+
+@pytest.fixture
+def service():
+    _execute("DELETE FROM users WHERE line_user_id LIKE :p", p=PREFIX + '%')
+    yield UserService(cache_size=100, cache_ttl=600)
+    _execute("DELETE FROM users WHERE line_user_id LIKE :p", p=PREFIX + '%')
+
+
+def _insert_user(user_id, is_registered):
+    _execute(
+        "INSERT INTO users (line_user_id, user_name, is_registered) VALUES (:u, '舊用戶', :r)",
+        u=user_id, r=is_registered
+    )
+
+
+def _is_registered_in_db(user_id):
+    return _execute("SELECT is_registered FROM users WHERE line_user_id = :u", u=user_id).scalar()
+
+
+def test_registers_new_users(service):
+    user_id = PREFIX + 'new'
+    users = service.register_many([user_id, user_id])
+    assert list(users) == [user_id]
+    assert users[user_id].is_registered
+    assert service.cache.get(user_id) == users[user_id]
+
+
+def test_reregistering_marks_existing_user_registered(service):
+    user_id = PREFIX + 'unregistered'
+    _insert_user(user_id, False)
+    # 快取中是未註冊的舊資料
+    assert service.get(user_id).is_registered is False
+
+    users = service.register_many([user_id])
+    assert users[user_id].is_registered
+    assert _is_registered_in_db(user_id) is True
+    assert service.get(user_id).is_registered
+
+
+def test_reloads_user_cached_as_missing(service):
+    user_id = PREFIX + 'other_process'
+    assert service.get(user_id) is None
+    # 其他行程在快取期間註冊了此使用者
+    _insert_user(user_id, True)
+
+    users = service.register_many([user_id])
+    assert users[user_id] is not None
+    assert users[user_id].line_user_id == user_id
+
+
+def test_keeps_cached_subscriptions_of_registered_user(service):
+    user_id = PREFIX + 'cached'
+    _insert_user(user_id, True)
+    cached = replace(service.get(user_id), news_categories=('aipl',))
+    service.cache.set(user_id, cached)
+
+    assert service.register_many([user_id])[user_id] is cached
@@ -0,0 +1,86 @@
+"""
+tests/test_watermark.py
+
+水位線的寫入與略過：只往較新的時間推進，爬取失敗或列表不完整的類別保持原水位線
+匯入 app 模組時會連線資料庫，未設置 DATABASE_URL 時略過
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+if not os.getenv('DATABASE_URL'):
+    pytest.skip('需要 DATABASE_URL 才能匯入 app 模組', allow_module_level=True)
+
+from sqlalchemy import text
+
+from app.database.connection import db_manager
+from app.etl.crawl_coordinator import CategoryDone
+from app.etl.news_pipeline import NewsETLPipeline
+from app.etl.watermark import load_watermarks, save_watermarks
+
+CATEGORIES = ['acul', 'aie']
+OLD = (datetime(2024, 10, 1, 8, 0), 'https://www.cna.com.tw/news/acul/old.aspx')
+NEW = (datetime(2024, 10, 2, 8, 0), 'https://www.cna.com.tw/news/acul/new.aspx')
+
+
+@pytest.fixture
+def crawl_state():
+    """測試期間清空兩個類別的水位線，結束後還原"""
+    with db_manager.engine.begin() as conn:
+        saved = conn.execute(
+            text("SELECT * FROM news_crawl_state WHERE news_category_key = ANY(:c)"), {'c': CATEGORIES}
+        ).mappings().all()
+        conn.execute(text("DELETE FROM news_crawl_state WHERE news_category_key = ANY(:c)"), {'c': CATEGORIES})
+    yield
+    with db_manager.engine.begin() as conn:
+        conn.execute(text("DELETE FROM news_crawl_state WHERE news_category_key = ANY(:c)"), {'c': CATEGORIES})
+        for row in saved:
+            conn.execute(
+                text("INSERT INTO news_crawl_state VALUES (:news_category_key, :last_publish_time, :last_url, :updated_at)"),
+                dict(row)
+            )
+
+
+def _load():
+    with db_manager.get_session() as session:
+        return load_watermarks(session, CATEGORIES)
+
+
+def _save(watermarks):
+    with db_manager.get_session() as session:
+        save_watermarks(session, watermarks)
+
+
+def test_save_only_moves_forward(crawl_state):
+    _save({'acul': NEW})
+    _save({'acul': OLD})
+    assert _load() == {'acul': NEW}
+
+
+def _pipeline(listed):
+    pipeline = NewsETLPipeline(categories=CATEGORIES, incremental=True)
+    for spider in pipeline.coordinator.spiders:
+        spider.watermark = OLD
+        spider._listed = [listed]
+    return pipeline
+
+
+def test_failed_category_keeps_watermark(crawl_state):
+    _save({'acul': OLD, 'aie': OLD})
+    pipeline = _pipeline(NEW)
+    pipeline._category_loaded(CategoryDone('acul', True))
+    pipeline._category_loaded(CategoryDone('aie', False))
+    pipeline._advance_watermarks()
+    assert _load() == {'acul': NEW, 'aie': OLD}
+
+
+def test_incomplete_listing_keeps_watermark(crawl_state):
+    _save({'acul': OLD, 'aie': OLD})
+    pipeline = _pipeline(NEW)
+    # 列表請求失敗或到達頁數上限，類別本身仍視為完成
+    pipeline.coordinator.spiders[1]._listing_complete = False
+    for category in CATEGORIES:
+        pipeline._category_loaded(CategoryDone(category, True))
+    pipeline._advance_watermarks()
+    assert _load() == {'acul': NEW, 'aie': OLD}